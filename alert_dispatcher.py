@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AlertDispatcher:
+    """Run alert coroutines on a long-lived event loop fed from the tick thread"""
+
+    def __init__(self, handler, max_queue_size=1000, workers=4):
+        """Initialize AlertDispatcher instance"""
+        self.handler = handler
+        self.max_queue_size = max_queue_size
+        self.workers = workers
+
+        # Event loop state (created on the dispatcher thread)
+        self.loop = None
+        self.queue = None
+        self.thread = None
+        self._tasks = []
+        self._ready = threading.Event()
+
+        # Counters shared between the tick thread and the loop thread
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the dispatcher thread if it is not already running"""
+        if self.thread and self.thread.is_alive():
+            return
+
+        self._ready.clear()
+        self.thread = threading.Thread(
+            target=self._run,
+            name="alert-dispatcher",
+            daemon=True
+        )
+        self.thread.start()
+        self._ready.wait()
+        logger.info(f"Alert dispatcher started with {self.workers} workers")
+
+    def stop(self, timeout=5):
+        """Stop the event loop and wait for the dispatcher thread"""
+        if not self.thread or not self.thread.is_alive():
+            return
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        logger.info(f"Alert dispatcher stopped: {self.stats()}")
+
+    def _run(self):
+        """Own the event loop for the lifetime of the dispatcher thread"""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.Queue()
+        self._tasks = [
+            self.loop.create_task(self._worker(worker_id))
+            for worker_id in range(self.workers)
+        ]
+        self._ready.set()
+
+        try:
+            self.loop.run_forever()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            self.loop.run_until_complete(
+                asyncio.gather(*self._tasks, return_exceptions=True)
+            )
+            self.loop.close()
+
+    async def _worker(self, worker_id):
+        """Pull queued alerts and await the handler for each one"""
+        while True:
+            args = await self.queue.get()
+            with self._lock:
+                self.pending -= 1
+
+            try:
+                await self.handler(*args)
+                with self._lock:
+                    self.completed += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.error(f"Alert worker {worker_id} failed: {str(e)}", exc_info=True)
+
+    def submit(self, *args):
+        """Queue an alert without blocking; returns False if it was dropped"""
+        with self._lock:
+            if self.loop is None or self.pending >= self.max_queue_size:
+                self.dropped += 1
+                return False
+            self.pending += 1
+            self.submitted += 1
+
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, args)
+        return True
+
+    def run_coroutine(self, coro):
+        """Schedule a coroutine on the dispatcher loop from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    @property
+    def queue_depth(self):
+        """Number of alerts waiting for a worker"""
+        return self.pending
+
+    def stats(self):
+        """Snapshot of queue depth and delivery counters"""
+        with self._lock:
+            return {
+                'queue_depth': self.pending,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'completed': self.completed,
+                'failed': self.failed
+            }
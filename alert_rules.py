@@ -0,0 +1,342 @@
+import json
+import logging
+import os
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from rolling_window import INDICATORS
+
+logger = logging.getLogger(__name__)
+
+RULE_TYPES = ('pct', 'level', 'band', 'indicator')
+
+
+class RuleEngine:
+    """Alert rules compiled into per-symbol lookup tables
+
+    Rules are loaded once from config and resolved against each symbol when
+    it is registered. Percentage rules become the symbol's threshold in
+    PriceState; price levels and band edges become a sorted table per
+    symbol, so evaluating a tick never walks the rule list. Indicator rules
+    compare rolling-window values (see RollingWindows) or the open candle
+    (see CandleAggregator) against bounds and fire once each time a value
+    moves past a bound.
+
+    Levels and band edges share PriceState's alert controls: once a level
+    fires it re-arms only after the price has moved hysteresis percent away
+    from it, and it stays quiet for cooldown seconds. Crossings held back
+    this way count towards PriceState.suppressed.
+    """
+
+    def __init__(self, state, rules=None, groups=None, windows=None, candles=None):
+        """Initialize RuleEngine instance
+
+        windows, if given, is a RollingWindows updated with every tick.
+        candles, if given, is a CandleAggregator the caller updates before
+        evaluating each tick.
+        """
+        self.state = state
+        self.windows = windows
+        self.candles = candles
+        # Called with each newly registered symbol once its rules are compiled
+        self.on_register = None
+        self.groups = groups or {}
+        self.rules = rules or []
+        for rule in self.rules:
+            self._validate(rule)
+
+        # sid -> [sorted level prices, labels, armed flags, last alert times] or None
+        self._levels = []
+        self._has_levels = np.zeros(state.capacity, dtype=bool)
+
+        # sid -> list of [indicator, above, below, label, active, source] or None
+        self._indicators = []
+        self._has_indicators = np.zeros(state.capacity, dtype=bool)
+
+        # Compile anything already registered
+        for symbol in state.symbols:
+            self._compile_symbol(symbol)
+
+    @classmethod
+    def from_file(cls, path, state, windows=None, candles=None):
+        """Load rules from a JSON file; a missing file means default thresholds only"""
+        if not path or not os.path.exists(path):
+            logger.info(f"No alert rules file at {path}, using default thresholds")
+            return cls(state, windows=windows, candles=candles)
+
+        with open(path, 'r') as f:
+            config = json.load(f)
+
+        engine = cls(state, rules=config.get('rules', []), groups=config.get('groups', {}),
+                     windows=windows, candles=candles)
+        logger.info(f"Loaded {len(engine.rules)} alert rules from {path}")
+        return engine
+
+    def _validate(self, rule):
+        """Reject malformed rules at startup rather than on a tick"""
+        rule_type = rule.get('type')
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown alert rule type: {rule_type}")
+        if not rule.get('symbol') and not rule.get('group'):
+            raise ValueError(f"Alert rule needs a symbol or group: {rule}")
+        if rule.get('group') and rule['group'] not in self.groups:
+            raise ValueError(f"Alert rule references unknown group: {rule['group']}")
+
+        required = {'pct': ('pct',), 'level': ('price',), 'band': ('low', 'high'), 'indicator': ('indicator',)}[rule_type]
+        for key in required:
+            if key not in rule:
+                raise ValueError(f"Alert rule of type {rule_type} is missing '{key}': {rule}")
+        if rule_type == 'band' and rule['low'] >= rule['high']:
+            raise ValueError(f"Alert band low must be below high: {rule}")
+        if rule_type == 'indicator' and rule['indicator'].startswith('candle_'):
+            if self.candles is None:
+                raise ValueError(f"Candle rules need the candle aggregator: {rule}")
+            if rule['indicator'] not in self.candles.indicators:
+                raise ValueError(f"Unknown candle indicator {rule['indicator']}, expected one of {', '.join(self.candles.indicators)}")
+        elif rule_type == 'indicator':
+            if self.windows is None:
+                raise ValueError(f"Indicator rules need rolling windows: {rule}")
+            if rule['indicator'] not in INDICATORS:
+                raise ValueError(f"Unknown indicator {rule['indicator']}, expected one of {', '.join(INDICATORS)}")
+        if rule_type == 'indicator' and rule.get('above') is None and rule.get('below') is None:
+            raise ValueError(f"Indicator rule needs 'above' and/or 'below': {rule}")
+
+    def _in_group(self, symbol, group):
+        """Resolve group membership; only called while compiling"""
+        definition = self.groups[group]
+        if symbol in definition.get('symbols', ()):
+            return True
+        match = definition.get('match')
+        return bool(match) and match in symbol
+
+    def _applies(self, rule, symbol):
+        """Whether a rule targets a symbol directly or through its group"""
+        if rule.get('symbol'):
+            return rule['symbol'] == symbol
+        return self._in_group(symbol, rule['group'])
+
+    def register(self, symbol):
+        """Register a symbol with the price state and compile its rules"""
+        sid = self.state.symbol_ids.get(symbol)
+        if sid is None:
+            sid = self.state.register(symbol)
+            self._compile_symbol(symbol)
+            if self.on_register:
+                self.on_register(symbol)
+        return sid
+
+    def symbol_id(self, symbol):
+        """Id for a symbol, registering and compiling it on first sight"""
+        sid = self.state.symbol_ids.get(symbol)
+        if sid is None:
+            sid = self.register(symbol)
+        return sid
+
+    def _compile_symbol(self, symbol):
+        """Build the threshold and level table for one symbol"""
+        sid = self.state.symbol_ids[symbol]
+
+        group_pct = None
+        symbol_pct = None
+        levels = []
+        indicators = []
+        for rule in self.rules:
+            if not self._applies(rule, symbol):
+                continue
+
+            rule_type = rule['type']
+            if rule_type == 'pct':
+                # Symbol rules beat group rules; the first group rule wins
+                if rule.get('symbol'):
+                    symbol_pct = rule['pct']
+                elif group_pct is None:
+                    group_pct = rule['pct']
+            elif rule_type == 'indicator':
+                indicators.append(self._compile_indicator(rule))
+            elif rule_type == 'level':
+                name = rule.get('name') or f"level {rule['price']:,.2f}"
+                levels.append((rule['price'], name))
+            else:
+                name = rule.get('name') or f"band {rule['low']:,.2f}-{rule['high']:,.2f}"
+                levels.append((rule['low'], f"{name} lower edge"))
+                levels.append((rule['high'], f"{name} upper edge"))
+
+        pct = symbol_pct if symbol_pct is not None else group_pct
+        if pct is not None:
+            self.state.threshold[sid] = pct
+
+        while len(self._levels) <= sid:
+            self._levels.append(None)
+            self._indicators.append(None)
+        if len(self._has_levels) < self.state.capacity:
+            for name in ('_has_levels', '_has_indicators'):
+                grown = np.zeros(self.state.capacity, dtype=bool)
+                current = getattr(self, name)
+                grown[:len(current)] = current
+                setattr(self, name, grown)
+        if self.windows is not None:
+            self.windows.ensure(sid)
+        if self.candles is not None:
+            self.candles.ensure(sid)
+
+        if levels:
+            levels.sort()
+            self._levels[sid] = [
+                [price for price, _ in levels],
+                [name for _, name in levels],
+                [True] * len(levels),
+                [float('-inf')] * len(levels)
+            ]
+            self._has_levels[sid] = True
+        if indicators:
+            self._indicators[sid] = indicators
+            self._has_indicators[sid] = True
+
+    def _compile_indicator(self, rule):
+        """Per-symbol copy of an indicator rule with its own fired state"""
+        indicator = rule['indicator']
+        label = rule.get('name') or indicator.replace('_', ' ')
+        source = self.candles if indicator.startswith('candle_') else self.windows
+        return [indicator, rule.get('above'), rule.get('below'), label, False, source]
+
+    def _fired_indicators(self, sid):
+        """Labels of indicator rules that moved past a bound since the last check"""
+        reasons = []
+        for condition in self._indicators[sid]:
+            indicator, above, below, label, active, source = condition
+            value = source.value(sid, indicator)
+            breached = value is not None and (
+                (above is not None and value >= above) or (below is not None and value <= below)
+            )
+            if breached and not active:
+                if above is not None and value >= above:
+                    reasons.append(f"{label} {value:,.2f} above {above:,.2f}")
+                else:
+                    reasons.append(f"{label} {value:,.2f} below {below:,.2f}")
+            condition[4] = breached
+        return reasons
+
+    def _window_change(self, sid, ltp):
+        """(base price, change percent) for indicator-only alerts: over the rolling window, else since the longest candle opened"""
+        if self.windows is not None:
+            base = float(self.windows.base_price[sid])
+        else:
+            bar = self.candles.current(sid, self.candles.intervals[-1])
+            base = bar['open'] if bar else ltp
+        return base, (ltp - base) / base * 100 if base > 0 else 0.0
+
+    def _crossed_levels(self, sid, old_price, ltp, now):
+        """Labels of every armed level between two prices, in crossing order"""
+        prices, names, armed, alerted_at = self._levels[sid]
+        start = bisect_right(prices, old_price)
+        end = bisect_right(prices, ltp)
+        if end > start:
+            crossed = [(i, f"crossed above {names[i]}") for i in range(start, end)]
+        else:
+            crossed = [(i, f"crossed below {names[i]}") for i in range(start - 1, end - 1, -1)]
+
+        reasons = []
+        cooldown = self.state.cooldown
+        for i, reason in crossed:
+            if not armed[i] or now - alerted_at[i] < cooldown:
+                self.state.suppressed += 1
+                continue
+            armed[i] = False
+            alerted_at[i] = now
+            reasons.append(reason)
+
+        # A fired level re-arms once the price is clear of it
+        hysteresis = self.state.hysteresis
+        for i, level in enumerate(prices):
+            if not armed[i] and abs(ltp - level) >= level * hysteresis / 100:
+                armed[i] = True
+        return reasons
+
+    def evaluate(self, sid, ltp, volume=None, now=None):
+        """Apply one tick; returns () or a 1-tuple of (old_price, change_percent, reason)
+
+        A tick that both moves past the threshold and crosses levels produces
+        one alert whose reason lists the levels. An alert raised only by
+        indicator rules reports the change over the rolling window.
+        """
+        if now is None:
+            now = time.time()
+        previous = self.state.last_price[sid]
+        crossed = self.state.update(sid, ltp, now)
+        if self.windows is not None:
+            self.windows.update(sid, ltp, volume, now)
+
+        reasons = ()
+        if self._has_levels[sid] and previous > 0:
+            reasons = self._crossed_levels(sid, previous, ltp, now)
+        fired = self._fired_indicators(sid) if self._has_indicators[sid] else ()
+
+        if not crossed and not reasons and not fired:
+            return ()
+
+        reason = "; ".join(list(reasons) + list(fired)) or None
+        if crossed:
+            return ((crossed[0], crossed[1], reason),)
+        if reasons:
+            previous = float(previous)
+            return ((previous, (ltp - previous) / previous * 100, reason),)
+        return (self._window_change(sid, ltp) + (reason,),)
+
+    def evaluate_batch(self, ids, prices, volumes=None, now=None):
+        """Apply a batch of ticks; returns a list of (sid, ltp, old_price, change_percent, reason)
+
+        Indicator rules are checked once per symbol against the window state
+        after the whole batch.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        prices = np.asarray(prices, dtype=np.float64)
+        if now is None:
+            now = time.time()
+        if self.windows is not None:
+            self.windows.update_batch(ids, prices, volumes, now)
+
+        # Level checks need each tick's predecessor, so walk only the symbols that have levels
+        level_hits = {}
+        level_mask = self._has_levels[ids]
+        if level_mask.any():
+            previous = {}
+            for position in np.flatnonzero(level_mask):
+                sid = int(ids[position])
+                ltp = float(prices[position])
+                old_price = float(previous.get(sid, self.state.last_price[sid]))
+                previous[sid] = ltp
+                if old_price > 0:
+                    reasons = self._crossed_levels(sid, old_price, ltp, now)
+                    if reasons:
+                        level_hits[int(position)] = (sid, ltp, old_price, "; ".join(reasons))
+
+        alerts = []
+        batch = self.state.evaluate_batch(ids, prices, now)
+        for sid, ltp, ref_price, change_percent, position in zip(*batch):
+            hit = level_hits.pop(int(position), None)
+            reason = hit[3] if hit else None
+            alerts.append((int(sid), float(ltp), float(ref_price), float(change_percent), reason))
+
+        # Level crossings that stayed inside the percentage threshold
+        for sid, ltp, old_price, reason in level_hits.values():
+            alerts.append((sid, ltp, old_price, (ltp - old_price) / old_price * 100, reason))
+
+        indicator_mask = self._has_indicators[ids]
+        if indicator_mask.any():
+            for sid in np.unique(ids[indicator_mask]):
+                sid = int(sid)
+                fired = self._fired_indicators(sid)
+                if fired:
+                    ltp = float(self.state.last_price[sid])
+                    alerts.append((sid, ltp) + self._window_change(sid, ltp) + ("; ".join(fired),))
+        return alerts
+
+    def stats(self):
+        """Summary of the compiled tables"""
+        return {
+            'rules': len(self.rules),
+            'symbols_with_levels': int(self._has_levels.sum()),
+            'symbols_with_indicators': int(self._has_indicators.sum())
+        }
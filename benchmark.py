@@ -0,0 +1,136 @@
+import argparse
+import json
+import logging
+import sys
+import tracemalloc
+
+from tick_replay import create_replay_feed, drain, replay, synthetic_frames, synthetic_symbols
+
+DEFAULT_SIZES = (10, 500, 5000)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def measure_memory(symbol_count):
+    """Bytes of feed state per symbol after every symbol has ticked once"""
+    symbols = synthetic_symbols(symbol_count)
+    frames = list(synthetic_frames(symbols, symbol_count, jump_probability=0))
+
+    tracemalloc.start()
+    feed = create_replay_feed()
+    before = tracemalloc.get_traced_memory()[0]
+    for symbol in symbols:
+        feed.rule_engine.register(symbol)
+    for _, frame in frames:
+        feed.process_message(frame)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / symbol_count
+
+
+def run_case(symbol_count, ticks, seed=1, conflate=None):
+    """Replay a synthetic stream through a fresh feed and collect metrics"""
+    symbols = synthetic_symbols(symbol_count)
+    frames = list(synthetic_frames(symbols, ticks, seed=seed))
+
+    feed = create_replay_feed()
+    latencies = []
+    feed.sender.on_delivered = lambda origins, delivered_at: latencies.extend(
+        delivered_at - origin[0] for origin in origins if origin is not None
+    )
+    for symbol in symbols:
+        feed.rule_engine.register(symbol)
+
+    conflate = feed.tick_buffer is not None if conflate is None else conflate
+    count, busy = replay(feed, frames, conflate=conflate)
+    drain(feed)
+    feed.dispatcher.stop()
+
+    p50 = percentile(latencies, 50)
+    p99 = percentile(latencies, 99)
+    return {
+        'symbols': symbol_count,
+        'conflate': conflate,
+        'ticks': count,
+        'ticks_per_sec': count / busy if busy else None,
+        'alerts': len(latencies),
+        'dropped_alerts': feed.dispatcher.dropped,
+        'p50_alert_ms': p50 * 1000 if p50 is not None else None,
+        'p99_alert_ms': p99 * 1000 if p99 is not None else None,
+        'bytes_per_symbol': measure_memory(symbol_count)
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    """Compare against a previous run; returns human-readable regressions"""
+    # Runs from before conflated replay processed every frame inline
+    previous = {(case['symbols'], case.get('conflate', False)): case for case in baseline}
+    regressions = []
+    for case in results:
+        old = previous.get((case['symbols'], case['conflate']))
+        if not old:
+            continue
+        checks = (
+            ('ticks_per_sec', lambda new, ref: new < ref * (1 - tolerance)),
+            ('p99_alert_ms', lambda new, ref: new > ref * (1 + tolerance)),
+            ('bytes_per_symbol', lambda new, ref: new > ref * (1 + tolerance)),
+        )
+        for key, worse in checks:
+            new_value, old_value = case.get(key), old.get(key)
+            if new_value is not None and old_value and worse(new_value, old_value):
+                regressions.append(f"{case['symbols']} symbols: {key} {old_value:,.1f} -> {new_value:,.1f}")
+    return regressions
+
+
+def format_value(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def main():
+    """Benchmark the tick hot path at several universe sizes"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="Symbol counts to test")
+    parser.add_argument('--ticks', type=int, default=200000, help="Ticks replayed per case")
+    parser.add_argument('--no-conflate', action='store_true', help="Process frames inline instead of through the conflating buffer")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="Allowed relative regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    print(f"{'symbols':>8} {'ticks/sec':>12} {'alerts':>8} {'p50 ms':>8} {'p99 ms':>8} {'bytes/sym':>10}")
+    for size in args.sizes:
+        case = run_case(size, args.ticks, conflate=False if args.no_conflate else None)
+        results.append(case)
+        print(
+            f"{case['symbols']:>8} {format_value(case['ticks_per_sec'], ',.0f'):>12} {case['alerts']:>8} "
+            f"{format_value(case['p50_alert_ms'], '.1f'):>8} {format_value(case['p99_alert_ms'], '.1f'):>8} "
+            f"{format_value(case['bytes_per_symbol'], ',.0f'):>10}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from movers import IST
+
+logger = logging.getLogger(__name__)
+
+HELP_TEXT = """Commands:
+/price SYMBOL - last price and change
+/movers - top gainers and losers today
+/depth SYMBOL - best bid/ask and volume"""
+
+
+class BotCommands:
+    """Answer chat commands from the feed's in-memory state
+
+    /price and /movers read last prices, the movers ranking and rolling
+    windows directly, so replies never wait on the broker. /depth serves
+    the depth cached for alerts and only fetches (batched, through the
+    depth service) when nothing is cached for the symbol. Replies go out
+    as plain text through the sender's reply path, apart from the alert
+    queues and digests.
+    """
+
+    def __init__(self, bot, sender, state, ranking, depth_lookup, windows=None,
+                 allowed_chats=None, poll_timeout=30, refresh_interval=5.0):
+        """Initialize BotCommands instance
+
+        depth_lookup is a coroutine function taking a symbol and returning
+        (depth, age_seconds) or (None, None). allowed_chats, if given,
+        limits who gets answers.
+        """
+        self.bot = bot
+        self.sender = sender
+        self.state = state
+        self.ranking = ranking
+        self.depth_lookup = depth_lookup
+        self.windows = windows
+        self.allowed_chats = None if allowed_chats is None else {str(chat) for chat in allowed_chats}
+        self.poll_timeout = poll_timeout
+        self.refresh_interval = refresh_interval
+        self._offset = None
+
+        # Counters
+        self.commands = 0
+        self.ignored = 0
+        self.poll_errors = 0
+
+    def resolve(self, text):
+        """Symbol id for user input such as SBIN, nifty50 or NSE:SBIN-EQ, or None"""
+        text = text.strip()
+        for symbol in (text, text.upper(), f"NSE:{text.upper()}-EQ", f"NSE:{text.upper()}-INDEX"):
+            sid = self.state.symbol_ids.get(symbol)
+            if sid is not None:
+                return sid
+        return None
+
+    async def handle(self, text):
+        """Reply text for a command message, or None if it is not a command"""
+        parts = text.split()
+        if not parts or not parts[0].startswith('/'):
+            return None
+        # Commands in groups arrive as /price@BotName
+        command = parts[0][1:].split('@')[0].lower()
+        args = parts[1:]
+
+        if command == 'price':
+            return self.price_reply(args)
+        if command == 'movers':
+            return self.movers_reply()
+        if command == 'depth':
+            return await self.depth_reply(args)
+        if command in ('help', 'start'):
+            return HELP_TEXT
+        return None
+
+    def price_reply(self, args):
+        """Last price, day change and rolling-window figures of one symbol"""
+        if not args:
+            return "Usage: /price SYMBOL"
+        sid = self.resolve(args[0])
+        if sid is None:
+            return f"{args[0]} is not tracked"
+        symbol = self.state.symbols[sid]
+        ltp = self.state.last_price[sid]
+        if not ltp > 0:
+            return f"{symbol}: no price yet"
+
+        lines = [symbol, f"Price: ₹{ltp:,.2f}"]
+        day_change = self.ranking.change(sid)
+        if day_change is not None:
+            lines.append(f"Day: {day_change:+.2f}%")
+        if self.windows is not None:
+            # The view the tick thread published, with idle symbols' old buckets expired
+            minutes = self.windows.window_seconds // 60
+            change = self.windows.published(sid, 'change_pct')
+            if change is not None:
+                lines.append(f"{minutes}m: {change:+.2f}%")
+            high = self.windows.published(sid, 'high')
+            low = self.windows.published(sid, 'low')
+            if high is not None and low is not None:
+                lines.append(f"{minutes}m range: ₹{low:,.2f} - ₹{high:,.2f}")
+            vwap = self.windows.published(sid, 'vwap')
+            if vwap is not None:
+                lines.append(f"VWAP: ₹{vwap:,.2f}")
+        return "\n".join(lines)
+
+    def movers_reply(self):
+        """Gainers and losers from the last ranking"""
+        ranking = self.ranking
+        if ranking.updated_at is None or not (ranking.gainers or ranking.losers):
+            return "No movers yet"
+        lines = [f"Top movers (as of {datetime.fromtimestamp(ranking.updated_at, IST).strftime('%H:%M:%S')})"]
+        for title, entries in (("Gainers", ranking.gainers), ("Losers", ranking.losers)):
+            if entries:
+                lines.append(f"\n{title}:")
+                lines.extend(f"{symbol} ₹{ltp:,.2f} ({change:+.2f}%)" for symbol, ltp, change in entries)
+        return "\n".join(lines)
+
+    async def depth_reply(self, args):
+        """Best bid/ask and volume of one symbol"""
+        if not args:
+            return "Usage: /depth SYMBOL"
+        sid = self.resolve(args[0])
+        if sid is None:
+            return f"{args[0]} is not tracked"
+        symbol = self.state.symbols[sid]
+        depth, age = await self.depth_lookup(symbol)
+        if depth is None:
+            return f"{symbol}: no market depth available"
+        return (
+            f"{symbol} ({age:.0f}s ago)\n"
+            f"Bid: {depth['bid_price']} ({depth['bid_qty']})\n"
+            f"Ask: {depth['ask_price']} ({depth['ask_qty']})\n"
+            f"Volume: {depth['volume']}"
+        )
+
+    async def run(self):
+        """Refresh the movers ranking and answer commands until cancelled"""
+        refresher = asyncio.ensure_future(self._refresh_loop())
+        try:
+            await self._poll_loop()
+        finally:
+            refresher.cancel()
+
+    async def _refresh_loop(self):
+        """Rebuild the movers ranking every refresh_interval seconds"""
+        while True:
+            try:
+                self.ranking.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing movers: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _poll_loop(self):
+        """Long-poll Telegram for messages and reply to commands"""
+        while True:
+            try:
+                updates = await self.bot.get_updates(
+                    offset=self._offset,
+                    timeout=self.poll_timeout,
+                    read_timeout=self.poll_timeout + 10,
+                    allowed_updates=['message']
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.poll_errors += 1
+                logger.warning(f"Polling for bot commands failed: {str(e)}")
+                await asyncio.sleep(5)
+                continue
+
+            for update in updates:
+                self._offset = update.update_id + 1
+                message = update.message
+                if message is None or not message.text:
+                    continue
+                await self._answer(message.chat_id, message.text)
+
+    async def _answer(self, chat_id, text):
+        """Reply to one message if it is a command from an allowed chat"""
+        if self.allowed_chats is not None and str(chat_id) not in self.allowed_chats:
+            self.ignored += 1
+            return
+        try:
+            reply = await self.handle(text)
+        except Exception as e:
+            logger.error(f"Error answering {text!r}: {str(e)}", exc_info=True)
+            return
+        if reply is None:
+            return
+        self.commands += 1
+        await self.sender.reply(chat_id, reply)
+
+    def stats(self):
+        """Snapshot of command counters"""
+        return {
+            'commands': self.commands,
+            'ignored': self.ignored,
+            'poll_errors': self.poll_errors
+        }
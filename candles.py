@@ -0,0 +1,354 @@
+import math
+from datetime import datetime, time as dt_time, timedelta
+
+import numpy as np
+import pytz
+
+from rolling_window import traded_quantities
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Rows of a sealed bar array (field, symbol, bar)
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(BAR_FIELDS))
+# Open-bar accumulators keep open, high, low and volume; close is the last price
+ACCUMULATED_VOLUME = 3
+
+# Per-interval values rules can reference, as candle_<label>_<field>
+CANDLE_FIELDS = ('change_pct', 'range_pct', 'volume')
+
+
+def interval_label(seconds):
+    """Short name of a bar interval, e.g. 60 -> '1m'"""
+    return f"{seconds // 60}m" if seconds % 60 == 0 else f"{seconds}s"
+
+
+def _parse_time(value):
+    """'HH:MM' -> datetime.time"""
+    hour, minute = (int(part) for part in value.split(':'))
+    return dt_time(hour, minute)
+
+
+class CandleAggregator:
+    """Streaming OHLCV bars for every symbol over one trading session
+
+    Ticks only touch the symbol's current bar at the smallest interval
+    (open/high/low, cumulative-volume delta); the last price doubles as the
+    close. When the clock passes a bar boundary every symbol is sealed in
+    one vectorized step, so symbols that did not trade get a flat bar at
+    their last price. Larger intervals are multiples of the smallest one
+    and are built from its sealed bars, never from ticks.
+
+    Sealed bars live in preallocated float32 arrays of shape
+    (field, symbol, bar) sized for the whole session; they are cleared when
+    a new trading day starts. Ticks outside the session are ignored.
+    """
+
+    def __init__(self, intervals=(60, 300), session_open="09:15", session_close="15:30", capacity=256):
+        """Initialize CandleAggregator instance"""
+        self.intervals = tuple(sorted(set(int(interval) for interval in intervals)))
+        if not self.intervals or self.intervals[0] <= 0:
+            raise ValueError(f"Invalid candle intervals: {intervals}")
+        self.base = self.intervals[0]
+        for interval in self.intervals:
+            if interval % self.base:
+                raise ValueError(f"Candle interval {interval}s is not a multiple of {self.base}s")
+
+        self.session_open = _parse_time(session_open)
+        self.session_close = _parse_time(session_close)
+        session_seconds = (
+            datetime.combine(datetime.min, self.session_close) - datetime.combine(datetime.min, self.session_open)
+        ).total_seconds()
+        if session_seconds <= 0:
+            raise ValueError(f"Session close {session_close} must be after open {session_open}")
+
+        # Bars per session and base bars per bar, per interval
+        self.bar_counts = {
+            interval: int(math.ceil(session_seconds / interval)) for interval in self.intervals
+        }
+        self.multiples = {interval: interval // self.base for interval in self.intervals}
+
+        # Rule indicator name -> (interval, field)
+        self.indicators = {
+            f"candle_{interval_label(interval)}_{field}": (interval, field)
+            for interval in self.intervals for field in CANDLE_FIELDS
+        }
+
+        # Sealed bars per interval, and how many of them are sealed today
+        self.bars = {
+            interval: np.full((len(BAR_FIELDS), capacity, count), np.nan, dtype=np.float32)
+            for interval, count in self.bar_counts.items()
+        }
+        self.sealed = dict.fromkeys(self.intervals, 0)
+
+        # Open bar accumulators (open, high, low, volume) per interval; the
+        # base one takes ticks, larger ones collect sealed base bars
+        self._open_bars = {interval: self._empty_accumulator(capacity) for interval in self.intervals}
+        self.last_price = np.full(capacity, np.nan)
+        self.last_volume = np.full(capacity, np.nan)
+        self._bind()
+
+        self.day = None
+        self.session_start = None
+        # Base bar ticks currently land in, -1 outside the session
+        self.bar_index = -1
+        # Next time advance() has work to do
+        self._next_boundary = -math.inf
+
+    @staticmethod
+    def _empty_accumulator(capacity):
+        """Rows open, high, low (NaN until traded) and volume"""
+        accumulator = np.full((4, capacity), np.nan)
+        accumulator[ACCUMULATED_VOLUME] = 0.0
+        return accumulator
+
+    def _bind(self):
+        """Row views of the base accumulator used on the tick path"""
+        current = self._open_bars[self.base]
+        self.open, self.high, self.low, self.volume = current
+
+    @property
+    def capacity(self):
+        return len(self.last_price)
+
+    def bytes_per_symbol(self):
+        """Fixed memory cost of one symbol's session arrays"""
+        sealed = 4 * len(BAR_FIELDS) * sum(self.bar_counts.values())
+        return sealed + 8 * (4 * len(self.intervals) + 2)
+
+    def ensure(self, sid):
+        """Grow the arrays so sid fits"""
+        size = self.capacity
+        if sid < size:
+            return
+        capacity = max(size * 2, sid + 1)
+        for interval, bars in self.bars.items():
+            grown = np.full((len(BAR_FIELDS), capacity, bars.shape[2]), np.nan, dtype=np.float32)
+            grown[:, :size] = bars
+            self.bars[interval] = grown
+        for interval, accumulator in self._open_bars.items():
+            grown = self._empty_accumulator(capacity)
+            grown[:, :size] = accumulator
+            self._open_bars[interval] = grown
+        for name in ('last_price', 'last_volume'):
+            grown = np.full(capacity, np.nan)
+            grown[:size] = getattr(self, name)
+            setattr(self, name, grown)
+        self._bind()
+
+    def update(self, sid, ltp, volume=None, now=0.0):
+        """Apply one tick received at epoch seconds now"""
+        if now >= self._next_boundary:
+            self.advance(now)
+        if self.bar_index < 0:
+            return
+        if sid >= len(self.last_price):
+            self.ensure(sid)
+
+        self.last_price[sid] = ltp
+        open_ = self.open[sid]
+        if open_ != open_:
+            # First trade of the bar
+            self.open[sid] = ltp
+            self.high[sid] = ltp
+            self.low[sid] = ltp
+        elif ltp > self.high[sid]:
+            self.high[sid] = ltp
+        elif ltp < self.low[sid]:
+            self.low[sid] = ltp
+
+        if volume is not None:
+            last_volume = self.last_volume
+            traded = volume - last_volume[sid]
+            last_volume[sid] = volume
+            # NaN (first volume seen) and resets compare False
+            if traded > 0:
+                self.volume[sid] += traded
+
+    def update_batch(self, ids, prices, volumes=None, now=0.0):
+        """Apply a batch of ticks received together; same result as update() per tick"""
+        if now >= self._next_boundary:
+            self.advance(now)
+        ids = np.asarray(ids, dtype=np.intp)
+        if self.bar_index < 0 or ids.size == 0:
+            return
+        prices = np.asarray(prices, dtype=np.float64)
+        self.ensure(int(ids.max()))
+
+        order = np.argsort(ids, kind='stable')
+        sorted_ids = ids[order]
+        sorted_prices = prices[order]
+        first = np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1]))
+        last = np.concatenate((first[1:], [True]))
+
+        opening = first & np.isnan(self.open[sorted_ids])
+        self.open[sorted_ids[opening]] = sorted_prices[opening]
+        self.last_price[sorted_ids[last]] = sorted_prices[last]
+        # fmax/fmin skip the NaN of a bar that has not traded yet
+        np.fmax.at(self.high, ids, prices)
+        np.fmin.at(self.low, ids, prices)
+
+        if volumes is not None:
+            np.add.at(self.volume, ids, traded_quantities(ids, volumes, self.last_volume))
+
+    def advance(self, now):
+        """Seal every bar that ended by now and move to the bar holding now
+
+        Called from the tick path when a boundary has passed, and should be
+        called about once a second by the feed so bars also close while the
+        market is quiet.
+        """
+        if now < self._next_boundary:
+            return
+        day = datetime.fromtimestamp(now, IST).date()
+        if day != self.day:
+            # The old day's bars are dropped with it, so they are not sealed first
+            self._start_day(day)
+
+        count = self.bar_counts[self.base]
+        index = int((now - self.session_start) // self.base)
+        self._seal_until(min(max(index, 0), count))
+
+        if index < 0:
+            self.bar_index = -1
+            self._next_boundary = self.session_start
+        elif index < count:
+            self.bar_index = index
+            self._next_boundary = self.session_start + (index + 1) * self.base
+        else:
+            # Session over; the next call that matters is tomorrow's rollover
+            self.bar_index = -1
+            tomorrow = IST.localize(datetime.combine(day + timedelta(days=1), dt_time(0, 0)))
+            self._next_boundary = tomorrow.timestamp()
+
+    def _start_day(self, day):
+        """Clear the session arrays for a new trading day"""
+        self.day = day
+        self.session_start = IST.localize(datetime.combine(day, self.session_open)).timestamp()
+        for interval in self.intervals:
+            self.bars[interval].fill(np.nan)
+            self.sealed[interval] = 0
+            self._open_bars[interval][:ACCUMULATED_VOLUME] = np.nan
+            self._open_bars[interval][ACCUMULATED_VOLUME] = 0.0
+        # Day volumes restart; last prices carry over to fill idle bars
+        self.last_volume.fill(np.nan)
+
+    def _seal_until(self, count):
+        """Seal base bars until count of them are sealed"""
+        while self.sealed[self.base] < count:
+            self._seal_base()
+
+    def _seal_base(self):
+        """Seal the open base bar for every symbol and roll it into the larger intervals"""
+        current = self._open_bars[self.base]
+        index = self.sealed[self.base]
+        for interval in self.intervals[1:]:
+            accumulator = self._open_bars[interval]
+            np.copyto(accumulator[OPEN], current[OPEN], where=np.isnan(accumulator[OPEN]))
+            np.fmax(accumulator[HIGH], current[HIGH], out=accumulator[HIGH])
+            np.fmin(accumulator[LOW], current[LOW], out=accumulator[LOW])
+            accumulator[ACCUMULATED_VOLUME] += current[ACCUMULATED_VOLUME]
+
+        self._write(self.base, index, current)
+        for interval in self.intervals[1:]:
+            # The session's last bar may be short
+            if (index + 1) % self.multiples[interval] == 0 or index + 1 == self.bar_counts[self.base]:
+                self._write(interval, self.sealed[interval], self._open_bars[interval])
+
+    def _write(self, interval, index, accumulator):
+        """Store one sealed bar per symbol and empty the accumulator
+
+        Symbols without trades get a flat bar at their last price (NaN if
+        they never traded) and zero volume.
+        """
+        bars = self.bars[interval]
+        traded = ~np.isnan(accumulator[OPEN])
+        for field in (OPEN, HIGH, LOW):
+            bars[field, :, index] = self.last_price
+            np.copyto(bars[field, :, index], accumulator[field], where=traded)
+        bars[CLOSE, :, index] = self.last_price
+        bars[VOLUME, :, index] = accumulator[ACCUMULATED_VOLUME]
+
+        accumulator[:ACCUMULATED_VOLUME] = np.nan
+        accumulator[ACCUMULATED_VOLUME] = 0.0
+        self.sealed[interval] = index + 1
+
+    def interval_seconds(self, value):
+        """Configured interval for '300', '300s' or '5m'"""
+        value = str(value).strip().lower()
+        if value.endswith('m'):
+            seconds = int(value[:-1]) * 60
+        else:
+            seconds = int(value.rstrip('s'))
+        if seconds not in self.bar_counts:
+            raise ValueError(f"No {value} candles, expected one of {', '.join(interval_label(i) for i in self.intervals)}")
+        return seconds
+
+    def bar_start(self, interval, index):
+        """Epoch seconds at which bar index of an interval opens"""
+        return self.session_start + index * interval
+
+    def current(self, sid, interval=None):
+        """The open bar of a symbol as a dict, or None outside the session"""
+        interval = interval or self.base
+        if self.bar_index < 0 or sid >= self.capacity:
+            return None
+        bar = self._live(sid, interval)
+        return dict(zip(('start',) + BAR_FIELDS, (self.bar_start(interval, self.sealed[interval]),) + bar))
+
+    def _live(self, sid, interval):
+        """(open, high, low, close, volume) of the open bar, merging sealed base bars for larger intervals"""
+        current = self._open_bars[self.base]
+        open_, high, low, volume = (float(value) for value in current[:, sid])
+        if interval != self.base:
+            partial = self._open_bars[interval]
+            if partial[OPEN, sid] == partial[OPEN, sid]:
+                open_ = float(partial[OPEN, sid])
+                high = max(float(partial[HIGH, sid]), high) if high == high else float(partial[HIGH, sid])
+                low = min(float(partial[LOW, sid]), low) if low == low else float(partial[LOW, sid])
+            volume += float(partial[ACCUMULATED_VOLUME, sid])
+
+        close = float(self.last_price[sid])
+        if open_ != open_:
+            # No trade yet in this bar
+            open_ = high = low = close
+        return open_, high, low, close, volume
+
+    def recent(self, sid, interval=None, count=5):
+        """Up to count most recent sealed bars of a symbol, oldest first"""
+        interval = interval or self.base
+        if sid >= self.capacity:
+            return []
+        end = self.sealed[interval]
+        start = max(end - count, 0)
+        columns = self.bars[interval][:, sid, start:end]
+        return [
+            dict(zip(('start',) + BAR_FIELDS, (self.bar_start(interval, start + offset),) + tuple(
+                None if value != value else float(value) for value in columns[:, offset]
+            )))
+            for offset in range(end - start)
+        ]
+
+    def value(self, sid, indicator):
+        """Current value of a candle indicator for a symbol, or None if undefined"""
+        interval, field = self.indicators[indicator]
+        if self.bar_index < 0 or sid >= self.capacity:
+            return None
+        open_, high, low, close, volume = self._live(sid, interval)
+        if field == 'change_pct':
+            value = (close - open_) / open_ * 100 if open_ > 0 else math.nan
+        elif field == 'range_pct':
+            value = (high - low) / low * 100 if low > 0 else math.nan
+        else:
+            value = volume
+        return None if value != value else value
+
+    def stats(self):
+        """Summary of the session arrays"""
+        return {
+            'day': str(self.day) if self.day else None,
+            'bar_index': self.bar_index,
+            'sealed': {interval_label(interval): count for interval, count in self.sealed.items()},
+            'capacity': self.capacity,
+            'bytes_per_symbol': self.bytes_per_symbol()
+        }
@@ -13,6 +13,112 @@ FYERS_CLIENT_ID = os.getenv('FYERS_CLIENT_ID', "YG04377")  # Your client ID from
 FYERS_SECRET_KEY = os.getenv('FYERS_SECRET_KEY', "e1f8b2c4-0d3f-4a5c-9b6d-7c8e1f2a3b4c")  # Your secret key
 FYERS_REDIRECT_URI = os.getenv('FYERS_REDIRECT_URI', "https://market-update-bot.onrender.com/callback")
 
+# Alert Thresholds (percent move from the price of the symbol's last alert)
+INDEX_ALERT_THRESHOLD = float(os.getenv('INDEX_ALERT_THRESHOLD', "0.5"))
+STOCK_ALERT_THRESHOLD = float(os.getenv('STOCK_ALERT_THRESHOLD', "1.0"))
+ALERT_HYSTERESIS_PCT = float(os.getenv('ALERT_HYSTERESIS_PCT', "0.25"))  # Extra move needed to alert against the last alert's direction
+ALERT_COOLDOWN_SECONDS = float(os.getenv('ALERT_COOLDOWN_SECONDS', "120"))  # Quiet period per symbol after an alert
+ALERT_BREAKOUT_MULTIPLE = float(os.getenv('ALERT_BREAKOUT_MULTIPLE', "2.0"))  # Threshold multiple that alerts despite the cooldown
+
+ALERT_RULES_FILE = os.getenv('ALERT_RULES_FILE', "alert_rules.json")  # Optional per-symbol/group rules
+SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE', "subscriptions.json")  # Optional chats and their symbols; without it every alert goes to TELEGRAM_CHAT_ID
+
+# Alert Dispatch Configuration
+ALERT_QUEUE_SIZE = int(os.getenv('ALERT_QUEUE_SIZE', "1000"))  # Max alerts waiting for a sender worker
+ALERT_WORKERS = int(os.getenv('ALERT_WORKERS', "4"))  # Concurrent alert sender coroutines
+
+# Market Depth Configuration
+DEPTH_BATCH_WINDOW_MS = int(os.getenv('DEPTH_BATCH_WINDOW_MS', "50"))  # Window for coalescing depth requests
+DEPTH_CACHE_TTL = float(os.getenv('DEPTH_CACHE_TTL', "2.0"))  # Seconds a depth snapshot stays fresh
+DEPTH_MAX_BATCH_SIZE = int(os.getenv('DEPTH_MAX_BATCH_SIZE', "50"))  # Symbols per depth request
+
+# Telegram Rate Limits
+TELEGRAM_CHAT_PER_MINUTE = int(os.getenv('TELEGRAM_CHAT_PER_MINUTE', "20"))  # Messages per minute to one group chat
+TELEGRAM_GLOBAL_PER_SECOND = int(os.getenv('TELEGRAM_GLOBAL_PER_SECOND', "30"))  # Messages per second across all chats
+
+# Tick Recorder Configuration
+TICK_RECORDER_ENABLED = os.getenv('TICK_RECORDER_ENABLED', "false").lower() == "true"
+TICK_RECORD_DIR = os.getenv('TICK_RECORD_DIR', "ticks")  # One sub-directory per trading day
+TICK_RECORD_FLUSH_INTERVAL = float(os.getenv('TICK_RECORD_FLUSH_INTERVAL', "1.0"))  # Seconds between flushes
+
+# Upstox Quote Polling Configuration
+UPSTOX_QUOTES_URL = os.getenv('UPSTOX_QUOTES_URL', "https://api.upstox.com/v2/market-quote/quotes")
+UPSTOX_INSTRUMENTS = [
+    key.strip()
+    for key in os.getenv('UPSTOX_INSTRUMENTS', "NSE_INDEX|Nifty 50,NSE_INDEX|Nifty Bank").split(',')
+    if key.strip()
+]
+QUOTE_POLL_INTERVAL = float(os.getenv('QUOTE_POLL_INTERVAL', "1.0"))  # Seconds between polling cycles
+QUOTE_BATCH_SIZE = int(os.getenv('QUOTE_BATCH_SIZE', "500"))  # Instruments per quote request
+QUOTE_POOL_SIZE = int(os.getenv('QUOTE_POOL_SIZE', "4"))  # Pooled connections / concurrent batches
+
+# WebSocket Sharding Configuration
+WS_CONNECTIONS = int(os.getenv('WS_CONNECTIONS', "1"))  # Minimum number of socket connections
+WS_SYMBOLS_PER_CONNECTION = int(os.getenv('WS_SYMBOLS_PER_CONNECTION', "200"))  # Broker cap per connection
+
+# Multi-Process Evaluation Configuration
+PROCESS_WORKERS = int(os.getenv('PROCESS_WORKERS', "0"))  # 0 keeps evaluation in the feed process
+PROCESS_BATCH_SIZE = int(os.getenv('PROCESS_BATCH_SIZE', "256"))  # Ticks per batch sent to a worker
+
+# Token Store Configuration
+TOKEN_STORE_PATH = os.getenv('TOKEN_STORE_PATH', "token_store.json")  # Access tokens with their expiry
+AUTH_HANDOFF_SOCKET = os.getenv('AUTH_HANDOFF_SOCKET', "auth_handoff.sock")  # Callback server -> feed auth handoff
+TOKEN_EXPIRY_TIME = os.getenv('TOKEN_EXPIRY_TIME', "03:30")  # Daily broker token expiry (IST, HH:MM)
+
+# Metrics Configuration
+METRICS_PORT = int(os.getenv('METRICS_PORT', "9100"))  # Feed /metrics port, 0 disables the server
+METRICS_HOST = os.getenv('METRICS_HOST', "127.0.0.1")  # 0.0.0.0 exposes /metrics and /candles on every interface
+
+# Rolling Indicator Configuration
+ROLLING_WINDOW_SECONDS = int(os.getenv('ROLLING_WINDOW_SECONDS', "300"))  # Window for rolling change/VWAP/high/low, 0 disables
+ROLLING_BUCKET_SECONDS = int(os.getenv('ROLLING_BUCKET_SECONDS', "10"))  # Ring buffer resolution
+
+# Candle Configuration
+CANDLE_INTERVALS = [
+    int(seconds)
+    for seconds in os.getenv('CANDLE_INTERVALS', "60,300").split(',')
+    if seconds.strip()
+]  # Bar sizes in seconds, multiples of the smallest; empty disables
+MARKET_OPEN_TIME = os.getenv('MARKET_OPEN_TIME', "09:15")  # Session start (IST, HH:MM)
+MARKET_CLOSE_TIME = os.getenv('MARKET_CLOSE_TIME', "15:30")  # Session end (IST, HH:MM)
+
+# Reconnect Configuration
+RECONNECT_BACKOFF_BASE = float(os.getenv('RECONNECT_BACKOFF_BASE', "1.0"))  # First retry delay in seconds, doubled per failure
+RECONNECT_BACKOFF_MAX = float(os.getenv('RECONNECT_BACKOFF_MAX', "60.0"))  # Cap on the retry delay; retries never stop
+
+# Tick Conflation Configuration
+CONFLATE_TICKS = os.getenv('CONFLATE_TICKS', "true").lower() == "true"  # Keep only the latest tick per symbol while processing catches up
+CONFLATION_MAX_SYMBOLS = int(os.getenv('CONFLATION_MAX_SYMBOLS', "5000"))  # Pending symbols before the overflow policy applies
+CONFLATION_OVERFLOW = os.getenv('CONFLATION_OVERFLOW', "drop_oldest")  # drop_oldest, drop_newest or block
+
+# Logging Configuration
+LOG_LEVEL = os.getenv('LOG_LEVEL', "INFO")  # DEBUG logs every rejected frame (rate-limited)
+LOG_FORMAT = os.getenv('LOG_FORMAT', "json")  # json lines or text
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', "10000"))  # Records buffered for the writer thread; extras are dropped
+
+# Bot Command Configuration
+BOT_COMMANDS_ENABLED = os.getenv('BOT_COMMANDS_ENABLED', "true").lower() == "true"  # Answer /price, /movers and /depth in subscribed chats
+MOVERS_TOP_N = int(os.getenv('MOVERS_TOP_N', "10"))  # Gainers and losers listed by /movers
+MOVERS_REFRESH_SECONDS = float(os.getenv('MOVERS_REFRESH_SECONDS', "5.0"))  # How often the movers ranking is rebuilt
+
+# Instrument Master Configuration
+INSTRUMENT_MASTER_FILES = [
+    path.strip()
+    for path in os.getenv('INSTRUMENT_MASTER_FILES', "").split(',')
+    if path.strip()
+]  # Broker master CSV/JSON files, e.g. NSE_CM.csv,NSE_FO.csv; empty keeps the built-in symbol list
+INSTRUMENT_CACHE_DIR = os.getenv('INSTRUMENT_CACHE_DIR', "instrument_cache")  # Memory-mapped index, rebuilt when a source file changes
+INDEX_MEMBERSHIP_FILES = {
+    name.strip(): path.strip()
+    for name, _, path in (entry.partition('=') for entry in os.getenv('INDEX_MEMBERSHIP_FILES', "").split(','))
+    if path.strip()
+}  # Index name=constituent CSV, e.g. NIFTY 500=ind_nifty500list.csv
+SYMBOL_UNIVERSE = os.getenv('SYMBOL_UNIVERSE', "NSE:NIFTY50-INDEX,NSE:BANKNIFTY-INDEX")  # Index names (need INDEX_MEMBERSHIP_FILES), FNO, segments or symbols
+
+# Price Snapshot Configuration
+PRICE_SNAPSHOT_PATH = os.getenv('PRICE_SNAPSHOT_PATH', "price_snapshot.bin")  # Shared with render_server's /quotes; empty disables
+PRICE_SNAPSHOT_INTERVAL = float(os.getenv('PRICE_SNAPSHOT_INTERVAL', "0.1"))  # Seconds between publishes
+
 # Print configuration status on load
 def validate_config():
     print("Configuration Status:")
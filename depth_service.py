@@ -0,0 +1,140 @@
+import asyncio
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class DepthService:
+    """Coalesce, cache and de-duplicate market depth lookups"""
+
+    def __init__(self, fetch_batch, batch_window=0.05, cache_ttl=2.0, max_batch_size=50):
+        """Initialize DepthService instance
+
+        fetch_batch is a blocking callable taking a list of symbols and
+        returning a dict of symbol -> depth. It runs in a worker thread.
+        """
+        self.fetch_batch = fetch_batch
+        self.batch_window = batch_window
+        self.cache_ttl = cache_ttl
+        self.max_batch_size = max_batch_size
+
+        # symbol -> (expires_at, depth)
+        self._cache = {}
+        # symbol -> future shared by every caller waiting on that symbol
+        self._inflight = {}
+        # symbols collected for the next batch request
+        self._pending = []
+        self._flush_handle = None
+        # Running batch requests; the loop only keeps weak references to tasks
+        self._tasks = set()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    async def get(self, symbol):
+        """Return depth for a symbol, or None if it could not be fetched"""
+        loop = asyncio.get_running_loop()
+
+        cached = self._cache.get(symbol)
+        if cached and cached[0] > loop.time():
+            self.hits += 1
+            return cached[1]
+
+        future = self._inflight.get(symbol)
+        if future is None:
+            self.misses += 1
+            future = loop.create_future()
+            self._inflight[symbol] = future
+            self._pending.append(symbol)
+
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        else:
+            self.coalesced += 1
+
+        # Shield so one cancelled caller does not cancel the shared request
+        return await asyncio.shield(future)
+
+    def peek(self, symbol, now=None):
+        """(depth, age in seconds) from the cache without fetching, or None
+
+        Expired entries are still returned until they are evicted.
+        """
+        cached = self._cache.get(symbol)
+        if cached is None:
+            return None
+        if now is None:
+            now = asyncio.get_running_loop().time()
+        return cached[1], max(now - (cached[0] - self.cache_ttl), 0.0)
+
+    def _flush(self):
+        """Send every pending symbol as one batch request"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        symbols, self._pending = self._pending, []
+        if symbols:
+            task = asyncio.ensure_future(self._fetch(symbols))
+            self._tasks.add(task)
+            task.add_done_callback(functools.partial(self._fetch_done, symbols))
+
+    def _fetch_done(self, symbols, task):
+        """Forget a finished batch; if it failed, log it and release its waiting callers"""
+        self._tasks.discard(task)
+        if task.cancelled():
+            error = "cancelled"
+        elif task.exception() is not None:
+            error = str(task.exception())
+        else:
+            return
+        logger.error(f"Market depth batch for {len(symbols)} symbols failed: {error}")
+        for symbol in symbols:
+            future = self._inflight.pop(symbol, None)
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def _fetch(self, symbols):
+        """Run the blocking batch call and resolve waiting callers"""
+        self.batches += 1
+        try:
+            results = await asyncio.to_thread(self.fetch_batch, symbols)
+        except Exception as e:
+            logger.error(f"Error fetching market depth for {len(symbols)} symbols: {str(e)}", exc_info=True)
+            results = {}
+
+        now = asyncio.get_running_loop().time()
+        for symbol in symbols:
+            depth = results.get(symbol)
+            # Failures are not cached so the next alert retries
+            if depth is not None:
+                self._cache[symbol] = (now + self.cache_ttl, depth)
+
+            future = self._inflight.pop(symbol, None)
+            if future is not None and not future.done():
+                future.set_result(depth)
+
+        self._evict_expired(now)
+
+    def _evict_expired(self, now):
+        """Drop expired cache entries so the cache tracks the active set"""
+        expired = [symbol for symbol, (expires_at, _) in self._cache.items() if expires_at <= now]
+        for symbol in expired:
+            del self._cache[symbol]
+
+    def stats(self):
+        """Snapshot of cache and batching counters"""
+        return {
+            'cached': len(self._cache),
+            'inflight': len(self._inflight),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'batches': self.batches
+        }
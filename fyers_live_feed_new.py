@@ -4,39 +4,251 @@ import telegram
 from datetime import datetime
 import pytz
 import logging
-import asyncio
 import json
 import os
+import queue
+import threading
 import time
+import numpy as np
+from urllib.parse import parse_qs
+from alert_dispatcher import AlertDispatcher
+from alert_rules import RuleEngine
+from bot_commands import BotCommands
+from candles import CandleAggregator, interval_label
+from depth_service import DepthService
+from instrument_master import InstrumentMaster
+from log_pipeline import LogThrottle, setup_logging, dropped_records
+from metrics import REGISTRY, MetricsServer, FAST_BUCKETS, DELIVERY_BUCKETS
+from movers import MoversRanking
+from price_snapshot import SnapshotWriter
+from price_state import PriceState
+from process_workers import WorkerPool
+from rolling_window import RollingWindows
+from subscriptions import SubscriptionRegistry
+from tick_buffer import ConflatingBuffer
+from tick_decoder import TickDecoder, exchange_epoch
+from tick_recorder import TickRecorder
+from token_manager import TokenManager
+from telegram_sender import TelegramSender
+from ws_shards import ShardManager
 from config import (    
     FYERS_CLIENT_ID,
     FYERS_SECRET_KEY,
     FYERS_REDIRECT_URI,
     TELEGRAM_BOT_TOKEN,
-    TELEGRAM_CHAT_ID
+    TELEGRAM_CHAT_ID,
+    ALERT_QUEUE_SIZE,
+    ALERT_WORKERS,
+    DEPTH_BATCH_WINDOW_MS,
+    DEPTH_CACHE_TTL,
+    DEPTH_MAX_BATCH_SIZE,
+    TELEGRAM_CHAT_PER_MINUTE,
+    TELEGRAM_GLOBAL_PER_SECOND,
+    INDEX_ALERT_THRESHOLD,
+    STOCK_ALERT_THRESHOLD,
+    ALERT_HYSTERESIS_PCT,
+    ALERT_COOLDOWN_SECONDS,
+    ALERT_BREAKOUT_MULTIPLE,
+    ALERT_RULES_FILE,
+    SUBSCRIPTIONS_FILE,
+    TICK_RECORDER_ENABLED,
+    TICK_RECORD_DIR,
+    TICK_RECORD_FLUSH_INTERVAL,
+    WS_CONNECTIONS,
+    WS_SYMBOLS_PER_CONNECTION,
+    PROCESS_WORKERS,
+    PROCESS_BATCH_SIZE,
+    TOKEN_STORE_PATH,
+    AUTH_HANDOFF_SOCKET,
+    TOKEN_EXPIRY_TIME,
+    METRICS_PORT,
+    METRICS_HOST,
+    ROLLING_WINDOW_SECONDS,
+    ROLLING_BUCKET_SECONDS,
+    CANDLE_INTERVALS,
+    MARKET_OPEN_TIME,
+    MARKET_CLOSE_TIME,
+    RECONNECT_BACKOFF_BASE,
+    RECONNECT_BACKOFF_MAX,
+    CONFLATE_TICKS,
+    CONFLATION_MAX_SYMBOLS,
+    CONFLATION_OVERFLOW,
+    LOG_LEVEL,
+    LOG_FORMAT,
+    LOG_QUEUE_SIZE,
+    INSTRUMENT_MASTER_FILES,
+    INSTRUMENT_CACHE_DIR,
+    INDEX_MEMBERSHIP_FILES,
+    SYMBOL_UNIVERSE,
+    BOT_COMMANDS_ENABLED,
+    MOVERS_TOP_N,
+    MOVERS_REFRESH_SECONDS,
+    PRICE_SNAPSHOT_PATH,
+    PRICE_SNAPSHOT_INTERVAL
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: records are queued and written by a background thread
+setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE)
 logger = logging.getLogger(__name__)
+# Per-frame diagnostics are rate-limited so bad frames cannot flood the log
+frame_log = LogThrottle(logger)
+
+# Hot-path metrics; histograms preallocate their buckets
+PROCESS_SECONDS = REGISTRY.histogram('process_message_seconds', 'Time to decode and evaluate one frame', FAST_BUCKETS)
+DRAIN_SECONDS = REGISTRY.histogram('conflated_batch_seconds', 'Time to evaluate one drained conflation batch', FAST_BUCKETS)
+DEPTH_FETCH_SECONDS = REGISTRY.histogram('depth_fetch_seconds', 'Market depth REST call latency')
+ALERT_DELIVERY_SECONDS = REGISTRY.histogram('alert_delivery_seconds', 'Tick receipt to Telegram delivery', DELIVERY_BUCKETS)
+EXCHANGE_DELIVERY_SECONDS = REGISTRY.histogram('exchange_to_delivery_seconds', 'Exchange timestamp to Telegram delivery', DELIVERY_BUCKETS)
+
+# Fyers quotes accept at most 50 symbols per call
+QUOTE_SNAPSHOT_BATCH = 50
+# How stale /price's rolling-window figures may get
+WINDOW_VIEW_SECONDS = 1.0
 
 class FyersLiveFeed:
-    def __init__(self):
+    def __init__(self, bot=None):
         """Initialize FyersLiveFeed instance"""
-        # Initialize Telegram bot
-        self.bot = telegram.Bot(token=TELEGRAM_BOT_TOKEN)
+        # Initialize Telegram bot (replay and benchmarks pass a local stand-in)
+        self.bot = bot or telegram.Bot(token=TELEGRAM_BOT_TOKEN)
         # Initialize Fyers API
         self.client_id = FYERS_CLIENT_ID
         self.secret_key = FYERS_SECRET_KEY
         self.redirect_uri = FYERS_REDIRECT_URI
         self.fyers = None
         self.access_token = None
+        self.token_manager = TokenManager(
+            'fyers',
+            store_path=TOKEN_STORE_PATH,
+            handoff_path=AUTH_HANDOFF_SOCKET,
+            expiry_time=TOKEN_EXPIRY_TIME
+        )
         # Initialize data storage
-        self.last_prices = {}
+        self.price_state = PriceState(
+            index_threshold=INDEX_ALERT_THRESHOLD,
+            stock_threshold=STOCK_ALERT_THRESHOLD,
+            hysteresis=ALERT_HYSTERESIS_PCT,
+            cooldown=ALERT_COOLDOWN_SECONDS,
+            breakout_multiple=ALERT_BREAKOUT_MULTIPLE
+        )
+        # Rolling-window indicators (change, VWAP, high/low, volume rate) per symbol
+        self.windows = None
+        if ROLLING_WINDOW_SECONDS > 0:
+            self.windows = RollingWindows(
+                window_seconds=ROLLING_WINDOW_SECONDS,
+                bucket_seconds=ROLLING_BUCKET_SECONDS
+            )
+        # OHLCV bars per symbol, updated after decoding and sealed on time boundaries
+        self.candles = None
+        if CANDLE_INTERVALS:
+            self.candles = CandleAggregator(
+                CANDLE_INTERVALS,
+                session_open=MARKET_OPEN_TIME,
+                session_close=MARKET_CLOSE_TIME
+            )
+        # Rules compile into per-symbol tables as symbols are registered
+        self.rule_engine = RuleEngine.from_file(
+            ALERT_RULES_FILE,
+            self.price_state,
+            windows=self.windows,
+            candles=self.candles
+        )
+        # Chats and the symbols they watch, indexed by symbol
+        self.subscriptions = SubscriptionRegistry.from_file(SUBSCRIPTIONS_FILE, TELEGRAM_CHAT_ID)
+        # Symbols first seen on a tick get their chats' thresholds before they are evaluated
+        self.rule_engine.on_register = self.subscribe_symbol
         self.subscribed_symbols = []
+        # Instrument master index, opened on first universe selection
+        self.instruments = None
+        self.decoder = TickDecoder()
+        # Frames from every socket shard are processed on one thread
+        self.frames = queue.SimpleQueue()
+        # Optional conflation instead: receive threads decode, and only the
+        # latest tick (plus the range since the last drain) per symbol waits
+        self.tick_buffer = None
+        if CONFLATE_TICKS:
+            self.tick_buffer = ConflatingBuffer(
+                max_symbols=CONFLATION_MAX_SYMBOLS,
+                overflow=CONFLATION_OVERFLOW
+            )
+        self.processor = None
+        self.shards = None
+        # Optional multi-core mode: rule evaluation moves to worker processes
+        # that each own a hash-partitioned slice of the symbols
+        self.worker_pool = None
+        if PROCESS_WORKERS > 0:
+            self.worker_pool = WorkerPool(
+                PROCESS_WORKERS,
+                self.submit_alert,
+                rules_file=ALERT_RULES_FILE,
+                index_threshold=INDEX_ALERT_THRESHOLD,
+                stock_threshold=STOCK_ALERT_THRESHOLD,
+                batch_size=PROCESS_BATCH_SIZE,
+                window_seconds=ROLLING_WINDOW_SECONDS,
+                bucket_seconds=ROLLING_BUCKET_SECONDS,
+                candle_intervals=CANDLE_INTERVALS,
+                session=(MARKET_OPEN_TIME, MARKET_CLOSE_TIME),
+                hysteresis=ALERT_HYSTERESIS_PCT,
+                cooldown=ALERT_COOLDOWN_SECONDS,
+                breakout_multiple=ALERT_BREAKOUT_MULTIPLE
+            )
+        # Optional on-disk record of every decoded tick
+        self.recorder = None
+        if TICK_RECORDER_ENABLED:
+            self.recorder = TickRecorder(
+                base_dir=TICK_RECORD_DIR,
+                flush_interval=TICK_RECORD_FLUSH_INTERVAL
+            )
+        # Alerts run on a dedicated event loop so ticks never wait on network I/O
+        self.dispatcher = AlertDispatcher(
+            self.send_price_alert,
+            max_queue_size=ALERT_QUEUE_SIZE,
+            workers=ALERT_WORKERS
+        )
+        # Outbound messages respect Telegram limits and collapse into digests when throttled
+        self.sender = TelegramSender(
+            self.bot,
+            per_chat_per_minute=TELEGRAM_CHAT_PER_MINUTE,
+            global_per_second=TELEGRAM_GLOBAL_PER_SECOND,
+            on_delivered=self.record_delivery
+        )
+        # Chat commands answered from in-memory prices, a periodic movers
+        # ranking and cached depth (worker mode has no rolling windows here)
+        self.movers = MoversRanking(self.price_state, top=MOVERS_TOP_N)
+        self.commands = None
+        self.commands_task = None
+        if BOT_COMMANDS_ENABLED:
+            self.commands = BotCommands(
+                self.bot,
+                self.sender,
+                self.price_state,
+                self.movers,
+                self.cached_depth,
+                windows=None if self.worker_pool else self.windows,
+                allowed_chats=self.subscriptions.chat_ids(),
+                refresh_interval=MOVERS_REFRESH_SECONDS
+            )
+        # Last prices and day changes shared with the web workers through an mmap;
+        # the file is only created once streaming starts, so other feeds (replays,
+        # benchmarks) never replace the live one
+        self.snapshot_path = PRICE_SNAPSHOT_PATH
+        self.snapshot = None
+        self.snapshot_thread = None
+        # Depth lookups from concurrent alerts share batched, cached REST calls
+        self.depth_service = DepthService(
+            self.fetch_market_depth,
+            batch_window=DEPTH_BATCH_WINDOW_MS / 1000,
+            cache_ttl=DEPTH_CACHE_TTL,
+            max_batch_size=DEPTH_MAX_BATCH_SIZE
+        )
+        # Prometheus-style /metrics; counters are read from the components at scrape time
+        self.reconnects = 0
+        self.resyncs = 0
+        self.resync_failures = 0
+        self.metrics_server = None
+        if METRICS_PORT:
+            routes = {'/candles': self.candles_route} if self.candles else None
+            self.metrics_server = MetricsServer(host=METRICS_HOST, port=METRICS_PORT, routes=routes)
+        self.register_metrics()
         # Set up logging directory
         if not os.path.exists('logs'):
             os.makedirs('logs')
@@ -50,35 +262,33 @@ class FyersLiveFeed:
             # Ensure client_id is properly formatted (should be in format: XY00000)
             if not self.client_id:
                 raise ValueError("FYERS_CLIENT_ID is not set")
+
+            # Reuse today's token so a restart skips the login round trip
+            self.access_token = self.token_manager.load()
+            if self.access_token:
+                logger.info("Reusing stored access token")
+            else:
+                session = accessToken.SessionModel(
+                    client_id=self.client_id,
+                    secret_key=self.secret_key,
+                    redirect_uri=self.redirect_uri,
+                    response_type="code",
+                    grant_type="authorization_code"
+                )
                 
-            session = accessToken.SessionModel(
-                client_id=self.client_id,
-                secret_key=self.secret_key,
-                redirect_uri=self.redirect_uri,
-                response_type="code",
-                grant_type="authorization_code"
-            )
-            
-            # Generate and open auth URL
-            auth_url = session.generate_authcode()
-            logger.info("Login to Fyers and authorize the application...")
-            logger.info(f"Login URL: {auth_url}")
-            
-            # Wait for auth_code.txt to be created by callback server
-            while not os.path.exists('auth_code.txt'):
-                logger.info("Waiting for authentication...")
-                import time
-                time.sleep(2)
-            
-            # Read the auth code from file
-            with open('auth_code.txt', 'r') as f:
-                auth_code = f.read().strip()
-            
-            # Delete the file after reading
-            os.remove('auth_code.txt')
-            
-            session.set_token(auth_code)
-            self.access_token = session.generate_token()["access_token"]
+                # Generate and open auth URL
+                auth_url = session.generate_authcode()
+                logger.info("Login to Fyers and authorize the application...")
+                logger.info(f"Login URL: {auth_url}")
+                
+                # Block until the callback server hands the auth code over
+                handoff = self.token_manager.wait_for_handoff()
+                if not handoff or not handoff.get('code'):
+                    raise ValueError("No auth code received")
+                
+                session.set_token(handoff['code'])
+                self.access_token = session.generate_token()["access_token"]
+                self.token_manager.save(self.access_token)
             
             # Initialize Fyers model
             self.fyers = fyersModel.FyersModel(
@@ -94,11 +304,23 @@ class FyersLiveFeed:
             logger.error(f"Authentication failed: {str(e)}")
             return False
     
+    def universe_symbols(self):
+        """Symbols of SYMBOL_UNIVERSE from the instrument master, or None when none is configured"""
+        if not INSTRUMENT_MASTER_FILES:
+            return None
+        if self.instruments is None:
+            self.instruments = InstrumentMaster.load(
+                INSTRUMENT_MASTER_FILES,
+                cache_dir=INSTRUMENT_CACHE_DIR,
+                memberships=INDEX_MEMBERSHIP_FILES
+            )
+        return self.instruments.select(SYMBOL_UNIVERSE)
+
     def get_nifty50_symbols(self):
         """Get NIFTY 50 symbols and format them for Fyers API"""
         try:
-            # Get NIFTY 50 constituents from Fyers API
-            symbols = [
+            # The configured universe from the instrument master, else the built-in list
+            symbols = self.universe_symbols() or [
                 "NSE:NIFTY50-INDEX",    # NIFTY 50 Index
                 "NSE:BANKNIFTY-INDEX",   # Bank NIFTY Index
                 "NSE:RELIANCE-EQ",
@@ -113,6 +335,8 @@ class FyersLiveFeed:
             ]
             
             self.subscribed_symbols = symbols
+            for symbol in symbols:
+                self.subscribe_symbol(symbol)
             logger.info(f"Subscribed to {len(symbols)} symbols")
             return symbols
             
@@ -120,92 +344,358 @@ class FyersLiveFeed:
             logger.error(f"Error getting symbols: {str(e)}")
             return []
 
+    def subscribe_symbol(self, symbol):
+        """Register a symbol's rules and chats, lowering its threshold to the lowest any chat asks for"""
+        sid = self.rule_engine.symbol_id(symbol)
+        if symbol in self.subscriptions:
+            return
+        pct = self.subscriptions.register(symbol, float(self.price_state.threshold[sid]))
+        if pct is not None:
+            self.price_state.lower_threshold(sid, pct)
+            if self.worker_pool:
+                self.worker_pool.lower_threshold(symbol, pct)
+
     def process_message(self, message):
         """Process incoming WebSocket messages"""
+        started = time.perf_counter()
         try:
             if not message:
-                logger.warning("Received empty message")
+                frame_log.warning('empty', "Received empty message")
                 return
-                
-            data = json.loads(message)
-            
-            if 'symbol' not in data:
-                logger.debug("Message missing symbol field")
-                return
-                
-            symbol = data['symbol']
-            ltp = data.get('ltp')
-            
-            if ltp is None:
-                logger.warning(f"No LTP data for symbol {symbol}")
-                return
-                
-            if symbol in self.last_prices:
-                old_price = self.last_prices[symbol]
-                if old_price > 0:  # Prevent division by zero
-                    change = ltp - old_price
-                    change_percent = (change / old_price) * 100
-                    
-                    # Different thresholds for indices and stocks
-                    threshold = 0.5 if "INDEX" in symbol else 1.0
-                    
-                    if abs(change_percent) >= threshold:
-                        asyncio.run(self.send_price_alert(symbol, ltp, change, change_percent))
-            
-            self.last_prices[symbol] = ltp
+
+            received_at = time.time()
+
+            # Heartbeats and other non-tick frames are rejected before parsing
+            ticks = self.decoder.decode(message)
+            if len(ticks) == 1:
+                self.process_tick(ticks[0], received_at)
+            elif ticks:
+                self.process_ticks(ticks, received_at)
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON message: {str(e)}")
+        except ValueError as e:
+            frame_log.error('invalid_json', "Invalid JSON message: %s", e)
         except Exception as e:
-            logger.error(f"Error processing message: {str(e)}", exc_info=True)
+            frame_log.error('process_error', "Error processing message: %s", e, exc_info=True)
+        finally:
+            PROCESS_SECONDS.observe(time.perf_counter() - started)
+
+    def enqueue_frame(self, message):
+        """Receive-thread callback: hand the frame to the processing thread"""
+        if self.tick_buffer is None:
+            self.frames.put(message)
+            return
+
+        received_at = time.time()
+        try:
+            ticks = self.decoder.decode(message)
+        except ValueError as e:
+            frame_log.error('invalid_json', "Invalid JSON message: %s", e)
+            return
+        if not ticks:
+            return
+        # Record raw ticks before conflation merges them away
+        if self.recorder:
+            for tick in ticks:
+                self.recorder.record(tick, received_at)
+        self.tick_buffer.put_many(ticks, received_at)
+
+    def start_processor(self):
+        """Start the shared processing thread if it is not running"""
+        if self.processor and self.processor.is_alive():
+            return
+        self.processor = threading.Thread(target=self._run_processor, name="tick-processor", daemon=True)
+        self.processor.start()
+
+    def start_snapshot_publisher(self):
+        """Create the price snapshot and start its thread if configured and not running"""
+        if not self.snapshot_path or (self.snapshot_thread and self.snapshot_thread.is_alive()):
+            return
+        if self.snapshot is None:
+            try:
+                self.snapshot = SnapshotWriter(self.snapshot_path, capacity=self.price_state.capacity)
+            except OSError as e:
+                logger.error(f"Could not create price snapshot {self.snapshot_path}: {str(e)}")
+                return
+        self.snapshot_thread = threading.Thread(target=self._run_snapshot_publisher, name="snapshot-publisher", daemon=True)
+        self.snapshot_thread.start()
+
+    def _run_snapshot_publisher(self):
+        """Publish last prices and day changes every PRICE_SNAPSHOT_INTERVAL seconds"""
+        last_refresh = 0.0
+        while True:
+            try:
+                now = time.time()
+                # Bot commands normally keep the day base prices current
+                if self.commands is None and now - last_refresh >= MOVERS_REFRESH_SECONDS:
+                    self.movers.refresh(now)
+                    last_refresh = now
+                state = self.price_state
+                last = state.last_price
+                count = min(len(state), len(last))
+                self.snapshot.publish(state.symbols[:count], (last[:count], self.movers.day_changes(count)), now)
+            except Exception as e:
+                logger.error(f"Error publishing price snapshot: {str(e)}", exc_info=True)
+            time.sleep(PRICE_SNAPSHOT_INTERVAL)
+
+    def _run_processor(self):
+        """Drain frames from all shards in arrival order"""
+        if self.tick_buffer is not None:
+            self._run_conflated()
+            return
+        while True:
+            try:
+                message = self.frames.get(timeout=1.0)
+            except queue.Empty:
+                # Bars still close on time while the socket is quiet
+                if self.candles:
+                    self.candles.advance(time.time())
+                self.publish_windows(time.time())
+                continue
+            self.process_message(message)
+            self.publish_windows(time.time())
+            # Ship partial batches as soon as the socket goes quiet
+            if self.worker_pool and self.frames.empty():
+                self.worker_pool.flush()
+
+    def _run_conflated(self):
+        """Evaluate everything pending in the conflating buffer, one batch per drain"""
+        while True:
+            ticks, received_at = self.tick_buffer.drain(timeout=1.0)
+            if not ticks:
+                if self.candles:
+                    self.candles.advance(time.time())
+                self.publish_windows(time.time())
+                continue
+
+            started = time.perf_counter()
+            try:
+                if len(ticks) == 1:
+                    self.process_tick(ticks[0], received_at)
+                else:
+                    self.process_ticks(ticks, received_at)
+                if self.worker_pool:
+                    self.worker_pool.flush()
+                self.publish_windows(received_at)
+            except Exception as e:
+                frame_log.error('process_error', "Error processing conflated ticks: %s", e, exc_info=True)
+            finally:
+                DRAIN_SECONDS.observe(time.perf_counter() - started)
+                self.tick_buffer.task_done()
+
+    def publish_windows(self, now):
+        """Publish rolling-window figures for /price, expired as of now; only from the thread applying ticks"""
+        windows = self.windows
+        # Worker processes own the windows in worker mode
+        if windows is None or self.worker_pool:
+            return
+        if windows.published_at is not None and now - windows.published_at < WINDOW_VIEW_SECONDS:
+            return
+        windows.publish(len(self.price_state), now)
+
+    def process_tick(self, tick, received_at=None):
+        """Evaluate a single decoded tick"""
+        if received_at is None:
+            received_at = time.time()
+        # Conflated ticks were already recorded raw in enqueue_frame
+        if self.recorder and self.tick_buffer is None:
+            self.recorder.record(tick, received_at)
+
+        # Rules are resolved per symbol id at registration
+        ltp = tick.ltp
+        sid = self.rule_engine.symbol_id(tick.symbol)
+        if self.candles:
+            self.candles.update(sid, ltp, tick.volume, received_at)
+        if tick.prev_close is not None:
+            self.movers.set_previous_close(sid, tick.prev_close)
+        if self.worker_pool:
+            # Workers own evaluation; last prices stay here for commands
+            self.price_state.last_price[sid] = ltp
+            self.worker_pool.submit((tick,), received_at)
+            return
+
+        for old_price, change_percent, reason in self.rule_engine.evaluate(sid, ltp, tick.volume, received_at):
+            self.submit_alert(tick.symbol, ltp, ltp - old_price, change_percent, reason, received_at, tick.timestamp)
+
+    def process_ticks(self, ticks, received_at=None):
+        """Evaluate a batch of decoded ticks in one vectorized pass"""
+        if received_at is None:
+            received_at = time.time()
+        if self.recorder and self.tick_buffer is None:
+            for tick in ticks:
+                self.recorder.record(tick, received_at)
+
+        ids = [self.rule_engine.symbol_id(tick.symbol) for tick in ticks]
+        prices = [tick.ltp for tick in ticks]
+        volumes = np.array([tick.volume for tick in ticks], dtype=np.float64)
+        if self.candles:
+            self.candles.update_batch(ids, prices, volumes, received_at)
+        # Day changes on /movers, /price and /quotes are measured from the previous close
+        self.movers.set_previous_close_batch(ids, [tick.prev_close for tick in ticks])
+        if self.worker_pool:
+            # Later ticks of a symbol overwrite earlier ones in the assignment
+            self.price_state.last_price[ids] = prices
+            self.worker_pool.submit(ticks, received_at)
+            return
 
-    async def send_price_alert(self, symbol, ltp, change, change_percent):
+        hits = self.rule_engine.evaluate_batch(ids, prices, volumes, received_at)
+        if not hits:
+            return
+        # Latest exchange timestamp per symbol, only needed when something fired
+        timestamps = {sid: tick.timestamp for sid, tick in zip(ids, ticks)}
+        for sid, ltp, old_price, change_percent, reason in hits:
+            self.submit_alert(self.price_state.symbols[sid], ltp, ltp - old_price, change_percent, reason, received_at, timestamps[sid])
+
+    def submit_alert(self, symbol, ltp, change, change_percent, reason=None, received_at=None, exchange_at=None):
+        """Hand an alert to the dispatcher without blocking the tick thread"""
+        if not self.dispatcher.submit(symbol, ltp, change, change_percent, reason, received_at, exchange_at):
+            dropped = self.dispatcher.dropped
+            if dropped == 1 or dropped % 100 == 0:
+                logger.warning("Alert queue full, dropped %d alerts so far", dropped)
+
+    async def send_price_alert(self, symbol, ltp, change, change_percent, reason=None, received_at=None, exchange_at=None):
         """Send price alert to Telegram"""
         try:
+            groups = self.subscriptions.audience(symbol, ltp, change, change_percent, reason)
+            if not groups:
+                return
+
             ist = pytz.timezone('Asia/Kolkata')
             current_time = datetime.now(ist).strftime('%I:%M %p')
-            
-            # Emoji based on price movement
-            emoji = "🔴" if change < 0 else "🟢"
-            
-            # Get additional market data
-            market_depth = self.get_market_depth(symbol)
-            
-            message = f"""
+
+            # Each threshold tier sees the move since its own last alert
+            sent = set()
+            for tier_change, tier_percent, audience in groups:
+                # Emoji based on price movement
+                emoji = "🔴" if tier_change < 0 else "🟢"
+
+                # One-line form used by compact subscribers and when alerts are merged into a digest
+                summary = f"{emoji} {symbol} ₹{ltp:,.2f} ({tier_percent:+.2f}%) {current_time}"
+                if reason:
+                    summary += f" - {reason}"
+
+                # Each template is rendered once per tier, whatever the number of chats
+                messages = {'compact': summary}
+                if any(subscriber.template == 'full' for subscriber in audience):
+                    messages['full'] = await self.render_full_alert(
+                        symbol, ltp, tier_change, tier_percent, reason, emoji, current_time
+                    )
+
+                for subscriber in audience:
+                    if subscriber.chat_id in sent:
+                        continue
+                    sent.add(subscriber.chat_id)
+                    await self.sender.send(
+                        subscriber.chat_id,
+                        messages[subscriber.template],
+                        summary=summary,
+                        origin=(received_at, exchange_at)
+                    )
+        except Exception as e:
+            logger.error(f"Error sending price alert: {str(e)}", exc_info=True)
+
+    async def render_full_alert(self, symbol, ltp, change, change_percent, reason, emoji, current_time):
+        """Full alert message with market depth"""
+        # Get additional market data
+        market_depth = await self.get_market_depth(symbol)
+
+        # Depth values are 'N/A' strings when the lookup failed
+        volume = market_depth['volume']
+        if isinstance(volume, (int, float)):
+            volume = f"{volume:,}"
+
+        # Level and band rules say which line was crossed
+        rule_line = f"\nRule: {reason}" if reason else ""
+
+        return f"""
 {emoji} Live Market Update ({current_time})
 
 {symbol}
 Price: ₹{ltp:,.2f}
-Change: ₹{change:,.2f} ({change_percent:.2f}%)
+Change: ₹{change:,.2f} ({change_percent:.2f}%){rule_line}
 
 Market Depth:
 Bid: {market_depth['bid_price']} ({market_depth['bid_qty']})
 Ask: {market_depth['ask_price']} ({market_depth['ask_qty']})
-Volume: {market_depth['volume']:,}
+Volume: {volume}
 """
-            await self.bot.send_message(
-                chat_id=-1002501251184,
-                text=message,
-                parse_mode='Markdown'
-            )
-        except Exception as e:
-            logger.error(f"Error sending price alert: {str(e)}", exc_info=True)
 
-    def get_market_depth(self, symbol):
+    def record_delivery(self, origins, delivered_at):
+        """Sender callback: observe end-to-end latency of delivered alerts"""
+        for origin in origins:
+            if origin is None:
+                continue
+            received_at, exchange_at = origin
+            if received_at is not None:
+                ALERT_DELIVERY_SECONDS.observe(delivered_at - received_at)
+            exchange_time = exchange_epoch(exchange_at)
+            if exchange_time is not None:
+                EXCHANGE_DELIVERY_SECONDS.observe(delivered_at - exchange_time)
+
+    def register_metrics(self):
+        """Expose component counters and queue depths without touching the tick path"""
+        decoder = self.decoder
+        REGISTRY.counter('frames_received_total', 'Frames received from the feed', fn=lambda: decoder.frames)
+        REGISTRY.counter('ticks_decoded_total', 'Ticks decoded from received frames', fn=lambda: decoder.decoded)
+        REGISTRY.counter('ticks_rejected_total', 'Frames or entries rejected by the decoder', fn=lambda: decoder.rejected)
+        REGISTRY.counter('alerts_submitted_total', 'Alerts handed to the dispatcher', fn=lambda: self.dispatcher.submitted)
+        REGISTRY.counter('alerts_suppressed_total', 'Threshold moves held back by hysteresis or cooldown', fn=lambda: self.price_state.suppressed)
+        REGISTRY.counter('alerts_dropped_total', 'Alerts dropped because the dispatcher queue was full', fn=lambda: self.dispatcher.dropped)
+        REGISTRY.counter('telegram_sent_total', 'Telegram messages sent', fn=lambda: self.sender.sent)
+        REGISTRY.counter('telegram_failed_total', 'Alerts that could not be delivered', fn=lambda: self.sender.failed)
+        REGISTRY.counter('log_records_dropped_total', 'Log records dropped because the log queue was full', fn=dropped_records)
+        REGISTRY.counter('reconnects_total', 'Feed reconnect attempts', fn=self.reconnect_count)
+        REGISTRY.counter('gap_resyncs_total', 'Quote snapshots taken after a feed gap', fn=lambda: self.resyncs)
+        REGISTRY.counter('gap_resync_failures_total', 'Failed quote snapshots after a feed gap', fn=lambda: self.resync_failures)
+        REGISTRY.gauge('frame_queue_depth', 'Frames waiting for the processing thread', fn=self.frames.qsize)
+        if self.tick_buffer is not None:
+            buffer = self.tick_buffer
+            REGISTRY.counter('ticks_conflated_total', 'Ticks replaced by a newer tick of the same symbol', fn=lambda: buffer.conflated)
+            REGISTRY.counter('ticks_overflow_dropped_total', 'Ticks dropped by the conflation overflow policy', fn=lambda: buffer.dropped)
+            REGISTRY.gauge('conflation_pending_symbols', 'Symbols waiting in the conflating buffer', fn=lambda: len(buffer))
+        if self.commands:
+            commands = self.commands
+            REGISTRY.counter('bot_commands_total', 'Chat commands answered', fn=lambda: commands.commands)
+        if self.snapshot_path:
+            REGISTRY.counter('price_snapshot_publishes_total', 'Price snapshots published for /quotes',
+                             fn=lambda: self.snapshot.publishes if self.snapshot else 0)
+        REGISTRY.gauge('alert_queue_depth', 'Alerts waiting in the dispatcher', fn=lambda: self.dispatcher.pending)
+        REGISTRY.gauge('telegram_queue_depth', 'Messages waiting for Telegram rate limits', fn=lambda: self.sender.queue_depth())
+
+    def candles_route(self, query):
+        """Status route: open and recent bars for ?symbol=A,B&interval=5m&count=N as JSON"""
+        params = parse_qs(query)
+        symbols = [s for value in params.get('symbol', []) for s in value.split(',') if s]
+        if not symbols:
+            raise ValueError("symbol is required")
+        interval = self.candles.interval_seconds(params.get('interval', [str(self.candles.base)])[0])
+        count = max(min(int(params.get('count', ['5'])[0]), self.candles.bar_counts[interval]), 0)
+
+        bars = {}
+        for symbol in symbols:
+            sid = self.price_state.symbol_ids.get(symbol)
+            if sid is None:
+                raise KeyError(f"Unknown symbol {symbol}")
+            bars[symbol] = {
+                'current': self.candles.current(sid, interval),
+                'recent': self.candles.recent(sid, interval, count)
+            }
+        body = {'interval': interval_label(interval), 'session': str(self.candles.day), 'bars': bars}
+        return json.dumps(body), 'application/json'
+
+    def reconnect_count(self):
+        """Feed-level plus per-shard reconnects"""
+        shard_reconnects = sum(shard.reconnects for shard in self.shards.shards) if self.shards else 0
+        return self.reconnects + shard_reconnects
+
+    async def get_market_depth(self, symbol):
         """Get market depth data for a symbol"""
         try:
-            depth = self.fyers.get_market_depth(symbols=symbol)
-            data = depth['d'][0]
-            
-            return {
-                'bid_price': data['bids'][0]['price'],
-                'bid_qty': data['bids'][0]['qty'],
-                'ask_price': data['asks'][0]['price'],
-                'ask_qty': data['asks'][0]['qty'],
-                'volume': data['tot_qty']
-            }
+            depth = await self.depth_service.get(symbol)
+            if depth is None:
+                raise ValueError(f"No market depth returned for {symbol}")
+            return depth
         except Exception as e:
-            logger.error(f"Error getting market depth: {str(e)}", exc_info=True)
+            logger.error(f"Error getting market depth: {str(e)}")
             return {
                 'bid_price': 'N/A',
                 'bid_qty': 'N/A',
@@ -214,87 +704,177 @@ Volume: {market_depth['volume']:,}
                 'volume': 'N/A'
             }
 
+    async def cached_depth(self, symbol):
+        """(depth, age in seconds) for /depth: the cached copy, else one batched fetch"""
+        cached = self.depth_service.peek(symbol)
+        if cached is not None:
+            return cached
+        depth = await self.depth_service.get(symbol)
+        return depth, 0.0
+
+    def fetch_market_depth(self, symbols):
+        """Fetch market depth for several symbols in one REST call"""
+        started = time.perf_counter()
+        try:
+            depth = self.fyers.get_market_depth(symbols=",".join(symbols))
+        finally:
+            DEPTH_FETCH_SECONDS.observe(time.perf_counter() - started)
+
+        results = {}
+        for index, data in enumerate(depth['d']):
+            symbol = data.get('symbol', symbols[index] if index < len(symbols) else None)
+            if symbol is None:
+                continue
+            results[symbol] = {
+                'bid_price': data['bids'][0]['price'],
+                'bid_qty': data['bids'][0]['qty'],
+                'ask_price': data['asks'][0]['price'],
+                'ask_qty': data['asks'][0]['qty'],
+                'volume': data['tot_qty']
+            }
+        return results
+
+    def fetch_quotes(self, symbols):
+        """Last traded price per symbol from bulk quote calls"""
+        prices = {}
+        for i in range(0, len(symbols), QUOTE_SNAPSHOT_BATCH):
+            batch = symbols[i:i + QUOTE_SNAPSHOT_BATCH]
+            response = self.fyers.quotes({"symbols": ",".join(batch)})
+            if response.get('s') != 'ok':
+                raise RuntimeError(f"Quote snapshot failed: {response.get('message', response)}")
+            for data in response.get('d', []):
+                ltp = (data.get('v') or {}).get('lp')
+                if data.get('n') and ltp:
+                    prices[data['n']] = float(ltp)
+        return prices
+
+    def rebase_prices(self, symbols, prices):
+        """Overwrite reference prices wherever the symbols are evaluated"""
+        if self.worker_pool:
+            self.worker_pool.rebase(symbols, prices)
+            return
+        ids = [self.rule_engine.symbol_id(symbol) for symbol in symbols]
+        self.price_state.rebase(ids, prices)
+
+    def resync(self, symbols):
+        """Refresh symbols that missed ticks, right before they are resubscribed
+
+        Their prices are forgotten first, so if the snapshot fails the next
+        tick only sets a new reference instead of alerting against a price
+        from before the gap.
+        """
+        self.rebase_prices(symbols, [np.nan] * len(symbols))
+        try:
+            quotes = self.fetch_quotes(list(symbols))
+        except Exception as e:
+            self.resync_failures += 1
+            logger.warning(f"Quote snapshot for {len(symbols)} symbols failed: {str(e)}")
+            return
+        self.rebase_prices(list(quotes), list(quotes.values()))
+        self.resyncs += 1
+        logger.info(f"Refreshed {len(quotes)}/{len(symbols)} symbols from a quote snapshot")
+
+    def start_services(self):
+        """Start the background components shared by every data source"""
+        self.dispatcher.start()
+        if self.metrics_server:
+            self.metrics_server.start()
+        if self.recorder:
+            self.recorder.start()
+        if self.worker_pool:
+            self.worker_pool.start()
+        if self.commands and self.commands_task is None:
+            self.commands_task = self.dispatcher.run_coroutine(self.commands.run())
+        self.start_snapshot_publisher()
+
     def start_streaming(self):
         """Start WebSocket connection"""
         try:
+            self.start_services()
+
             # Get symbols to subscribe
             symbols = self.get_nifty50_symbols()
             if not symbols:
                 logger.error("No symbols to subscribe to")
                 return
             
-            # Initialize WebSocket connection
-            data_type = "symbolData"
-            ws_access_token = f"{self.client_id}:{self.access_token}"
-            
-            def on_connect():
-                logger.info("Connected to Fyers WebSocket")
-                
-            def on_message(message):
-                self.process_message(message)
-                
-            def on_error(error):
-                logger.error(f"WebSocket error: {error}")
-                
-            def on_close():
-                logger.warning("WebSocket connection closed")
-                self.reconnect()
-                
-            # Create WebSocket client
-            self.ws = ws.FyersSocket(
-                access_token=ws_access_token,
-                run_background=True,
-                log_path="logs/"
+            self.start_processor()
+
+            # Split the universe across socket connections; a dropped shard
+            # is resynced from a quote snapshot and resubscribed on its own
+            if self.shards:
+                self.shards.stop()
+            self.shards = ShardManager(
+                self.create_socket,
+                self.enqueue_frame,
+                data_type="symbolData",
+                symbols_per_connection=WS_SYMBOLS_PER_CONNECTION,
+                connections=WS_CONNECTIONS,
+                on_gap=self.resync,
+                backoff_base=RECONNECT_BACKOFF_BASE,
+                backoff_max=RECONNECT_BACKOFF_MAX
             )
-            
-            # Set callbacks
-            self.ws.on_connect = on_connect
-            self.ws.on_message = on_message
-            self.ws.on_error = on_error
-            self.ws.on_close = on_close
-            
-            # Subscribe to symbols
-            self.ws.subscribe(symbols=symbols, data_type=data_type)
-            self.ws.keep_running()
+            self.shards.start(symbols)
             
         except Exception as e:
             logger.error(f"Error starting WebSocket: {str(e)}", exc_info=True)
 
+    def create_socket(self):
+        """Create a WebSocket client running on its own background thread"""
+        return ws.FyersSocket(
+            access_token=f"{self.client_id}:{self.access_token}",
+            run_background=True,
+            log_path="logs/"
+        )
+
     def reconnect(self):
-        """Attempt to reconnect WebSocket"""
-        max_retries = 5
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                logger.info(f"Attempting to reconnect... (Attempt {retry_count + 1}/{max_retries})")
-                if hasattr(self, 'ws'):
-                    self.ws.close()
-                self.start_streaming()
-                return
-            except Exception as e:
-                logger.error(f"Reconnection failed: {str(e)}", exc_info=True)
-                retry_count += 1
-                import time
-                time.sleep(min(5 * retry_count, 30))  # Exponential backoff with 30s cap
-        
-        logger.error("Max reconnection attempts reached. Please check your connection and restart the application.")
+        """Reconnect every WebSocket shard; supervisors retry in the background until they succeed"""
+        if self.shards:
+            self.shards.restart()
+            return
+        self.reconnects += 1
+        self.start_streaming()
 
 def main():
     """Main entry point of the application"""
+    feed = None
     try:
         feed = FyersLiveFeed()
         if feed.authenticate():
             feed.start_streaming()
-            
-            # Keep the main thread running
-            import time
+
+            # Keep the main thread running and report dispatcher health
+            last_report = time.time()
             while True:
                 time.sleep(1)
+                if time.time() - last_report >= 60:
+                    logger.info(f"Alert dispatcher stats: {feed.dispatcher.stats()}")
+                    logger.info(f"Depth service stats: {feed.depth_service.stats()}")
+                    logger.info(f"Telegram sender stats: {feed.sender.stats()}")
+                    logger.info(f"Tick decoder stats: {feed.decoder.stats()}")
+                    if feed.tick_buffer is not None:
+                        logger.info(f"Tick buffer stats: {feed.tick_buffer.stats()}")
+                    if feed.shards:
+                        logger.info(f"WebSocket shard stats: {feed.shards.stats()}")
+                    if feed.worker_pool:
+                        logger.info(f"Worker pool stats: {feed.worker_pool.stats()}")
+                    if feed.commands:
+                        logger.info(f"Bot command stats: {feed.commands.stats()}")
+                    if feed.snapshot:
+                        logger.info(f"Price snapshot stats: {feed.snapshot.stats()}")
+                    last_report = time.time()
         else:
             logger.error("Authentication failed. Please check your credentials and try again.")
     except KeyboardInterrupt:
         logger.info("Application stopped by user")
+        # Ctrl-C can arrive before the feed was built
+        if feed is None:
+            return
+        if feed.worker_pool:
+            feed.worker_pool.stop()
+        feed.dispatcher.stop()
+        if feed.recorder:
+            feed.recorder.stop()
     except Exception as e:
         logger.error(f"Application error: {str(e)}", exc_info=True)
 
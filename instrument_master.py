@@ -0,0 +1,328 @@
+import csv
+import gzip
+import itertools
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+TABLE_FILE = 'instruments.npy'
+META_FILE = 'instruments.json'
+
+# Instrument kinds stored in the segment column
+SEGMENTS = ('OTHER', 'EQ', 'INDEX', 'FUT', 'OPT')
+SEGMENT_CODES = {name: code for code, name in enumerate(SEGMENTS)}
+TYPE_SEGMENTS = {
+    'EQ': 'EQ', 'EQUITY': 'EQ', 'BE': 'EQ', 'INDEX': 'INDEX',
+    'FUT': 'FUT', 'FUTIDX': 'FUT', 'FUTSTK': 'FUT',
+    'CE': 'OPT', 'PE': 'OPT', 'OPTIDX': 'OPT', 'OPTSTK': 'OPT'
+}
+
+# Flag bits: bit 0 marks F&O underlyings, membership lists take the bits after it
+FNO_UNDERLYING = 1
+MAX_MEMBERSHIPS = 31
+FNO_SELECTORS = ('FNO', 'F&O', 'FNOUNDERLYINGS', 'F&OUNDERLYINGS')
+
+# Column names accepted in CSV headers and JSON records, in order of preference
+SYMBOL_KEYS = ('symbol', 'instrument_key', 'symbol_ticker', 'ticker')
+NAME_KEYS = ('trading_symbol', 'tradingsymbol')
+UNDERLYING_KEYS = ('underlying_symbol', 'underlying', 'asset_symbol')
+TYPE_KEYS = ('instrument_type', 'segment')
+LOT_KEYS = ('lot_size', 'lotsize', 'minimum_lot_size')
+TICK_KEYS = ('tick_size', 'ticksize')
+
+# Columns of the headerless Fyers symbol master
+FYERS_COLUMNS = {'lot_size': 3, 'tick_size': 4, 'symbol': 9, 'underlying': 13}
+
+
+def _normalize(selector):
+    """Case- and space-insensitive form of a universe or membership name"""
+    return selector.upper().replace(' ', '').replace('_', '')
+
+
+def _first(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value not in (None, ''):
+            return str(value).strip()
+    return ''
+
+
+def _number(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _segment(symbol, instrument_type=''):
+    """Instrument kind from an explicit type field, else from the symbol suffix"""
+    instrument_type = instrument_type.upper()
+    for key in (instrument_type, instrument_type.rpartition('_')[2]):
+        if key in TYPE_SEGMENTS:
+            return TYPE_SEGMENTS[key]
+    if symbol.endswith('-INDEX'):
+        return 'INDEX'
+    if symbol.endswith('FUT'):
+        return 'FUT'
+    if symbol[-2:] in ('CE', 'PE') and symbol[-3:-2].isdigit():
+        return 'OPT'
+    if '-' in symbol:
+        return 'EQ'
+    return 'OTHER'
+
+
+def _base_name(symbol):
+    """Trading name of a broker symbol: NSE:SBIN-EQ -> SBIN"""
+    return symbol.partition(':')[2].rpartition('-')[0] or symbol
+
+
+def _open(path):
+    return gzip.open(path, 'rt') if path.endswith('.gz') else open(path, 'r', newline='')
+
+
+def _record(record):
+    """(symbol, name, underlying, segment, lot size, tick size) from a keyed record"""
+    symbol = _first(record, SYMBOL_KEYS)
+    segment = _segment(symbol, _first(record, TYPE_KEYS))
+    name = _first(record, NAME_KEYS) or _base_name(symbol)
+    underlying = _first(record, UNDERLYING_KEYS)
+    if not underlying and segment in ('FUT', 'OPT'):
+        underlying = _first(record, ('name',))
+    return (symbol, name, underlying, segment,
+            _number(_first(record, LOT_KEYS), 1), _number(_first(record, TICK_KEYS), 0.05))
+
+
+def read_master(path):
+    """Yield instrument tuples from a CSV (with header or Fyers layout) or JSON master"""
+    with _open(path) as f:
+        if path.endswith(('.json', '.json.gz')):
+            data = json.load(f)
+            for record in data.get('data', []) if isinstance(data, dict) else data:
+                yield _record({key.lower(): value for key, value in record.items()})
+            return
+
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        keys = [column.strip().lower().replace(' ', '_') for column in header]
+        if any(key in SYMBOL_KEYS for key in keys):
+            for row in reader:
+                yield _record(dict(zip(keys, row)))
+            return
+
+        # Headerless Fyers layout: the first line is already data
+        columns = FYERS_COLUMNS
+        width = max(columns.values()) + 1
+        for row in itertools.chain([header], reader):
+            if len(row) < width:
+                continue
+            symbol = row[columns['symbol']].strip()
+            segment = _segment(symbol)
+            underlying = row[columns['underlying']].strip() if segment in ('FUT', 'OPT') else ''
+            yield (symbol, _base_name(symbol), underlying, segment,
+                   _number(row[columns['lot_size']], 1), _number(row[columns['tick_size']], 0.05))
+
+
+def read_members(path):
+    """Symbols or trading names listed in an index constituent file
+
+    Accepts the exchange's constituent CSV (a Symbol column) or one symbol
+    per line.
+    """
+    with _open(path) as f:
+        rows = [row for row in csv.reader(f) if row]
+    if not rows:
+        return set()
+    keys = [column.strip().lower() for column in rows[0]]
+    if 'symbol' in keys:
+        column = keys.index('symbol')
+        return {row[column].strip() for row in rows[1:] if len(row) > column}
+    return {row[0].strip() for row in rows}
+
+
+class InstrumentMaster:
+    """Read-only instrument index backed by a memory-mapped NumPy table
+
+    The broker's instrument master is parsed once into a structured array
+    sorted by symbol (symbol, segment, lot size, tick size and a bit set of
+    index memberships) and cached on disk; later starts map the cached table
+    instead of parsing the master again, so only the pages that are touched
+    are read. A symbol's id is its row number, found by binary search.
+    """
+
+    def __init__(self, table, memberships=()):
+        """Initialize InstrumentMaster instance"""
+        self.table = table
+        self.symbols = table['symbol']
+        # Membership name -> flag bit
+        self.memberships = {name: 1 << (bit + 1) for bit, name in enumerate(memberships)}
+
+    @classmethod
+    def load(cls, paths, cache_dir="instrument_cache", memberships=None):
+        """Open the index for these master files, rebuilding the cache if any source changed
+
+        memberships maps an index name (e.g. "NIFTY 500") to its constituent file.
+        """
+        memberships = dict(memberships or {})
+        if len(memberships) > MAX_MEMBERSHIPS:
+            raise ValueError(f"At most {MAX_MEMBERSHIPS} membership lists are supported")
+        sources = [cls._source(path) for path in list(paths) + list(memberships.values())]
+        meta = {'version': CACHE_VERSION, 'sources': sources, 'memberships': list(memberships)}
+
+        table_path = os.path.join(cache_dir, TABLE_FILE)
+        meta_path = os.path.join(cache_dir, META_FILE)
+        try:
+            with open(meta_path, 'r') as f:
+                fresh = json.load(f) == meta
+        except (OSError, ValueError):
+            fresh = False
+
+        if not fresh:
+            table = cls.build(paths, memberships)
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(table_path + '.tmp', 'wb') as f:
+                np.save(f, table)
+            os.replace(table_path + '.tmp', table_path)
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+            logger.info(f"Indexed {len(table)} instruments into {cache_dir}")
+
+        return cls(np.load(table_path, mmap_mode='r'), list(memberships))
+
+    @staticmethod
+    def _source(path):
+        stat = os.stat(path)
+        return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def build(paths, memberships=None):
+        """Parse master files into the sorted structured array"""
+        rows = {}
+        underlyings = set()
+        for path in paths:
+            for symbol, name, underlying, segment, lot_size, tick_size in read_master(path):
+                if not symbol:
+                    continue
+                rows[symbol] = (name, SEGMENT_CODES[segment], lot_size, tick_size)
+                if underlying:
+                    underlyings.add(underlying)
+
+        members = [read_members(path) for path in (memberships or {}).values()]
+        symbols = sorted(rows)
+        columns = list(zip(*(rows[symbol] for symbol in symbols))) or [()] * 4
+        names, segments, lot_sizes, tick_sizes = columns
+        table = np.zeros(len(symbols), dtype=[
+            ('symbol', f'S{max((len(symbol.encode()) for symbol in symbols), default=1)}'),
+            ('segment', 'u1'),
+            ('lot_size', '<i4'),
+            ('tick_size', '<f4'),
+            ('flags', '<u4')
+        ])
+        table['symbol'] = [symbol.encode() for symbol in symbols]
+        table['segment'] = segments
+        table['lot_size'] = lot_sizes
+        table['tick_size'] = tick_sizes
+
+        # Only cash instruments carry F&O and index membership flags
+        flags = table['flags']
+        for row in np.flatnonzero(np.isin(table['segment'], (SEGMENT_CODES['EQ'], SEGMENT_CODES['INDEX']))):
+            symbol, name = symbols[row], names[row]
+            if name in underlyings:
+                flags[row] |= FNO_UNDERLYING
+            for bit, listed in enumerate(members):
+                if symbol in listed or name in listed:
+                    flags[row] |= 1 << (bit + 1)
+        return table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, symbol):
+        return self.lookup(symbol) is not None
+
+    def lookup(self, symbol):
+        """Id of a symbol, or None if the master does not list it"""
+        key = symbol.encode()
+        row = int(np.searchsorted(self.symbols, key))
+        if row < len(self.symbols) and self.symbols[row] == key:
+            return row
+        return None
+
+    def ids(self, symbols):
+        """Ids for many symbols at once; -1 for unknown symbols"""
+        keys = np.array([symbol.encode() for symbol in symbols], dtype=self.symbols.dtype)
+        rows = np.searchsorted(self.symbols, keys)
+        found = rows < len(self.symbols)
+        found[found] = self.symbols[rows[found]] == keys[found]
+        return np.where(found, rows, -1)
+
+    def info(self, symbol):
+        """Segment, lot size, tick size and memberships of a symbol, or None"""
+        row = self.lookup(symbol)
+        if row is None:
+            return None
+        entry = self.table[row]
+        flags = int(entry['flags'])
+        return {
+            'id': row,
+            'symbol': symbol,
+            'segment': SEGMENTS[entry['segment']],
+            'lot_size': int(entry['lot_size']),
+            'tick_size': round(float(entry['tick_size']), 6),
+            'fno_underlying': bool(flags & FNO_UNDERLYING),
+            'indices': [name for name, bit in self.memberships.items() if flags & bit]
+        }
+
+    def select(self, universe):
+        """Symbols of a universe such as "NIFTY 500" or "F&O underlyings"
+
+        universe is a comma-separated list (or a list) of selectors, unioned:
+        a membership name, FNO for F&O underlyings, a segment name (EQ, INDEX,
+        FUT, OPT), ALL for every cash instrument, or a literal symbol.
+        Literal symbols come first, then the rest in index order. Unknown
+        selectors, such as an index without a membership file, are logged
+        and skipped.
+        """
+        if isinstance(universe, str):
+            universe = universe.split(',')
+        selectors = [selector.strip() for selector in universe if selector.strip()]
+
+        literals = []
+        mask = np.zeros(len(self.table), dtype=bool)
+        memberships = {_normalize(name): bit for name, bit in self.memberships.items()}
+        for selector in selectors:
+            if ':' in selector or '|' in selector:
+                if selector not in self:
+                    logger.warning(f"{selector} is not in the instrument master")
+                literals.append(selector)
+                continue
+            key = _normalize(selector)
+            if key in FNO_SELECTORS:
+                mask |= (self.table['flags'] & FNO_UNDERLYING) != 0
+            elif key in memberships:
+                mask |= (self.table['flags'] & memberships[key]) != 0
+            elif key in SEGMENT_CODES:
+                mask |= self.table['segment'] == SEGMENT_CODES[key]
+            elif key == 'ALL':
+                mask |= np.isin(self.table['segment'], (SEGMENT_CODES['EQ'], SEGMENT_CODES['INDEX']))
+            else:
+                logger.warning(f"Unknown universe selector {selector}, skipping it")
+
+        selected = dict.fromkeys(literals)
+        for key in self.symbols[mask]:
+            selected.setdefault(key.decode())
+        return list(selected)
+
+    def stats(self):
+        """Size of the index"""
+        return {
+            'instruments': len(self.table),
+            'bytes': int(self.table.nbytes),
+            'memberships': list(self.memberships)
+        }
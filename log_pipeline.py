@@ -0,0 +1,134 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from datetime import datetime, timezone
+
+# LogRecord attributes that are not user-supplied extra fields
+STANDARD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the logging thread
+
+    Records are queued as they are: message formatting happens on the
+    writer thread. When the queue is full the record is dropped and
+    counted instead of waiting.
+    """
+
+    def __init__(self, log_queue):
+        """Initialize DroppingQueueHandler instance"""
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # In-process queue: no need to pre-format for pickling
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogThrottle:
+    """Rate-limit a repeating log message per key
+
+    At most one record per key is emitted every interval seconds; the next
+    one reports how many were suppressed in between. Suppressed calls cost a
+    dict lookup and never build a LogRecord.
+    """
+
+    def __init__(self, logger, interval=10.0):
+        """Initialize LogThrottle instance"""
+        self.logger = logger
+        self.interval = interval
+        # key -> [next allowed time, suppressed count]
+        self._keys = {}
+
+    def log(self, level, key, msg, *args, **kwargs):
+        """Log msg % args unless key was logged less than interval ago"""
+        now = time.monotonic()
+        state = self._keys.get(key)
+        if state is not None and now < state[0]:
+            state[1] += 1
+            return
+        if not self.logger.isEnabledFor(level):
+            return
+
+        suppressed = state[1] if state else 0
+        self._keys[key] = [now + self.interval, 0]
+        if suppressed:
+            msg += " (%d similar suppressed)"
+            args += (suppressed,)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, key, msg, *args, **kwargs):
+        self.log(logging.DEBUG, key, msg, *args, **kwargs)
+
+    def warning(self, key, msg, *args, **kwargs):
+        self.log(logging.WARNING, key, msg, *args, **kwargs)
+
+    def error(self, key, msg, *args, **kwargs):
+        self.log(logging.ERROR, key, msg, *args, **kwargs)
+
+
+def setup_logging(level='INFO', fmt='json', queue_size=10000, stream=None):
+    """Route all logging through a bounded queue to a background writer thread
+
+    Callers only enqueue the record; formatting and the actual write happen
+    on the listener thread. fmt is 'json' for JSON lines or 'text' for the
+    classic one-line format. Safe to call more than once; the first call wins.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    _listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level=True)
+    _listener.handler = handler
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def dropped_records():
+    """Records dropped because the log queue was full"""
+    return _listener.handler.dropped if _listener else 0
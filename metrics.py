@@ -0,0 +1,232 @@
+import bisect
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Bucket bounds in seconds
+FAST_BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+NETWORK_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DELIVERY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _format(value):
+    """Prometheus text representation of a sample value"""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic counter; fn, if given, is read at scrape time instead"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, fn=None):
+        """Initialize Counter instance"""
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Add to the counter"""
+        self.value += amount
+
+    def samples(self):
+        """(name, labels, value) tuples for rendering"""
+        yield self.name, None, self.fn() if self.fn else self.value
+
+
+class Gauge(Counter):
+    """Value that can go up and down, e.g. a queue depth read at scrape time"""
+
+    kind = 'gauge'
+
+    def set(self, value):
+        """Replace the gauge value"""
+        self.value = value
+
+
+class Histogram:
+    """Fixed-bucket histogram
+
+    Buckets are allocated once; observe() is a bisect and two additions,
+    and cumulative counts are only built when scraped.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=NETWORK_BUCKETS):
+        """Initialize Histogram instance"""
+        self.name = name
+        self.help = help
+        self.bounds = tuple(sorted(buckets))
+        # One slot per bound plus the +Inf overflow slot
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Count one observation in its bucket"""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        """Cumulative bucket counts, sum and count for rendering"""
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            yield f"{self.name}_bucket", f'le="{_format(bound)}"', cumulative
+        yield f"{self.name}_sum", None, self.sum
+        yield f"{self.name}_count", None, cumulative
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-th quantile (approximate)"""
+        total = sum(self.counts)
+        if not total:
+            return None
+        target = q * total
+        cumulative = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return math.inf
+
+
+class MetricsRegistry:
+    """Named metrics rendered in the Prometheus text format
+
+    Updates are plain attribute arithmetic with no locking: under the GIL a
+    concurrent increment can very rarely be lost, which is an acceptable
+    trade for keeping the tick path free of locks and allocations.
+    """
+
+    def __init__(self, prefix='market_bot_'):
+        """Initialize MetricsRegistry instance"""
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        """Registered metric of this name, created on first use"""
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {full_name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, fn=None):
+        """Get or create a counter; a new fn replaces the previous one"""
+        metric = self._get_or_create(Counter, name, help)
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    def gauge(self, name, help, fn=None):
+        """Get or create a gauge; a new fn replaces the previous one"""
+        metric = self._get_or_create(Gauge, name, help)
+        if fn is not None:
+            metric.fn = fn
+        return metric
+
+    def histogram(self, name, help, buckets=NETWORK_BUCKETS):
+        """Get or create a histogram"""
+        return self._get_or_create(Histogram, name, help, buckets)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {str(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                label_text = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}{label_text} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by the feed modules
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """Small HTTP server for /metrics and other read-only status routes
+
+    Extra routes map a path to a callable returning (body, content_type);
+    a route raises KeyError for 404 and ValueError for 400.
+    """
+
+    def __init__(self, registry=REGISTRY, host='127.0.0.1', port=9100, routes=None):
+        """Initialize MetricsServer instance"""
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.routes = {'/metrics': lambda query: (registry.render(), CONTENT_TYPE)}
+        self.routes.update(routes or {})
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """Serve on a daemon thread"""
+        if self.server:
+            return
+        routes = self.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition('?')
+                route = routes.get(path)
+                if route is None:
+                    self.send_error(404)
+                    return
+                try:
+                    body, content_type = route(query)
+                except KeyError as e:
+                    self.send_error(404, str(e).strip("'"))
+                    return
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                except Exception as e:
+                    logger.error(f"Error serving {path}: {str(e)}", exc_info=True)
+                    self.send_error(500)
+                    return
+                data = body.encode() if isinstance(body, str) else body
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        logger.info(f"Metrics server listening on {self.host}:{self.port}")
+
+    def stop(self):
+        """Shut the server down"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
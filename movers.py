@@ -0,0 +1,140 @@
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+IST = pytz.timezone('Asia/Kolkata')
+
+
+class MoversRanking:
+    """Top gainers and losers of the day, rebuilt periodically off the tick path
+
+    A symbol's day change is measured from the previous close the feed
+    reports with its ticks, the same base as the broker's day change; a
+    symbol without one falls back to its first price seen in the session
+    (IST day). refresh() selects the top entries with argpartition,
+    which is linear in the universe size, and sorts only those; readers get
+    the last ranking without any work per request.
+
+    The base arrays are written from the tick thread and read or grown from
+    the refresh and snapshot threads, so every access holds one lock.
+    """
+
+    def __init__(self, state, top=10):
+        """Initialize MoversRanking instance"""
+        self.state = state
+        self.top = top
+
+        # Previous close from the feed, and the first price of the day as a fallback
+        self.prev_close = np.full(state.capacity, np.nan)
+        self.base_price = np.full(state.capacity, np.nan)
+        self._lock = threading.Lock()
+        self.day = None
+        self.gainers = []
+        self.losers = []
+        self.updated_at = None
+
+        # Counters
+        self.refreshes = 0
+
+    def refresh(self, now=None):
+        """Rebuild the ranking from the state's last prices"""
+        if now is None:
+            now = time.time()
+        day = datetime.fromtimestamp(now, IST).date()
+        count = len(self.state)
+        with self._lock:
+            self._ensure(count)
+            if day != self.day:
+                self.base_price[:] = np.nan
+                self.day = day
+
+            last = self.state.last_price[:count]
+            base = self.base_price[:count]
+            unset = np.isnan(base) & (last > 0)
+            base[unset] = last[unset]
+
+            changes = self._day_changes(count)
+        # NaN compares False below, so symbols without prices drop out
+        up = np.flatnonzero(changes > 0)
+        down = np.flatnonzero(changes < 0)
+        self.gainers = self._select(up, changes, -changes[up])
+        self.losers = self._select(down, changes, changes[down])
+        self.updated_at = now
+        self.refreshes += 1
+
+    def _select(self, candidates, changes, keys):
+        """Top candidates by ascending key: argpartition, then sort only the head"""
+        k = min(self.top, len(candidates))
+        if k == 0:
+            return []
+        head = np.argpartition(keys, k - 1)[:k]
+        head = head[np.argsort(keys[head], kind='stable')]
+        symbols = self.state.symbols
+        last = self.state.last_price
+        return [(symbols[sid], float(last[sid]), float(changes[sid])) for sid in candidates[head]]
+
+    def _ensure(self, count):
+        """Grow the base arrays to cover count symbols; call with the lock held"""
+        if len(self.base_price) >= count:
+            return
+        capacity = max(self.state.capacity, count)
+        for name in ('prev_close', 'base_price'):
+            grown = np.full(capacity, np.nan)
+            current = getattr(self, name)
+            grown[:len(current)] = current
+            setattr(self, name, grown)
+
+    def set_previous_close(self, sid, close):
+        """Record the previous close the feed reported for one symbol"""
+        if not close > 0:
+            return
+        with self._lock:
+            self._ensure(sid + 1)
+            self.prev_close[sid] = close
+
+    def set_previous_close_batch(self, ids, closes):
+        """Record previous closes for a batch; None or non-positive values are ignored"""
+        closes = np.array(closes, dtype=np.float64)
+        valid = closes > 0
+        if not valid.any():
+            return
+        ids = np.asarray(ids, dtype=np.intp)[valid]
+        with self._lock:
+            self._ensure(int(ids.max()) + 1)
+            self.prev_close[ids] = closes[valid]
+
+    def day_changes(self, count):
+        """Day change percent of the first count symbols; NaN until a symbol has a base price"""
+        with self._lock:
+            return self._day_changes(count)
+
+    def _day_changes(self, count):
+        """day_changes with the lock held"""
+        base = np.full(count, np.nan)
+        known = min(count, len(self.base_price))
+        close = self.prev_close[:known]
+        base[:known] = np.where(close > 0, close, self.base_price[:known])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.state.last_price[:count] - base) / base * 100
+
+    def change(self, sid):
+        """Day change percent of a symbol as of its last price, or None"""
+        with self._lock:
+            if sid >= len(self.base_price):
+                return None
+            base = self.prev_close[sid] if self.prev_close[sid] > 0 else self.base_price[sid]
+        ltp = self.state.last_price[sid]
+        if not base > 0 or not ltp > 0:
+            return None
+        return float((ltp - base) / base * 100)
+
+    def stats(self):
+        """Snapshot of ranking state"""
+        return {
+            'refreshes': self.refreshes,
+            'ranked': len(self.gainers) + len(self.losers),
+            'updated_at': self.updated_at
+        }
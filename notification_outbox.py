@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from telegram.error import RetryAfter
+
+from telegram_sender import _retry_seconds
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than 4096 characters
+MAX_MESSAGE_LENGTH = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    last_error TEXT
+)
+"""
+
+
+class NotificationOutbox:
+    """Durable Telegram outbox: request handlers enqueue, a background thread delivers
+
+    Messages are written to a local SQLite queue and survive restarts.
+    Each process runs one dispatcher thread with its own event loop; rows
+    are leased before sending, so several gunicorn workers can share the
+    same file without delivering a message twice. Pending messages for the
+    same chat go out as one combined message, and failures are retried with
+    exponential backoff (RetryAfter is honoured) up to max_attempts.
+    """
+
+    def __init__(self, send, path='outbox.db', batch_size=20, max_attempts=8,
+                 poll_interval=1.0, lease_seconds=30):
+        """Initialize NotificationOutbox instance
+
+        send is a coroutine function called as send(chat_id=..., text=...),
+        e.g. bot.send_message.
+        """
+        self.send = send
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+
+        self.thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+        # Counters
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived autocommit connection; SQLite connections must not cross threads"""
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, chat_id, text):
+        """Persist a notification and return immediately"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO outbox (chat_id, text, created_at, next_attempt_at) VALUES (?, ?, ?, ?)",
+                (str(chat_id), text, now, now)
+            )
+        self.enqueued += 1
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        """Start the dispatcher thread for this process if it is not running"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name="notification-outbox", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        """Stop the dispatcher; undelivered rows stay queued for the next start"""
+        self._stop.set()
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout)
+
+    def _run(self):
+        """Drain the outbox on a long-lived event loop"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while not self._stop.is_set():
+                try:
+                    claimed = self._claim()
+                    if claimed:
+                        loop.run_until_complete(self._deliver(claimed))
+                        continue
+                except Exception as e:
+                    logger.error(f"Error draining notification outbox: {str(e)}", exc_info=True)
+
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            loop.close()
+
+    def _claim(self):
+        """Lease the oldest due rows so no other worker sends them meanwhile"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    "SELECT id, chat_id, text, attempts FROM outbox "
+                    "WHERE status = 'pending' AND next_attempt_at <= ? AND claimed_until <= ? "
+                    "ORDER BY id LIMIT ?",
+                    (now, now, self.batch_size)
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE outbox SET claimed_until = ? WHERE id = ?",
+                    [(now + self.lease_seconds, row[0]) for row in rows]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    @staticmethod
+    def _group(rows):
+        """Combine rows per chat into as few messages as fit Telegram's limit"""
+        groups = []
+        current = {}
+        for row in rows:
+            chat_id, text = row[1], row[2]
+            group = current.get(chat_id)
+            if group is None or len(group[1]) + len(text) + 2 > MAX_MESSAGE_LENGTH:
+                group = current[chat_id] = [chat_id, text, [row]]
+                groups.append(group)
+            else:
+                group[1] += "\n\n" + text
+                group[2].append(row)
+        return groups
+
+    async def _deliver(self, rows):
+        """Send each combined message and record the outcome of its rows"""
+        for chat_id, text, members in self._group(rows):
+            ids = [row[0] for row in members]
+            try:
+                await self.send(chat_id=chat_id, text=text)
+            except RetryAfter as e:
+                retry_after = _retry_seconds(e)
+                logger.warning(f"Telegram rate limit hit for chat {chat_id}, retrying in {retry_after}s")
+                self._reschedule(ids, retry_after, str(e), count_attempt=False)
+                continue
+            except Exception as e:
+                attempts = max(row[3] for row in members) + 1
+                if attempts >= self.max_attempts:
+                    logger.error(f"Giving up on {len(ids)} notifications to chat {chat_id}: {str(e)}")
+                    self._mark_failed(ids, str(e))
+                else:
+                    delay = min(2 ** attempts, 300)
+                    logger.warning(f"Notification to chat {chat_id} failed (attempt {attempts}), retrying in {delay}s: {str(e)}")
+                    self._reschedule(ids, delay, str(e))
+                continue
+
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+            self.delivered += len(ids)
+
+    def _reschedule(self, ids, delay, error, count_attempt=True):
+        """Release rows for another attempt after delay seconds"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET attempts = attempts + ?, next_attempt_at = ?, "
+                "claimed_until = 0, last_error = ? WHERE id = ?",
+                [(1 if count_attempt else 0, time.time() + delay, error, i) for i in ids]
+            )
+        self.retried += len(ids)
+
+    def _mark_failed(self, ids, error):
+        """Keep undeliverable rows for inspection but stop retrying them"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(error, i) for i in ids]
+            )
+        self.failed += len(ids)
+
+    def depth(self):
+        """Messages still waiting to be delivered (across all workers)"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def stats(self):
+        """Snapshot of outbox counters for this process"""
+        return {
+            'enqueued': self.enqueued,
+            'delivered': self.delivered,
+            'retried': self.retried,
+            'failed': self.failed,
+            'pending': self.depth(),
+            'path': os.path.abspath(self.path)
+        }
@@ -0,0 +1,249 @@
+import logging
+import mmap
+import os
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MBPS'
+VERSION = 1
+
+# magic, version, capacity, name width, count, seq, published_at, generation
+HEADER = struct.Struct('<4sIIII4xQdQ')
+HEADER_SIZE = 64
+COUNT_OFFSET = 16
+SEQ_INDEX = 3  # seq is the fourth 8-byte word of the header
+PUBLISHED_AT_OFFSET = 32
+
+NAME_WIDTH = 64
+# One float64 column per field, each capacity entries long
+FIELDS = ('ltp', 'change_pct')
+
+# Seconds a read keeps retrying while publishes overlap it; the publisher can
+# be descheduled mid-write for several milliseconds
+READ_TIMEOUT = 0.25
+# Retries that only yield the CPU before backing off with short sleeps
+SPIN_RETRIES = 10
+RETRY_SLEEP = 0.0005
+
+
+def _layout(capacity):
+    """Byte offsets of the name table and of each field column"""
+    names = HEADER_SIZE
+    columns = names + capacity * NAME_WIDTH
+    columns += -columns % 8
+    return names, [columns + index * capacity * 8 for index in range(len(FIELDS))], columns + len(FIELDS) * capacity * 8
+
+
+class SnapshotWriter:
+    """Publish per-symbol prices into a memory-mapped file for other processes
+
+    One writer (the feed) owns the file. Each publish() bumps a sequence
+    number to odd, writes the names and columns, then bumps it back to
+    even; readers retry if the number was odd or changed while they copied
+    (a seqlock), so neither side ever takes a lock. Outgrowing the file
+    writes a new one and renames it into place; readers notice the new
+    file and reopen.
+    """
+
+    def __init__(self, path, capacity=1024):
+        """Initialize SnapshotWriter instance"""
+        self.path = path
+        self.generation = time.time_ns()
+        self.capacity = 0
+        self.map = None
+        self.published = 0
+        self._create(max(capacity, 1))
+
+        # Counters
+        self.publishes = 0
+        self.skipped = 0
+
+    def _create(self, capacity):
+        """Write an empty file of the given capacity and map it"""
+        _, _, size = _layout(capacity)
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            mapped = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        mapped[:HEADER.size] = HEADER.pack(MAGIC, VERSION, capacity, NAME_WIDTH, 0, 0, 0.0, self.generation)
+        os.replace(tmp_path, self.path)
+
+        self.close()
+        self.map = mapped
+        self.words = memoryview(mapped).cast('Q')
+        self.floats = memoryview(mapped).cast('d')
+        self.capacity = capacity
+        self.published = 0
+
+    def publish(self, symbols, columns, now=None):
+        """Write the current values; columns holds one float64 buffer per field, at least len(symbols) long
+
+        symbols may only grow by appending, as PriceState's do; names
+        already written are not rewritten.
+        """
+        count = len(symbols)
+        if count > self.capacity:
+            self._create(max(self.capacity * 2, count))
+        names, offsets, _ = _layout(self.capacity)
+
+        words = self.words
+        words[SEQ_INDEX] += 1
+        try:
+            for slot in range(self.published, count):
+                name = symbols[slot].encode()
+                if len(name) > NAME_WIDTH:
+                    # Readers never see it; its values are still written
+                    self.skipped += 1
+                    name = b''
+                start = names + slot * NAME_WIDTH
+                self.map[start:start + NAME_WIDTH] = name.ljust(NAME_WIDTH, b'\0')
+            self.published = count
+
+            for offset, values in zip(offsets, columns):
+                start = offset // 8
+                self.floats[start:start + count] = memoryview(values).cast('B').cast('d')[:count]
+            struct.pack_into('<I', self.map, COUNT_OFFSET, count)
+            struct.pack_into('<d', self.map, PUBLISHED_AT_OFFSET, time.time() if now is None else now)
+        finally:
+            words[SEQ_INDEX] += 1
+        self.publishes += 1
+
+    def close(self):
+        """Unmap the file"""
+        if self.map is not None:
+            self.words.release()
+            self.floats.release()
+            self.map.close()
+            self.map = None
+
+    def stats(self):
+        """Snapshot of publishing counters"""
+        return {
+            'publishes': self.publishes,
+            'symbols': self.published,
+            'capacity': self.capacity,
+            'skipped': self.skipped
+        }
+
+
+class SnapshotReader:
+    """Lock-free reader of a SnapshotWriter file, safe in any process
+
+    Values are read straight out of the shared mapping through memoryviews;
+    a read that overlaps a publish is retried. Symbol names are decoded once
+    and cached until the writer publishes new ones or replaces the file.
+    """
+
+    def __init__(self, path, timeout=READ_TIMEOUT):
+        """Initialize SnapshotReader instance"""
+        self.path = path
+        self.timeout = timeout
+        self.map = None
+        self.inode = None
+        self.generation = None
+        self.names = []
+        self.slots = {}
+
+        # Counters
+        self.reads = 0
+        self.retries = 0
+
+    def _open(self):
+        """Map the current file; FileNotFoundError while the feed has not published one"""
+        self.close()
+        with open(self.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            inode = os.fstat(f.fileno()).st_ino
+        magic, version, capacity, name_width, _, _, _, generation = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION or name_width != NAME_WIDTH:
+            mapped.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} price snapshot")
+        self.map = mapped
+        self.words = memoryview(mapped).cast('Q')
+        self.floats = memoryview(mapped).cast('d')
+        self.capacity = capacity
+        self.inode = inode
+        self.generation = generation
+        self.names = []
+        self.slots = {}
+
+    def close(self):
+        """Unmap the file"""
+        if self.map is not None:
+            self.words.release()
+            self.floats.release()
+            self.map.close()
+            self.map = None
+
+    def read(self, symbols=None):
+        """(published_at, {symbol: {field: value}}) for the given symbols, or all of them
+
+        Unknown symbols are left out; NaN values come back as None.
+        """
+        # A restarted or grown writer renames a new file into place
+        if self.map is None or os.stat(self.path).st_ino != self.inode:
+            self._open()
+
+        names, offsets, _ = _layout(self.capacity)
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            if attempt:
+                self._backoff(attempt, deadline)
+            attempt += 1
+            seq = self.words[SEQ_INDEX]
+            if seq & 1:
+                self.retries += 1
+                continue
+
+            count, = struct.unpack_from('<I', self.map, COUNT_OFFSET)
+            published_at, = struct.unpack_from('<d', self.map, PUBLISHED_AT_OFFSET)
+            new_names = [
+                self.map[start:start + NAME_WIDTH].rstrip(b'\0').decode()
+                for start in range(names + len(self.names) * NAME_WIDTH, names + count * NAME_WIDTH, NAME_WIDTH)
+            ]
+            wanted = range(count) if symbols is None else None
+            if wanted is None:
+                known = dict(self.slots)
+                for slot, name in enumerate(new_names, len(self.names)):
+                    known[name] = slot
+                wanted = [known[symbol] for symbol in symbols if symbol in known]
+
+            floats = self.floats
+            columns = [offset // 8 for offset in offsets]
+            values = [[floats[column + slot] for column in columns] for slot in wanted]
+
+            if self.words[SEQ_INDEX] != seq:
+                self.retries += 1
+                continue
+
+            for slot, name in enumerate(new_names, len(self.names)):
+                if name:
+                    self.slots[name] = slot
+            self.names.extend(new_names)
+            self.reads += 1
+            quotes = {}
+            for slot, row in zip(wanted, values):
+                name = self.names[slot]
+                if name:
+                    quotes[name] = {field: None if value != value else value for field, value in zip(FIELDS, row)}
+            return published_at, quotes
+
+    def _backoff(self, attempt, deadline):
+        """Let the publisher finish before retrying; TimeoutError once the deadline passes"""
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Price snapshot kept changing for {self.timeout}s")
+        time.sleep(0 if attempt < SPIN_RETRIES else RETRY_SLEEP)
+
+    def stats(self):
+        """Snapshot of read counters"""
+        return {
+            'reads': self.reads,
+            'retries': self.retries,
+            'symbols': len(self.slots)
+        }
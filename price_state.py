@@ -0,0 +1,213 @@
+import time
+
+import numpy as np
+
+
+class PriceState:
+    """Array-backed per-symbol price state keyed by integer symbol ids
+
+    Each symbol gets a dense integer id on registration. Last price, the
+    reference price alerts are measured against and the alert threshold
+    (in percent) live in parallel NumPy arrays indexed by that id.
+
+    Alerts follow a small per-symbol state machine. The reference price is
+    anchored: it only moves when an alert fires, so choppy ticks around a
+    level never alert while a slow move past the threshold still does. A
+    move against the direction of the last alert must clear the threshold
+    plus hysteresis percent, and within cooldown seconds of an alert only a
+    breakout (breakout_multiple times the threshold) fires again. Ticks held
+    back this way keep the anchor, so the move still alerts once allowed.
+    """
+
+    def __init__(self, capacity=1024, index_threshold=0.5, stock_threshold=1.0,
+                 hysteresis=0.0, cooldown=0.0, breakout_multiple=2.0):
+        """Initialize PriceState instance"""
+        self.index_threshold = index_threshold
+        self.stock_threshold = stock_threshold
+        self.hysteresis = hysteresis
+        self.cooldown = cooldown
+        self.breakout_multiple = breakout_multiple
+
+        self.symbol_ids = {}
+        self.symbols = []
+
+        self.last_price = np.full(capacity, np.nan)
+        self.ref_price = np.full(capacity, np.nan)
+        self.threshold = np.zeros(capacity)
+        # When and in which direction (+1/-1, 0 never) each symbol last alerted
+        self.alerted_at = np.full(capacity, -np.inf)
+        self.direction = np.zeros(capacity, dtype=np.int8)
+
+        # Counters
+        self.suppressed = 0
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def capacity(self):
+        return len(self.last_price)
+
+    def default_threshold(self, symbol):
+        """Percent move that triggers an alert when no rule overrides it"""
+        return self.index_threshold if "INDEX" in symbol else self.stock_threshold
+
+    def register(self, symbol, threshold=None):
+        """Assign an id to a symbol (idempotent) and return it"""
+        sid = self.symbol_ids.get(symbol)
+        if sid is not None:
+            if threshold is not None:
+                self.threshold[sid] = threshold
+            return sid
+
+        sid = len(self.symbols)
+        if sid >= self.capacity:
+            self._grow(max(self.capacity * 2, 16))
+
+        self.symbol_ids[symbol] = sid
+        self.symbols.append(symbol)
+        self.threshold[sid] = self.default_threshold(symbol) if threshold is None else threshold
+        return sid
+
+    def symbol_id(self, symbol):
+        """Id for a symbol, registering it on first sight"""
+        sid = self.symbol_ids.get(symbol)
+        if sid is None:
+            sid = self.register(symbol)
+        return sid
+
+    def _grow(self, capacity):
+        """Resize the arrays, keeping existing state"""
+        size = self.capacity
+        columns = (
+            ('last_price', np.nan), ('ref_price', np.nan), ('threshold', 0.0),
+            ('alerted_at', -np.inf), ('direction', 0)
+        )
+        for name, fill in columns:
+            grown = np.full(capacity, fill, dtype=getattr(self, name).dtype)
+            grown[:size] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def lower_threshold(self, sid, pct):
+        """Lower a symbol's threshold to pct unless it is already lower"""
+        if pct < self.threshold[sid]:
+            self.threshold[sid] = pct
+
+    def get(self, symbol):
+        """Last price for a symbol, or None if it has not ticked"""
+        sid = self.symbol_ids.get(symbol)
+        if sid is None or np.isnan(self.last_price[sid]):
+            return None
+        return float(self.last_price[sid])
+
+    def rebase(self, ids, prices):
+        """Overwrite last and reference prices without evaluating them
+
+        Used after a feed gap so the next tick is not compared with a price
+        from before the outage. A NaN price forgets the symbol's price; its
+        next tick then only sets a new reference. Cooldowns are kept.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        prices = np.asarray(prices, dtype=np.float64)
+        self.last_price[ids] = prices
+        self.ref_price[ids] = prices
+
+    def update(self, sid, ltp, now=None):
+        """Apply one tick; returns (reference_price, change_percent) if it alerts"""
+        ref = self.ref_price[sid]
+        self.last_price[sid] = ltp
+
+        # NaN (never seen or forgotten) compares False: this tick only anchors
+        if not ref > 0:
+            self.ref_price[sid] = ltp
+            return None
+        change_percent = (ltp - ref) / ref * 100
+        if abs(change_percent) < self.threshold[sid]:
+            return None
+        return self._decide(sid, ltp, float(ref), float(change_percent), now)
+
+    def _decide(self, sid, ltp, ref, change_percent, now):
+        """Apply hysteresis and cooldown to a tick past the threshold; re-anchors if it alerts"""
+        threshold = float(self.threshold[sid])
+        direction = 1 if change_percent > 0 else -1
+        move = abs(change_percent)
+
+        # Reversals must clear an extra margin so a level does not ping-pong
+        if direction == -self.direction[sid] and move < threshold + self.hysteresis:
+            self.suppressed += 1
+            return None
+
+        if now is None:
+            now = time.time()
+        if now - self.alerted_at[sid] < self.cooldown and move < threshold * self.breakout_multiple:
+            self.suppressed += 1
+            return None
+
+        self.ref_price[sid] = ltp
+        self.direction[sid] = direction
+        self.alerted_at[sid] = now
+        return ref, change_percent
+
+    def evaluate_batch(self, ids, prices, now=None):
+        """Apply a batch of ticks in one vectorized pass
+
+        Gives the same result as update() per tick in batch order. Every
+        tick is compared with its symbol's anchor in one vectorized step;
+        only symbols with a tick past their threshold walk their remaining
+        ticks one by one, since an alert moves the anchor. Returns
+        (ids, prices, reference_prices, change_percents, positions) for the
+        ticks that alerted, in arrival order, positions being their index
+        in the batch.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        prices = np.asarray(prices, dtype=np.float64)
+        if ids.size == 0:
+            empty = np.empty(0)
+            return ids, empty, empty, empty, np.empty(0, dtype=np.intp)
+
+        # Group ticks by symbol while keeping arrival order within a symbol
+        order = np.argsort(ids, kind='stable')
+        sorted_ids = ids[order]
+        sorted_prices = prices[order]
+
+        same_as_next = sorted_ids[1:] == sorted_ids[:-1]
+        first = np.concatenate(([True], ~same_as_next))
+        last = np.concatenate((~same_as_next, [True]))
+        run = np.cumsum(first) - 1
+        run_end = (np.flatnonzero(last) + 1)[run]
+
+        # Symbols without an anchor are anchored by their first tick
+        unanchored = first & ~(self.ref_price[sorted_ids] > 0)
+        self.ref_price[sorted_ids[unanchored]] = sorted_prices[unanchored]
+        self.last_price[sorted_ids[last]] = sorted_prices[last]
+
+        anchors = self.ref_price[sorted_ids]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_percents = (sorted_prices - anchors) / anchors * 100
+            candidates = np.abs(change_percents) >= self.threshold[sorted_ids]
+
+        hits = []
+        if candidates.any():
+            positions = np.flatnonzero(candidates)
+            # Before its first candidate a symbol cannot alert, so start there
+            starts = positions[np.concatenate(([True], run[positions][1:] != run[positions][:-1]))]
+            for start in starts:
+                sid = int(sorted_ids[start])
+                for position in range(start, run_end[start]):
+                    ltp = float(sorted_prices[position])
+                    ref = float(self.ref_price[sid])
+                    change_percent = (ltp - ref) / ref * 100
+                    if abs(change_percent) < self.threshold[sid]:
+                        continue
+                    alerted = self._decide(sid, ltp, ref, change_percent, now)
+                    if alerted:
+                        hits.append((int(order[position]), sid, ltp) + alerted)
+            hits.sort()
+
+        return (
+            np.array([hit[1] for hit in hits], dtype=np.intp),
+            np.array([hit[2] for hit in hits]),
+            np.array([hit[3] for hit in hits]),
+            np.array([hit[4] for hit in hits]),
+            np.array([hit[0] for hit in hits], dtype=np.intp)
+        )
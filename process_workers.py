@@ -0,0 +1,324 @@
+import json
+import logging
+import multiprocessing
+import queue
+import struct
+import threading
+import zlib
+from array import array
+
+import numpy as np
+
+from alert_rules import RuleEngine
+from candles import CandleAggregator
+from price_state import PriceState
+from rolling_window import RollingWindows
+
+logger = logging.getLogger(__name__)
+
+# Tick batch frame: kind, padding, received_at, count, then count prices
+# (float64), count cumulative volumes (float64, NaN if unknown) and count
+# symbol ids (uint32). The header is 24 bytes so every column stays
+# aligned for np.frombuffer. Rebase frames share the layout.
+BATCH_HEADER = struct.Struct('<c7xdQ')
+KIND_TICKS = b'T'
+KIND_REBASE = b'B'
+KIND_REGISTER = b'R'
+KIND_QUIT = b'Q'
+
+NAN = float('nan')
+
+
+def _unpack(data):
+    """(received_at, prices, volumes, global ids) views of a batch frame"""
+    _, received_at, count = BATCH_HEADER.unpack_from(data)
+    offset = BATCH_HEADER.size
+    prices = np.frombuffer(data, dtype='<f8', count=count, offset=offset)
+    volumes = np.frombuffer(data, dtype='<f8', count=count, offset=offset + 8 * count)
+    global_ids = np.frombuffer(data, dtype='<u4', count=count, offset=offset + 16 * count)
+    return received_at, prices, volumes, global_ids
+
+
+def _worker_main(worker_id, conn, alerts, rules_file, index_threshold, stock_threshold,
+                 damping, window_seconds, bucket_seconds, candle_intervals, session):
+    """Worker process: own a slice of the price state and evaluate its ticks"""
+    hysteresis, cooldown, breakout_multiple = damping
+    state = PriceState(
+        index_threshold=index_threshold,
+        stock_threshold=stock_threshold,
+        hysteresis=hysteresis,
+        cooldown=cooldown,
+        breakout_multiple=breakout_multiple
+    )
+    windows = None
+    if window_seconds > 0:
+        windows = RollingWindows(window_seconds=window_seconds, bucket_seconds=bucket_seconds)
+    # Candle rules need the worker's own bars for its symbols
+    candles = None
+    if candle_intervals:
+        candles = CandleAggregator(candle_intervals, session_open=session[0], session_close=session[1])
+    engine = RuleEngine.from_file(rules_file, state, windows=windows, candles=candles)
+
+    # Parent-assigned global id -> local PriceState id
+    local_ids = np.full(1024, -1, dtype=np.intp)
+
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except EOFError:
+            break
+
+        kind = data[:1]
+        if kind == KIND_TICKS:
+            received_at, prices, volumes, global_ids = _unpack(data)
+            ids = local_ids[global_ids]
+            if candles is not None:
+                candles.update_batch(ids, prices, volumes, received_at)
+            hits = engine.evaluate_batch(ids, prices, volumes, received_at)
+            if hits:
+                alerts.put([
+                    (state.symbols[sid], ltp, ltp - old_price, change_percent, reason, received_at)
+                    for sid, ltp, old_price, change_percent, reason in hits
+                ])
+        elif kind == KIND_REBASE:
+            _, prices, _, global_ids = _unpack(data)
+            state.rebase(local_ids[global_ids], prices)
+        elif kind == KIND_REGISTER:
+            for global_id, symbol, threshold in json.loads(data[1:]):
+                if global_id >= len(local_ids):
+                    grown = np.full(max(len(local_ids) * 2, global_id + 1), -1, dtype=np.intp)
+                    grown[:len(local_ids)] = local_ids
+                    local_ids = grown
+                sid = local_ids[global_id] = engine.register(symbol)
+                if threshold is not None:
+                    state.lower_threshold(sid, threshold)
+        elif kind == KIND_QUIT:
+            break
+
+    conn.close()
+
+
+class _Partition:
+    """Parent-side connection and pending batch for one worker"""
+
+    def __init__(self, worker_id, process, conn):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = conn
+        self.registrations = []
+        self.ids = array('I')
+        self.prices = array('d')
+        self.volumes = array('d')
+        self.received_at = None
+        self.sent = 0
+        self.reported_dead = False
+
+
+class WorkerPool:
+    """Evaluate ticks in worker processes, partitioned by symbol
+
+    Every symbol is pinned to one worker by a stable hash, so each worker
+    owns its symbols' price state outright and sees their ticks in arrival
+    order. Ticks travel as packed arrays over a pipe (no pickling); the few
+    alerts that come back are passed to on_alert on a collector thread.
+    """
+
+    def __init__(self, workers, on_alert, rules_file=None, index_threshold=0.5,
+                 stock_threshold=1.0, batch_size=256, flush_interval=0.002,
+                 window_seconds=300, bucket_seconds=10, candle_intervals=(),
+                 session=("09:15", "15:30"), hysteresis=0.0, cooldown=0.0,
+                 breakout_multiple=2.0):
+        """Initialize WorkerPool instance"""
+        self.workers = workers
+        self.on_alert = on_alert
+        self.rules_file = rules_file
+        self.index_threshold = index_threshold
+        self.stock_threshold = stock_threshold
+        self.damping = (hysteresis, cooldown, breakout_multiple)
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.candle_intervals = tuple(candle_intervals)
+        self.session = tuple(session)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Spawned workers do not inherit the parent's threads or sockets
+        self._context = multiprocessing.get_context('spawn')
+        self._alerts = None
+        self._partitions = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        # symbol -> (global id, partition)
+        self._routes = {}
+        # symbol -> threshold cap sent along with its registration
+        self._threshold_caps = {}
+
+        # Counters
+        self.submitted = 0
+        self.alerts = 0
+
+    def start(self):
+        """Spawn the workers and the flush/collector threads"""
+        if self._partitions:
+            return
+
+        self._alerts = self._context.Queue()
+        for worker_id in range(self.workers):
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(worker_id, child_conn, self._alerts, self.rules_file,
+                      self.index_threshold, self.stock_threshold, self.damping,
+                      self.window_seconds, self.bucket_seconds,
+                      self.candle_intervals, self.session),
+                name=f"tick-worker-{worker_id}",
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            self._partitions.append(_Partition(worker_id, process, parent_conn))
+
+        self._stop.clear()
+        for target, name in ((self._run_flusher, "worker-flusher"), (self._run_collector, "alert-collector")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} tick worker processes")
+
+    def stop(self):
+        """Flush pending ticks and shut the workers down"""
+        self._stop.set()
+        self.flush()
+        for partition in self._partitions:
+            try:
+                partition.conn.send_bytes(KIND_QUIT)
+            except (BrokenPipeError, OSError):
+                pass
+        for partition in self._partitions:
+            partition.process.join(5)
+            partition.conn.close()
+        self._alerts.put(None)
+        for thread in self._threads:
+            thread.join(5)
+        self._partitions = []
+        self._threads = []
+
+    def _route(self, symbol):
+        """Global id and owning partition for a symbol, assigned on first sight"""
+        route = self._routes.get(symbol)
+        if route is None:
+            global_id = len(self._routes)
+            partition = self._partitions[zlib.crc32(symbol.encode()) % len(self._partitions)]
+            partition.registrations.append((global_id, symbol, self._threshold_caps.get(symbol)))
+            route = (global_id, partition)
+            self._routes[symbol] = route
+        return route
+
+    def lower_threshold(self, symbol, pct):
+        """Cap a symbol's threshold in its worker, now or when it is first routed"""
+        with self._lock:
+            self._threshold_caps[symbol] = pct
+            route = self._routes.get(symbol)
+            if route is not None:
+                # Registering again is a no-op apart from applying the cap
+                route[1].registrations.append((route[0], symbol, pct))
+
+    def submit(self, ticks, received_at):
+        """Queue ticks for their owning workers; sends once a batch fills up"""
+        with self._lock:
+            for tick in ticks:
+                global_id, partition = self._route(tick.symbol)
+                partition.ids.append(global_id)
+                partition.prices.append(tick.ltp)
+                partition.volumes.append(NAN if tick.volume is None else tick.volume)
+                if partition.received_at is None:
+                    partition.received_at = received_at
+                if len(partition.ids) >= self.batch_size:
+                    self._send(partition)
+            self.submitted += len(ticks)
+
+    def rebase(self, symbols, prices):
+        """Overwrite the workers' reference prices (NaN forgets them), after any queued ticks"""
+        with self._lock:
+            pending = {}
+            for symbol, price in zip(symbols, prices):
+                global_id, partition = self._route(symbol)
+                ids, values = pending.setdefault(partition.worker_id, (array('I'), array('d')))
+                ids.append(global_id)
+                values.append(price)
+            for partition in self._partitions:
+                if partition.worker_id not in pending:
+                    continue
+                ids, values = pending[partition.worker_id]
+                self._send(partition)
+                header = BATCH_HEADER.pack(KIND_REBASE, 0.0, len(ids))
+                volumes = array('d', [NAN] * len(ids))
+                partition.conn.send_bytes(header + values.tobytes() + volumes.tobytes() + ids.tobytes())
+
+    def flush(self):
+        """Send every partially filled batch"""
+        with self._lock:
+            for partition in self._partitions:
+                if partition.ids or partition.registrations:
+                    self._send(partition)
+
+    def _send(self, partition):
+        """Write registrations, then the tick batch, to a worker's pipe"""
+        if partition.registrations:
+            partition.conn.send_bytes(KIND_REGISTER + json.dumps(partition.registrations).encode())
+            partition.registrations = []
+
+        count = len(partition.ids)
+        if not count:
+            return
+        header = BATCH_HEADER.pack(KIND_TICKS, partition.received_at, count)
+        partition.conn.send_bytes(
+            header + partition.prices.tobytes() + partition.volumes.tobytes() + partition.ids.tobytes()
+        )
+        partition.sent += count
+        partition.ids = array('I')
+        partition.prices = array('d')
+        partition.volumes = array('d')
+        partition.received_at = None
+
+    def _run_flusher(self):
+        """Bound tick latency when batches fill slowly"""
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing tick batches: {str(e)}", exc_info=True)
+
+    def _run_collector(self):
+        """Hand alerts from every worker to the single dispatcher"""
+        while True:
+            try:
+                batch = self._alerts.get(timeout=1)
+            except queue.Empty:
+                for partition in self._partitions:
+                    if not partition.process.is_alive() and not partition.reported_dead and not self._stop.is_set():
+                        partition.reported_dead = True
+                        logger.error(f"Tick worker {partition.worker_id} exited with code {partition.process.exitcode}")
+                continue
+            if batch is None:
+                break
+            for alert in batch:
+                self.alerts += 1
+                try:
+                    self.on_alert(*alert)
+                except Exception as e:
+                    logger.error(f"Error handling worker alert: {str(e)}", exc_info=True)
+
+    def stats(self):
+        """Per-worker routing counters"""
+        return {
+            'submitted': self.submitted,
+            'alerts': self.alerts,
+            'symbols': len(self._routes),
+            'workers': [
+                {'worker': p.worker_id, 'alive': p.process.is_alive(), 'sent': p.sent}
+                for p in self._partitions
+            ]
+        }
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, per-process coalescing only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-progress upstream fetch that other threads can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuoteCache:
+    """Short-lived, single-flight cache in front of a quote endpoint
+
+    Concurrent requests for the same parameters share one upstream call:
+    threads in a process wait on the leader's in-flight fetch, and gunicorn
+    workers serialize on a per-key file lock and reuse the response the
+    first worker wrote to the shared cache directory. Requests go over a
+    pooled keep-alive session with the access token held in memory.
+    Expired entries and their lock files are swept from the directory every
+    prune_interval seconds, and at most max_entries are kept.
+    """
+
+    def __init__(self, url, token_loader, ttl=1.0, cache_dir='quote_cache', pool_size=4, timeout=5,
+                 max_entries=256, prune_interval=60.0):
+        """Initialize QuoteCache instance
+
+        token_loader is called for the bearer token on first use and again
+        after the upstream rejects it.
+        """
+        self.url = url
+        self.token_loader = token_loader
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self._pruned_at = 0.0
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept'] = 'application/json'
+        self._token = None
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._flights = {}
+
+        # Counters
+        self.hits = 0
+        self.shared_hits = 0
+        self.coalesced = 0
+        self.fetches = 0
+        self.pruned = 0
+
+    def get(self, params):
+        """Quote data for params, fetched upstream at most once per ttl"""
+        key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time():
+                self.hits += 1
+                return entry[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait(self.timeout * 2)
+            if flight.error is not None:
+                raise flight.error
+            if not flight.done.is_set():
+                raise requests.Timeout("Timed out waiting for a shared quote request")
+            return flight.result
+
+        try:
+            flight.result = self._load_shared(key, params)
+            with self._lock:
+                now = time.time()
+                if len(self._entries) >= self.max_entries:
+                    self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                    while len(self._entries) >= self.max_entries:
+                        self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (now + self.ttl, flight.result)
+                prune = now - self._pruned_at >= self.prune_interval
+                if prune:
+                    self._pruned_at = now
+            if prune:
+                try:
+                    self.prune(now)
+                except OSError as e:
+                    logger.warning(f"Could not prune quote cache: {str(e)}")
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _load_shared(self, key, params):
+        """Read a fresh entry another worker wrote, or fetch and write one"""
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        with open(f"{path}.lock", 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                data = self._read_entry(path)
+                if data is not None:
+                    self.shared_hits += 1
+                    return data
+
+                data = self._fetch(params)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump({'fetched_at': time.time(), 'data': data}, f)
+                os.replace(tmp_path, path)
+                return data
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def prune(self, now=None):
+        """Delete expired entries and their lock files, then the oldest beyond max_entries"""
+        if now is None:
+            now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+        # Entries are written right after their fetch, so mtime dates them
+        stale = [path for _, path in entries[self.max_entries:]]
+        stale += [path for mtime, path in entries[:self.max_entries] if mtime + self.ttl <= now]
+        for path in stale:
+            self._remove(path)
+
+        # Lock files left behind by entries that no longer exist
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.json.lock') and not os.path.exists(os.path.join(self.cache_dir, name[:-5])):
+                self._remove(os.path.join(self.cache_dir, name[:-5]))
+
+    def _remove(self, path):
+        """Delete an entry and its lock file unless another worker is using the lock"""
+        try:
+            with open(f"{path}.lock", 'a') as lock_file:
+                if fcntl:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        return
+                for target in (path, f"{path}.lock"):
+                    try:
+                        os.remove(target)
+                    except FileNotFoundError:
+                        pass
+            self.pruned += 1
+        except OSError as e:
+            logger.warning(f"Could not prune quote cache entry {path}: {str(e)}")
+
+    def _read_entry(self, path):
+        """Cached data from the shared store if it is younger than ttl"""
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('fetched_at', 0) + self.ttl <= time.time():
+            return None
+        return entry.get('data')
+
+    def _fetch(self, params):
+        """One upstream request, refreshing the token once if it was rejected"""
+        if self._token is None:
+            self._set_token(self.token_loader())
+
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        if response.status_code == 401:
+            logger.info("Quote request unauthorized; reloading access token")
+            self._set_token(self.token_loader())
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+
+        self.fetches += 1
+        response.raise_for_status()
+        return response.json()
+
+    def _set_token(self, access_token):
+        """Hold the bearer token in memory for every subsequent request"""
+        if not access_token:
+            raise ValueError("No valid access token")
+        self._token = access_token
+        self.session.headers['Authorization'] = f'Bearer {access_token}'
+
+    def stats(self):
+        """Snapshot of cache counters"""
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'coalesced': self.coalesced,
+            'fetches': self.fetches,
+            'pruned': self.pruned,
+            'entries': len(self._entries)
+        }
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tick_decoder import Tick
+
+logger = logging.getLogger(__name__)
+
+
+class QuotePoller:
+    """Poll a multi-instrument quote endpoint on a fixed cadence
+
+    Every cycle requests the whole universe in batches of batch_size
+    instruments over a pooled keep-alive session; batches run concurrently,
+    so a cycle costs one round trip. Cycles are scheduled against a fixed
+    timeline, so a slow response does not push every later poll back.
+    """
+
+    def __init__(self, url, instruments, on_quotes, interval=1.0, batch_size=500, pool_size=4, timeout=5):
+        """Initialize QuotePoller instance
+
+        on_quotes is called with (ticks, depths, received_at) after every
+        successful cycle.
+        """
+        self.url = url
+        self.instruments = list(instruments)
+        self.on_quotes = on_quotes
+        self.interval = interval
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+        # Persistent connection pool shared by all batches
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept'] = 'application/json'
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='quote-batch')
+
+        self._stop = threading.Event()
+        self.thread = None
+
+        # Counters
+        self.cycles = 0
+        self.failures = 0
+        self.overruns = 0
+        self.last_cycle_seconds = None
+
+    def set_token(self, access_token):
+        """Use a (new) bearer token for subsequent requests"""
+        self.session.headers['Authorization'] = f'Bearer {access_token}'
+
+    def start(self):
+        """Start polling on a background thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+        self.thread.start()
+        logger.info(f"Polling {len(self.instruments)} instruments every {self.interval}s")
+
+    def stop(self):
+        """Stop polling and release pooled connections"""
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    def _run(self):
+        """Poll on a fixed timeline, skipping slots that a slow cycle overran"""
+        next_run = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Error polling quotes: {str(e)}")
+
+            next_run += self.interval
+            now = time.monotonic()
+            if next_run < now:
+                missed = int((now - next_run) // self.interval) + 1
+                self.overruns += missed
+                next_run += missed * self.interval
+            self._stop.wait(next_run - now)
+
+    def poll_once(self):
+        """Fetch every instrument once and hand the results on"""
+        started = time.monotonic()
+        batches = [
+            self.instruments[i:i + self.batch_size]
+            for i in range(0, len(self.instruments), self.batch_size)
+        ]
+        if len(batches) == 1:
+            results = [self._fetch(batches[0])]
+        else:
+            results = list(self._executor.map(self._fetch, batches))
+        received_at = time.time()
+
+        ticks = []
+        depths = {}
+        for data in results:
+            for quote in data.values():
+                self._parse_quote(quote, ticks, depths)
+
+        self.cycles += 1
+        self.last_cycle_seconds = time.monotonic() - started
+        self.on_quotes(ticks, depths, received_at)
+
+    def _fetch(self, instruments):
+        """One request for up to batch_size instruments"""
+        response = self.session.get(
+            self.url,
+            params={'instrument_key': ','.join(instruments)},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json().get('data') or {}
+
+    @staticmethod
+    def _parse_quote(quote, ticks, depths):
+        """Turn one quote into a Tick and, when present, a depth snapshot"""
+        # instrument_token echoes the key we asked for; the dict key does not
+        symbol = quote.get('instrument_token')
+        ltp = quote.get('last_price')
+        if symbol is None or ltp is None:
+            return
+
+        volume = quote.get('volume')
+        # net_change is measured from the previous close
+        net_change = quote.get('net_change')
+        prev_close = ltp - net_change if net_change is not None else None
+        ticks.append(Tick(symbol, ltp, volume, quote.get('timestamp'), prev_close))
+
+        depth = quote.get('depth') or {}
+        buy = depth.get('buy') or []
+        sell = depth.get('sell') or []
+        if buy and sell:
+            depths[symbol] = {
+                'bid_price': buy[0].get('price'),
+                'bid_qty': buy[0].get('quantity'),
+                'ask_price': sell[0].get('price'),
+                'ask_qty': sell[0].get('quantity'),
+                'volume': volume if volume is not None else 'N/A'
+            }
+
+    def stats(self):
+        """Snapshot of polling counters"""
+        return {
+            'instruments': len(self.instruments),
+            'cycles': self.cycles,
+            'failures': self.failures,
+            'overruns': self.overruns,
+            'last_cycle_seconds': self.last_cycle_seconds
+        }
@@ -1,9 +1,15 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 import os
 import telegram
-import asyncio
 from dotenv import load_dotenv
 import requests
+import threading
+import time
+from metrics import REGISTRY, CONTENT_TYPE
+from notification_outbox import NotificationOutbox
+from price_snapshot import SnapshotReader
+from quote_cache import QuoteCache
+from token_manager import TokenManager, notify_handoff, LEGACY_AUTH_CODE_FILE
 
 # Load environment variables
 load_dotenv()
@@ -14,9 +20,54 @@ TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 UPSTOX_API_KEY = os.getenv('UPSTOX_API_KEY')
 UPSTOX_API_SECRET = os.getenv('UPSTOX_API_SECRET')
 UPSTOX_REDIRECT_URI = os.getenv('UPSTOX_REDIRECT_URI')
+TOKEN_STORE_PATH = os.getenv('TOKEN_STORE_PATH', 'token_store.json')
+AUTH_HANDOFF_SOCKET = os.getenv('AUTH_HANDOFF_SOCKET', 'auth_handoff.sock')
+TOKEN_EXPIRY_TIME = os.getenv('TOKEN_EXPIRY_TIME', '03:30')
+QUOTE_CACHE_TTL = float(os.getenv('QUOTE_CACHE_TTL', '1.0'))
+QUOTE_CACHE_DIR = os.getenv('QUOTE_CACHE_DIR', 'quote_cache')
+# Instruments /start may quote, as EXCHANGE:SYMBOL; anything else would grow the cache
+QUOTE_INSTRUMENTS = {
+    tuple(entry.strip().split(':', 1))
+    for entry in os.getenv('QUOTE_INSTRUMENTS', 'NSE:NIFTY 50,NSE:NIFTY BANK').split(',')
+    if ':' in entry
+}
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'outbox.db')
+FEED_STATUS_URL = os.getenv('FEED_STATUS_URL', 'http://127.0.0.1:9100')
+PRICE_SNAPSHOT_PATH = os.getenv('PRICE_SNAPSHOT_PATH', 'price_snapshot.bin')
 
 app = Flask(__name__)
 bot = telegram.Bot(token=TELEGRAM_BOT_TOKEN)
+# Notifications are queued durably and sent off the request path
+outbox = NotificationOutbox(bot.send_message, path=OUTBOX_PATH)
+outbox.start()
+
+# Per-worker metrics; Prometheus scrapes each gunicorn worker it reaches
+START_SECONDS = REGISTRY.histogram('start_request_seconds', '/start latency including cache hits')
+REGISTRY.counter('quote_cache_hits_total', 'Quotes served from this worker\'s memory', fn=lambda: quote_cache.hits)
+REGISTRY.counter('quote_cache_shared_hits_total', 'Quotes served from another worker\'s fetch', fn=lambda: quote_cache.shared_hits)
+REGISTRY.counter('quote_cache_coalesced_total', 'Requests that waited on an in-flight fetch', fn=lambda: quote_cache.coalesced)
+REGISTRY.counter('quote_upstream_fetches_total', 'Upstream quote requests', fn=lambda: quote_cache.fetches)
+REGISTRY.counter('quote_cache_pruned_total', 'Expired shared cache entries deleted by this worker', fn=lambda: quote_cache.pruned)
+REGISTRY.counter('outbox_delivered_total', 'Notifications delivered by this worker', fn=lambda: outbox.delivered)
+REGISTRY.gauge('outbox_pending', 'Notifications waiting in the outbox', fn=outbox.depth)
+REGISTRY.counter('price_snapshot_reads_total', 'Quotes requests served from the feed\'s price snapshot', fn=lambda: snapshot.reads)
+REGISTRY.counter('price_snapshot_retries_total', 'Snapshot reads retried because the feed was publishing', fn=lambda: snapshot.retries)
+token_manager = TokenManager(
+    'upstox',
+    store_path=TOKEN_STORE_PATH,
+    handoff_path=AUTH_HANDOFF_SOCKET,
+    expiry_time=TOKEN_EXPIRY_TIME
+)
+# Shared by every request in this worker; other workers share its files
+quote_cache = QuoteCache(
+    "https://api.upstox.com/marketdata/quotes",
+    token_manager.load,
+    ttl=QUOTE_CACHE_TTL,
+    cache_dir=QUOTE_CACHE_DIR
+)
+# Mapped on first use; the lock only orders this worker's threads, the feed never waits on it
+snapshot = SnapshotReader(PRICE_SNAPSHOT_PATH)
+snapshot_lock = threading.Lock()
 
 @app.route('/')
 def home():
@@ -31,7 +82,8 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'telegram_bot': bool(TELEGRAM_BOT_TOKEN),
-        'upstox_config': bool(UPSTOX_API_KEY and UPSTOX_API_SECRET)
+        'upstox_config': bool(UPSTOX_API_KEY and UPSTOX_API_SECRET),
+        'outbox_pending': outbox.depth()
     })
 
 @app.route('/callback')
@@ -41,6 +93,16 @@ def callback():
         app.logger.info("Callback endpoint hit")
         app.logger.info(f"Request args: {dict(request.args)}")
 
+        # Fyers redirects with auth_code; the feed exchanges it itself
+        fyers_code = request.args.get('auth_code')
+        if fyers_code:
+            handoff = {'broker': 'fyers', 'code': fyers_code}
+            if not notify_handoff(handoff, AUTH_HANDOFF_SOCKET):
+                # Feed is not waiting yet; it picks the file up when it starts
+                with open(LEGACY_AUTH_CODE_FILE, 'w') as f:
+                    f.write(fyers_code)
+            return "Authentication successful! The feed is starting. You can close this window."
+
         # Get the auth code from the request
         auth_code = request.args.get('code')
         if not auth_code:
@@ -63,16 +125,17 @@ def callback():
         if not access_token:
             return "Access token not found in response", 500
 
-        # Save the access token to a file
-        with open('access_token.txt', 'w') as f:
-            f.write(access_token)
+        # Store the token with its expiry and hand it to a waiting feed
+        token_manager.save(access_token)
+        notify_handoff({
+            'broker': 'upstox',
+            'access_token': access_token,
+            'expires_at': token_manager.expires_at()
+        }, AUTH_HANDOFF_SOCKET)
 
         # Send the access token to your Telegram bot
         message = f"Access Token Received: {access_token[:4]}****"
-        asyncio.run(bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
-            text=message
-        ))
+        outbox.enqueue(TELEGRAM_CHAT_ID, message)
         return "Authentication successful! The access token has been sent to your Telegram bot. You can close this window."
     except Exception as e:
         return f"Error processing callback: {str(e)}", 500
@@ -80,24 +143,28 @@ def callback():
 @app.route('/start')
 def start_feed():
     """Start the market data feed using Upstox"""
+    started = time.perf_counter()
     try:
-        with open('access_token.txt', 'r') as f:
-            access_token = f.read().strip()
-
         # Fetch market data (example: NIFTY 50 index)
-        market_data_url = "https://api.upstox.com/marketdata/quotes"
-        headers = {
-            'Authorization': f'Bearer {access_token}'
-        }
         params = {
-            'exchange': 'NSE',
-            'symbol': 'NIFTY 50'
+            'exchange': request.args.get('exchange', 'NSE'),
+            'symbol': request.args.get('symbol', 'NIFTY 50')
         }
-        response = requests.get(market_data_url, headers=headers, params=params)
-        if response.status_code != 200:
-            return f"Error fetching market data: {response.text}", 500
+        if (params['exchange'], params['symbol']) not in QUOTE_INSTRUMENTS:
+            return jsonify({
+                'status': 'error',
+                'message': f"{params['exchange']}:{params['symbol']} is not an allowed instrument"
+            }), 400
+        try:
+            market_data = quote_cache.get(params)
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'No valid access token; log in via /callback first'
+            }), 401
+        except requests.HTTPError as e:
+            return f"Error fetching market data: {e.response.text}", 500
 
-        market_data = response.json()
         return jsonify({
             'status': 'success',
             'market_data': market_data
@@ -107,6 +174,50 @@ def start_feed():
             'status': 'error',
             'message': str(e)
         }), 500
+    finally:
+        START_SECONDS.observe(time.perf_counter() - started)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/candles')
+def candles():
+    """Open and recent OHLCV bars from the running feed, e.g. /candles?symbol=NSE:SBIN-EQ&interval=5m"""
+    try:
+        response = requests.get(f"{FEED_STATUS_URL}/candles", params=request.args, timeout=2)
+    except requests.RequestException as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Feed is not reachable: {str(e)}'
+        }), 503
+    return Response(response.content, status=response.status_code,
+                    content_type=response.headers.get('Content-Type', 'application/json'))
+
+@app.route('/quotes')
+def quotes():
+    """Last prices and day changes published by the feed, e.g. /quotes?symbol=NSE:SBIN-EQ,NSE:TCS-EQ"""
+    symbols = [s for value in request.args.getlist('symbol') for s in value.split(',') if s] or None
+    try:
+        with snapshot_lock:
+            published_at, prices = snapshot.read(symbols)
+    except FileNotFoundError:
+        return jsonify({
+            'status': 'error',
+            'message': 'Feed has not published prices yet'
+        }), 503
+    except (TimeoutError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 503
+    return jsonify({
+        'status': 'ok',
+        'published_at': published_at,
+        'age': max(time.time() - published_at, 0.0),
+        'quotes': prices
+    })
 
 @app.route('/test-redirect')
 def test_redirect():
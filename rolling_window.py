@@ -0,0 +1,326 @@
+import math
+
+import numpy as np
+
+# Indicators rules can reference
+INDICATORS = ('change_pct', 'vwap', 'vwap_dev_pct', 'high', 'low', 'range_pct', 'volume_rate')
+
+# Per-bucket columns (one row of slots per symbol) and their empty values
+BUCKET_COLUMNS = (
+    ('bucket_pv', 0.0),
+    ('bucket_volume', 0.0),
+    ('bucket_high', -np.inf),
+    ('bucket_low', np.inf),
+    ('bucket_close', np.nan)
+)
+
+# Per-symbol window state and its empty values
+SYMBOL_COLUMNS = (
+    ('base_price', np.nan),
+    ('last_price', np.nan),
+    ('last_volume', np.nan),
+    ('pv_sum', 0.0),
+    ('volume_sum', 0.0),
+    ('high', -np.inf),
+    ('low', np.inf)
+)
+
+
+def traded_quantities(ids, volumes, last_volume):
+    """Traded quantity per tick from cumulative day volumes, in batch order
+
+    Each tick is compared with the previous known volume of its symbol in
+    the batch, or with last_volume, which is updated in place. Missing
+    volumes (NaN) and volume resets count as no trade.
+    """
+    ids = np.asarray(ids, dtype=np.intp)
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    sorted_volumes = np.asarray(volumes, dtype=np.float64)[order]
+    positions = np.arange(len(ids))
+    first = np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1]))
+    last = np.concatenate((first[1:], [True]))
+    run_start = np.maximum.accumulate(np.where(first, positions, 0))
+
+    # Previous known volume within the symbol's run, else the stored one
+    known = np.maximum.accumulate(np.where(np.isnan(sorted_volumes), -1, positions))
+    previous_known = np.concatenate(([-1], known[:-1]))
+    previous = np.where(
+        previous_known >= run_start,
+        sorted_volumes[previous_known],
+        last_volume[sorted_ids]
+    )
+    with np.errstate(invalid='ignore'):
+        delta = sorted_volumes - previous
+    delta[~(delta > 0)] = 0.0
+
+    has_volume = last & (known >= run_start)
+    last_volume[sorted_ids[has_volume]] = sorted_volumes[known[has_volume]]
+
+    traded = np.empty(len(ids))
+    traded[order] = delta
+    return traded
+
+
+class RollingWindows:
+    """Rolling N-minute indicators per symbol from fixed ring buffers of time buckets
+
+    Each symbol owns one row of bucket_count slots covering the window; a
+    tick only touches its current slot and the running window totals, so
+    updates are O(1) and never rescan past ticks. When a symbol moves into
+    a new bucket, the slots that fall out of the window are subtracted from
+    the totals and cleared. Memory per symbol is fixed (see bytes_per_symbol).
+
+    Volumes are broker cumulative day volumes; the traded quantity of a
+    tick is its increase over the symbol's previous tick.
+
+    Only the thread applying ticks may touch the buffers. Other threads read
+    the view that thread last published with publish(), which has already
+    expired the buckets of symbols that stopped ticking.
+    """
+
+    def __init__(self, window_seconds=300, bucket_seconds=10, capacity=1024):
+        """Initialize RollingWindows instance"""
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = max(int(math.ceil(window_seconds / bucket_seconds)), 1)
+
+        for name, fill in BUCKET_COLUMNS:
+            setattr(self, name, np.full((capacity, self.bucket_count), fill))
+        for name, fill in SYMBOL_COLUMNS:
+            setattr(self, name, np.full(capacity, fill))
+        # Absolute bucket number each symbol last wrote to
+        self.epoch = np.full(capacity, -1, dtype=np.int64)
+        self._flatten()
+        # indicator -> values per symbol as of published_at, replaced whole by publish()
+        self.view = None
+        self.published_at = None
+
+    def _flatten(self):
+        """1-D views of the bucket columns; scalar access by flat index is cheaper"""
+        self._flat_pv = self.bucket_pv.reshape(-1)
+        self._flat_volume = self.bucket_volume.reshape(-1)
+        self._flat_high = self.bucket_high.reshape(-1)
+        self._flat_low = self.bucket_low.reshape(-1)
+        self._flat_close = self.bucket_close.reshape(-1)
+
+    @property
+    def capacity(self):
+        return len(self.epoch)
+
+    def bytes_per_symbol(self):
+        """Fixed memory cost of one symbol's buffers"""
+        return 8 * (len(BUCKET_COLUMNS) * self.bucket_count + len(SYMBOL_COLUMNS) + 1)
+
+    def ensure(self, sid):
+        """Grow the buffers so sid fits"""
+        size = self.capacity
+        if sid < size:
+            return
+        capacity = max(size * 2, sid + 1)
+        for name, fill in BUCKET_COLUMNS:
+            grown = np.full((capacity, self.bucket_count), fill)
+            grown[:size] = getattr(self, name)
+            setattr(self, name, grown)
+        for name, fill in SYMBOL_COLUMNS:
+            grown = np.full(capacity, fill)
+            grown[:size] = getattr(self, name)
+            setattr(self, name, grown)
+        grown = np.full(capacity, -1, dtype=np.int64)
+        grown[:size] = self.epoch
+        self.epoch = grown
+        self._flatten()
+
+    def _clear_slot(self, sid, slot):
+        """Empty one bucket of a symbol"""
+        for name, fill in BUCKET_COLUMNS:
+            getattr(self, name)[sid, slot] = fill
+
+    def _advance(self, sid, epoch):
+        """Move a symbol into bucket epoch, expiring the slots that leave the window"""
+        last = self.epoch[sid]
+        if epoch <= last:
+            return
+        self.epoch[sid] = epoch
+        if last < 0:
+            return
+
+        if epoch - last >= self.bucket_count:
+            # The whole window expired; it now starts at the last price seen
+            self._clear_slot(sid, slice(None))
+            self.pv_sum[sid] = 0.0
+            self.volume_sum[sid] = 0.0
+            self.high[sid] = -np.inf
+            self.low[sid] = np.inf
+            self.base_price[sid] = self.last_price[sid]
+            return
+
+        # Slots expire oldest first, so the last one that traded sets the window's base price
+        for bucket in range(last + 1, epoch + 1):
+            slot = bucket % self.bucket_count
+            close = self.bucket_close[sid, slot]
+            if close == close:
+                self.base_price[sid] = close
+            self.pv_sum[sid] -= self.bucket_pv[sid, slot]
+            self.volume_sum[sid] -= self.bucket_volume[sid, slot]
+            self._clear_slot(sid, slot)
+
+        # Once per bucket, not per tick
+        self.high[sid] = self.bucket_high[sid].max()
+        self.low[sid] = self.bucket_low[sid].min()
+        if self.volume_sum[sid] < 1e-9:
+            # Drop rounding residue once the window holds no volume
+            self.pv_sum[sid] = 0.0
+            self.volume_sum[sid] = 0.0
+
+    def update(self, sid, ltp, volume=None, now=0.0):
+        """Apply one tick received at epoch seconds now"""
+        epoch = int(now // self.bucket_seconds)
+        current = int(self.epoch[sid])
+        if epoch > current:
+            if current < 0:
+                self.base_price[sid] = ltp
+            self._advance(sid, epoch)
+            current = epoch
+        # A late timestamp lands in the symbol's current bucket
+        cell = sid * self.bucket_count + current % self.bucket_count
+
+        self.last_price[sid] = ltp
+        self._flat_close[cell] = ltp
+        bucket_high = self._flat_high
+        if ltp > bucket_high[cell]:
+            bucket_high[cell] = ltp
+            if ltp > self.high[sid]:
+                self.high[sid] = ltp
+        bucket_low = self._flat_low
+        if ltp < bucket_low[cell]:
+            bucket_low[cell] = ltp
+            if ltp < self.low[sid]:
+                self.low[sid] = ltp
+
+        if volume is not None:
+            last_volume = self.last_volume
+            traded = volume - last_volume[sid]
+            last_volume[sid] = volume
+            # NaN (first volume seen) and resets compare False
+            if traded > 0:
+                self._flat_pv[cell] += ltp * traded
+                self._flat_volume[cell] += traded
+                self.pv_sum[sid] += ltp * traded
+                self.volume_sum[sid] += traded
+
+    def update_batch(self, ids, prices, volumes=None, now=0.0):
+        """Apply a batch of ticks received together
+
+        Equivalent to calling update() per tick in batch order. Only symbols
+        entering a new bucket take the per-symbol expiry step; everything
+        else is a handful of vectorized scatter operations.
+        """
+        ids = np.asarray(ids, dtype=np.intp)
+        prices = np.asarray(prices, dtype=np.float64)
+        if ids.size == 0:
+            return
+
+        epoch = int(now // self.bucket_seconds)
+        for sid in np.unique(ids[self.epoch[ids] < epoch]):
+            self._advance(int(sid), epoch)
+        slots = self.epoch[ids] % self.bucket_count
+
+        # Group ticks by symbol while keeping arrival order within a symbol
+        order = np.argsort(ids, kind='stable')
+        sorted_ids = ids[order]
+        first = np.concatenate(([True], sorted_ids[1:] != sorted_ids[:-1]))
+        last = np.concatenate((first[1:], [True]))
+
+        traded = None
+        if volumes is not None:
+            traded = traded_quantities(ids, volumes, self.last_volume)
+
+        sorted_prices = prices[order]
+        unset = first & np.isnan(self.base_price[sorted_ids])
+        self.base_price[sorted_ids[unset]] = sorted_prices[unset]
+        self.last_price[sorted_ids[last]] = sorted_prices[last]
+        self.bucket_close[sorted_ids[last], slots[order][last]] = sorted_prices[last]
+
+        np.maximum.at(self.bucket_high, (ids, slots), prices)
+        np.minimum.at(self.bucket_low, (ids, slots), prices)
+        np.maximum.at(self.high, ids, prices)
+        np.minimum.at(self.low, ids, prices)
+
+        if traded is not None:
+            pv = prices * traded
+            np.add.at(self.bucket_pv, (ids, slots), pv)
+            np.add.at(self.bucket_volume, (ids, slots), traded)
+            np.add.at(self.pv_sum, ids, pv)
+            np.add.at(self.volume_sum, ids, traded)
+
+    def value(self, sid, indicator):
+        """Current value of one indicator for a symbol, or None if undefined"""
+        ltp = self.last_price[sid]
+        volume_sum = self.volume_sum[sid]
+        vwap = self.pv_sum[sid] / volume_sum if volume_sum > 0 else np.nan
+
+        if indicator == 'change_pct':
+            base = self.base_price[sid]
+            value = (ltp - base) / base * 100 if base > 0 else np.nan
+        elif indicator == 'vwap':
+            value = vwap
+        elif indicator == 'vwap_dev_pct':
+            value = (ltp - vwap) / vwap * 100 if vwap > 0 else np.nan
+        elif indicator == 'high':
+            value = self.high[sid] if self.high[sid] > -np.inf else np.nan
+        elif indicator == 'low':
+            value = self.low[sid] if self.low[sid] < np.inf else np.nan
+        elif indicator == 'range_pct':
+            low = self.low[sid]
+            value = (self.high[sid] - low) / low * 100 if 0 < low < np.inf else np.nan
+        elif indicator == 'volume_rate':
+            # Traded quantity per minute over the window
+            value = volume_sum / (self.window_seconds / 60)
+        else:
+            raise ValueError(f"Unknown indicator: {indicator}")
+        return None if value != value else float(value)
+
+    def snapshot(self, sid, now=None):
+        """All indicators for a symbol; pass now to expire stale buckets first"""
+        if now is not None:
+            self._advance(sid, int(now // self.bucket_seconds))
+        return {indicator: self.value(sid, indicator) for indicator in INDICATORS}
+
+    def publish(self, count, now):
+        """Expire stale buckets of the first count symbols as of now and publish their indicators"""
+        count = min(count, self.capacity)
+        epoch = int(now // self.bucket_seconds)
+        behind = self.epoch[:count]
+        for sid in np.flatnonzero((behind >= 0) & (behind < epoch)):
+            self._advance(int(sid), epoch)
+
+        ltp = self.last_price[:count]
+        base = self.base_price[:count]
+        volume_sum = self.volume_sum[:count]
+        high = self.high[:count]
+        low = self.low[:count]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = np.where(volume_sum > 0, self.pv_sum[:count] / volume_sum, np.nan)
+            view = {
+                'change_pct': np.where(base > 0, (ltp - base) / base * 100, np.nan),
+                'vwap': vwap,
+                'vwap_dev_pct': np.where(vwap > 0, (ltp - vwap) / vwap * 100, np.nan),
+                'high': np.where(high > -np.inf, high, np.nan),
+                'low': np.where(low < np.inf, low, np.nan),
+                'range_pct': np.where((low > 0) & (low < np.inf), (high - low) / low * 100, np.nan),
+                'volume_rate': volume_sum / (self.window_seconds / 60)
+            }
+        self.view = view
+        self.published_at = now
+
+    def published(self, sid, indicator):
+        """One indicator from the last published view, or None; safe from any thread"""
+        view = self.view
+        if view is None:
+            return None
+        values = view[indicator]
+        if sid >= len(values):
+            return None
+        value = values[sid]
+        return None if value != value else float(value)
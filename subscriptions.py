@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = ('full', 'compact')
+
+
+class Subscriber:
+    """One chat, the symbols it watches and how its alerts are rendered"""
+
+    __slots__ = ('chat_id', 'name', 'symbols', 'group', 'all', 'pct', 'template')
+
+    def __init__(self, chat_id, name=None, symbols=(), group=None, all=False, pct=None, template='full'):
+        """Initialize Subscriber instance"""
+        self.chat_id = chat_id
+        self.name = name or str(chat_id)
+        self.symbols = frozenset(symbols)
+        self.group = group
+        self.all = all
+        self.pct = pct
+        self.template = template
+
+
+class SubscriptionRegistry:
+    """Chats subscribed to symbols, with an inverted index from symbol to audience
+
+    Subscriptions are resolved against each symbol when it is registered,
+    like alert rules, so finding who gets an alert is one dict lookup plus a
+    pass over that symbol's threshold tiers. Nothing here runs per tick:
+    more chats only cost work when an alert fires.
+
+    A subscriber's pct is its own alert threshold. The symbol's threshold in
+    PriceState is lowered to the smallest one among its subscribers, so an
+    alert arrives whenever any tier might be due. Subscribers sharing a
+    threshold form a tier with its own reference price: a tier gets the
+    alert only when the price has moved its pct from that tier's last alert,
+    and only tiers that fired re-anchor. Level, band and indicator alerts go
+    to every subscriber of the symbol.
+    """
+
+    def __init__(self, subscribers=None, groups=None):
+        """Initialize SubscriptionRegistry instance"""
+        self.groups = groups or {}
+        self.subscribers = subscribers or []
+        for subscriber in self.subscribers:
+            self._validate(subscriber)
+
+        # symbol -> list of [threshold, subscribers, reference price or None], lowest threshold first
+        self._tiers = {}
+
+    def __contains__(self, symbol):
+        return symbol in self._tiers
+
+    @classmethod
+    def from_file(cls, path, default_chat_id=None):
+        """Load subscriptions from a JSON file; without one, default_chat_id gets every symbol"""
+        if not path or not os.path.exists(path):
+            if not default_chat_id:
+                logger.warning(f"No subscriptions file at {path} and no default chat; alerts will not be sent")
+                return cls()
+            logger.info(f"No subscriptions file at {path}, sending every alert to chat {default_chat_id}")
+            return cls([Subscriber(default_chat_id, all=True)])
+
+        with open(path, 'r') as f:
+            config = json.load(f)
+
+        subscribers = []
+        for entry in config.get('subscriptions', []):
+            if 'chat_id' not in entry:
+                raise ValueError(f"Subscription needs a chat_id: {entry}")
+            subscribers.append(Subscriber(
+                entry['chat_id'],
+                name=entry.get('name'),
+                symbols=entry.get('symbols', ()),
+                group=entry.get('group'),
+                all=entry.get('all', False),
+                pct=entry.get('pct'),
+                template=entry.get('template', 'full')
+            ))
+        registry = cls(subscribers, groups=config.get('groups', {}))
+        logger.info(f"Loaded {len(subscribers)} subscriptions from {path}")
+        return registry
+
+    def _validate(self, subscriber):
+        """Reject malformed subscriptions at startup rather than on an alert"""
+        if not subscriber.all and not subscriber.symbols and not subscriber.group:
+            raise ValueError(f"Subscription for {subscriber.name} needs symbols, a group or all")
+        if subscriber.group and subscriber.group not in self.groups:
+            raise ValueError(f"Subscription references unknown group: {subscriber.group}")
+        if subscriber.template not in TEMPLATES:
+            raise ValueError(f"Unknown template {subscriber.template}, expected one of {', '.join(TEMPLATES)}")
+
+    def _watches(self, subscriber, symbol):
+        """Whether a subscriber wants a symbol; only called while registering"""
+        if subscriber.all or symbol in subscriber.symbols:
+            return True
+        if not subscriber.group:
+            return False
+        definition = self.groups[subscriber.group]
+        if symbol in definition.get('symbols', ()):
+            return True
+        match = definition.get('match')
+        return bool(match) and match in symbol
+
+    def register(self, symbol, threshold):
+        """Resolve a symbol's audience; returns the lowest threshold among it, or None
+
+        threshold is the symbol's own threshold, used for subscribers that
+        do not set one.
+        """
+        tiers = {}
+        for subscriber in self.subscribers:
+            if self._watches(subscriber, symbol):
+                pct = threshold if subscriber.pct is None else subscriber.pct
+                tiers.setdefault(pct, []).append(subscriber)
+        self._tiers[symbol] = [[pct, tuple(tiers[pct]), None] for pct in sorted(tiers)]
+        if not tiers:
+            return None
+        return min(tiers)
+
+    def audience(self, symbol, ltp, change, change_percent, reason=None):
+        """(change, change_percent, subscribers) for each tier that should get this alert
+
+        change is measured from the alert's reference price; each tier's own
+        change is measured from its last alert instead, starting from that
+        reference on the symbol's first alert.
+        """
+        groups = []
+        for tier in self._tiers.get(symbol, ()):
+            pct, subscribers, ref_price = tier
+            if ref_price is None:
+                ref_price = tier[2] = ltp - change
+            tier_change = ltp - ref_price
+            tier_percent = tier_change / ref_price * 100 if ref_price > 0 else change_percent
+            if abs(tier_percent) >= pct:
+                tier[2] = ltp
+            elif not reason:
+                continue
+            groups.append((tier_change, tier_percent, subscribers))
+        return groups
+
+    def chat_ids(self):
+        """Every subscribed chat"""
+        return {subscriber.chat_id for subscriber in self.subscribers}
+
+    def stats(self):
+        """Summary of the registry"""
+        return {
+            'subscribers': len(self.subscribers),
+            'chats': len(self.chat_ids()),
+            'symbols': sum(1 for tiers in self._tiers.values() if tiers)
+        }
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than 4096 characters
+MAX_MESSAGE_LENGTH = 4096
+
+# Groups get about 20 messages a minute, and a burst of them still draws 429s
+CHAT_BURST = 3
+
+SEND_SECONDS = REGISTRY.histogram('telegram_send_seconds', 'Telegram sendMessage round trip, including failures')
+
+
+def _retry_seconds(error):
+    """Seconds a RetryAfter asks to wait; newer telegram versions give a timedelta"""
+    retry_after = error.retry_after
+    if hasattr(retry_after, 'total_seconds'):
+        return float(retry_after.total_seconds())
+    return float(retry_after)
+
+
+class TokenBucket:
+    """Token bucket limiter with support for server-imposed pauses"""
+
+    def __init__(self, rate, capacity):
+        """Initialize TokenBucket with a refill rate in tokens per second"""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        """Add the tokens earned since the last update"""
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def wait_time(self, now=None):
+        """Seconds until one token is available"""
+        if now is None:
+            now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now=None):
+        """Take one token; callers check wait_time first"""
+        if now is None:
+            now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds, now=None):
+        """Pause the bucket, e.g. after a 429 with retry_after"""
+        if now is None:
+            now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+        self.updated = self.blocked_until
+
+
+class TelegramSender:
+    """Rate-limited Telegram sender that merges backlogged alerts into digests"""
+
+    def __init__(self, bot, per_chat_per_minute=20, global_per_second=30, parse_mode='Markdown',
+                 max_pending=500, max_attempts=5, on_delivered=None, chat_burst=CHAT_BURST):
+        """Initialize TelegramSender instance
+
+        on_delivered, if given, is called with (origins, delivered_at) after
+        each successful send, where origins are the origin values passed to
+        send() for the alerts that went out in that message.
+        """
+        self.bot = bot
+        self.on_delivered = on_delivered
+        self.parse_mode = parse_mode
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        self.per_chat_per_minute = per_chat_per_minute
+        self.chat_burst = max(min(chat_burst, per_chat_per_minute), 1)
+        self.global_bucket = TokenBucket(global_per_second, global_per_second)
+        self._chat_buckets = {}
+
+        # chat_id -> deque of (text, summary, origin) waiting to be sent
+        self._pending = {}
+        self._flushers = {}
+
+        # Counters
+        self.sent = 0
+        self.replies = 0
+        self.digests = 0
+        self.merged = 0
+        self.overflowed = 0
+        self.rate_limited = 0
+        self.failed = 0
+
+    def _chat_bucket(self, chat_id):
+        """Per-chat bucket, created on first use"""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.per_chat_per_minute / 60, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def send(self, chat_id, text, summary=None, origin=None):
+        """Queue a message for a chat; returns as soon as it is queued
+
+        summary is a one-line version of the message used when several
+        backlogged alerts are merged into a digest. origin describes the
+        event behind the message (e.g. its timestamps) and is handed back
+        to on_delivered for latency tracking.
+        """
+        pending = self._pending.setdefault(chat_id, deque())
+        if len(pending) >= self.max_pending:
+            pending.popleft()
+            self.overflowed += 1
+        pending.append((text, summary or text.strip().splitlines()[0], origin))
+
+        flusher = self._flushers.get(chat_id)
+        if flusher is None or flusher.done():
+            self._flushers[chat_id] = asyncio.ensure_future(self._flush_chat(chat_id))
+
+    async def _flush_chat(self, chat_id):
+        """Send queued messages for a chat as the rate limits allow"""
+        pending = self._pending[chat_id]
+        chat_bucket = self._chat_bucket(chat_id)
+        attempts = 0
+        throttled = False
+
+        while pending:
+            # Wait for both the chat and the global budget
+            now = time.monotonic()
+            delay = max(chat_bucket.wait_time(now), self.global_bucket.wait_time(now))
+            if delay > 0:
+                throttled = True
+                await asyncio.sleep(delay)
+                continue
+
+            # Everything that piled up while out of budget goes out as one message
+            batch = self._take_batch(pending) if throttled else [pending.popleft()]
+            throttled = False
+            text = self._render(batch)
+
+            chat_bucket.consume()
+            self.global_bucket.consume()
+            started = time.perf_counter()
+            try:
+                try:
+                    await self.bot.send_message(
+                        chat_id=chat_id,
+                        text=text,
+                        parse_mode=self.parse_mode
+                    )
+                finally:
+                    SEND_SECONDS.observe(time.perf_counter() - started)
+                attempts = 0
+                self.sent += 1
+                if len(batch) > 1:
+                    self.digests += 1
+                    self.merged += len(batch)
+                if self.on_delivered:
+                    self.on_delivered([item[2] for item in batch], time.time())
+            except RetryAfter as e:
+                retry_after = _retry_seconds(e)
+                self.rate_limited += 1
+                logger.warning(f"Telegram rate limit hit for chat {chat_id}, retrying in {retry_after}s")
+                chat_bucket.block(retry_after)
+                self.global_bucket.block(retry_after)
+                pending.extendleft(reversed(batch))
+                throttled = True
+            except (TimedOut, NetworkError) as e:
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    self.failed += len(batch)
+                    logger.error(f"Giving up on {len(batch)} messages for chat {chat_id}: {str(e)}")
+                    attempts = 0
+                else:
+                    logger.warning(f"Telegram send failed for chat {chat_id} (attempt {attempts}): {str(e)}")
+                    pending.extendleft(reversed(batch))
+                    await asyncio.sleep(min(2 ** attempts, 30))
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Error sending Telegram message to chat {chat_id}: {str(e)}", exc_info=True)
+
+    async def reply(self, chat_id, text):
+        """Send a command reply now, as plain text; returns whether it was delivered
+
+        Replies bypass the per-chat alert queues, so they are never merged
+        into a digest or held behind throttled alerts, and they are sent
+        without parse_mode so user input cannot break the markup. They
+        still draw on the global budget.
+        """
+        attempts = 0
+        while True:
+            delay = self.global_bucket.wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            self.global_bucket.consume()
+            started = time.perf_counter()
+            try:
+                try:
+                    await self.bot.send_message(chat_id=chat_id, text=text[:MAX_MESSAGE_LENGTH])
+                finally:
+                    SEND_SECONDS.observe(time.perf_counter() - started)
+                self.replies += 1
+                return True
+            except RetryAfter as e:
+                self.rate_limited += 1
+                delay = _retry_seconds(e)
+            except BadRequest as e:
+                self.failed += 1
+                logger.error(f"Telegram rejected a reply to chat {chat_id}: {str(e)}")
+                return False
+            except (TimedOut, NetworkError) as e:
+                delay = min(2 ** (attempts + 1), 30)
+                logger.warning(f"Telegram reply to chat {chat_id} failed (attempt {attempts + 1}): {str(e)}")
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error sending Telegram reply to chat {chat_id}: {str(e)}", exc_info=True)
+                return False
+
+            attempts += 1
+            if attempts >= self.max_attempts:
+                self.failed += 1
+                logger.error(f"Giving up on a reply to chat {chat_id}")
+                return False
+            await asyncio.sleep(delay)
+
+    def _take_batch(self, pending):
+        """Pop as many queued messages as fit in one Telegram message"""
+        if len(pending) == 1:
+            return [pending.popleft()]
+
+        batch = []
+        length = len(self._digest_header(len(pending)))
+        while pending:
+            line_length = len(pending[0][1]) + 1
+            if batch and length + line_length > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(pending.popleft())
+            length += line_length
+        return batch
+
+    def _digest_header(self, count):
+        """Heading for a digest of merged alerts"""
+        return f"📊 Market Digest ({count} alerts)\n"
+
+    def _render(self, batch):
+        """Full text for a single alert, summary lines for a digest"""
+        if len(batch) == 1:
+            return batch[0][0]
+
+        lines = [self._digest_header(len(batch))]
+        lines.extend(item[1] for item in batch)
+        return "\n".join(lines)[:MAX_MESSAGE_LENGTH]
+
+    def queue_depth(self):
+        """Messages waiting across all chats"""
+        # Called from the metrics thread while chats are being added
+        return sum(len(pending) for pending in list(self._pending.values()))
+
+    def stats(self):
+        """Snapshot of delivery counters"""
+        return {
+            'pending': self.queue_depth(),
+            'sent': self.sent,
+            'replies': self.replies,
+            'digests': self.digests,
+            'merged': self.merged,
+            'overflowed': self.overflowed,
+            'rate_limited': self.rate_limited,
+            'failed': self.failed
+        }
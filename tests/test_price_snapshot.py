@@ -0,0 +1,133 @@
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from price_snapshot import SEQ_INDEX, SnapshotReader, SnapshotWriter
+
+SYMBOLS = [f"NSE:SYM{index:04d}-EQ" for index in range(2000)]
+
+
+def columns(value, count=len(SYMBOLS)):
+    """ltp and change_pct columns where every symbol carries the same publish number"""
+    return np.full(count, float(value)), np.full(count, -float(value))
+
+
+def test_read_returns_published_values(tmp_path):
+    """Values, names and NaNs come back as the writer published them"""
+    path = str(tmp_path / "snapshot.bin")
+    writer = SnapshotWriter(path, capacity=4)
+    ltp = np.array([100.0, 200.0, np.nan])
+    change = np.array([1.5, -0.5, np.nan])
+    writer.publish(["NSE:A-EQ", "NSE:B-EQ", "NSE:C-EQ"], (ltp, change), now=123.0)
+
+    reader = SnapshotReader(path)
+    published_at, quotes = reader.read()
+    assert published_at == 123.0
+    assert quotes == {
+        "NSE:A-EQ": {'ltp': 100.0, 'change_pct': 1.5},
+        "NSE:B-EQ": {'ltp': 200.0, 'change_pct': -0.5},
+        "NSE:C-EQ": {'ltp': None, 'change_pct': None},
+    }
+    assert reader.read(["NSE:B-EQ", "NSE:MISSING-EQ"])[1] == {"NSE:B-EQ": {'ltp': 200.0, 'change_pct': -0.5}}
+    reader.close()
+    writer.close()
+
+
+def test_reader_follows_a_grown_file(tmp_path):
+    """Outgrowing the file renames a new one into place and readers reopen it"""
+    path = str(tmp_path / "snapshot.bin")
+    writer = SnapshotWriter(path, capacity=2)
+    writer.publish(SYMBOLS[:2], columns(1, 2))
+    reader = SnapshotReader(path)
+    assert len(reader.read()[1]) == 2
+
+    writer.publish(SYMBOLS[:10], columns(2, 10))
+    quotes = reader.read()[1]
+    assert len(quotes) == 10
+    assert quotes[SYMBOLS[9]] == {'ltp': 2.0, 'change_pct': -2.0}
+    reader.close()
+    writer.close()
+
+
+def test_read_retries_until_a_publish_finishes(tmp_path):
+    """A read that starts mid-publish waits for it and returns the new values"""
+    path = str(tmp_path / "snapshot.bin")
+    writer = SnapshotWriter(path, capacity=len(SYMBOLS))
+    writer.publish(SYMBOLS, columns(1))
+    reader = SnapshotReader(path)
+
+    # Leave the sequence odd, as a publisher descheduled mid-write would
+    writer.words[SEQ_INDEX] += 1
+
+    def finish():
+        time.sleep(0.02)
+        writer.words[SEQ_INDEX] += 1
+        writer.publish(SYMBOLS, columns(2))
+
+    finisher = threading.Thread(target=finish)
+    finisher.start()
+    _, quotes = reader.read()
+    finisher.join()
+
+    assert reader.retries > 0
+    assert {quote['ltp'] for quote in quotes.values()} == {2.0}
+    reader.close()
+    writer.close()
+
+
+def test_read_times_out_when_the_writer_stalls(tmp_path):
+    """A publish that never finishes fails the read instead of hanging it"""
+    path = str(tmp_path / "snapshot.bin")
+    writer = SnapshotWriter(path)
+    writer.publish(SYMBOLS[:3], columns(1, 3))
+    writer.words[SEQ_INDEX] += 1
+
+    reader = SnapshotReader(path, timeout=0.05)
+    with pytest.raises(TimeoutError):
+        reader.read()
+    reader.close()
+    writer.close()
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads every microsecond so reads overlap publishes"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_reads_are_never_torn_under_a_concurrent_writer(tmp_path, fast_switching):
+    """Every read sees exactly one publish, however often they overlap"""
+    path = str(tmp_path / "snapshot.bin")
+    writer = SnapshotWriter(path, capacity=len(SYMBOLS))
+    writer.publish(SYMBOLS, columns(0))
+    stop = threading.Event()
+
+    def publish():
+        value = 0
+        while not stop.is_set():
+            value += 1
+            writer.publish(SYMBOLS, columns(value))
+
+    publisher = threading.Thread(target=publish)
+    publisher.start()
+    reader = SnapshotReader(path)
+    try:
+        for _ in range(200):
+            _, quotes = reader.read()
+            assert len(quotes) == len(SYMBOLS)
+            values = {(quote['ltp'], quote['change_pct']) for quote in quotes.values()}
+            assert len(values) == 1
+            ltp, change = values.pop()
+            assert change == -ltp
+    finally:
+        stop.set()
+        publisher.join()
+    assert reader.retries > 0
+    reader.close()
+    writer.close()
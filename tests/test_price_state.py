@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from alert_rules import RuleEngine
+from price_state import PriceState
+
+SYMBOLS = [f"NSE:SYM{index:02d}-EQ" for index in range(8)] + ["NSE:NIFTY50-INDEX"]
+
+RULES = [
+    {"type": "pct", "symbol": "NSE:SYM02-EQ", "pct": 0.3},
+    {"type": "level", "symbol": "NSE:SYM00-EQ", "price": 100.5, "name": "SYM00 100.5"},
+    {"type": "band", "symbol": "NSE:SYM01-EQ", "low": 99.0, "high": 101.0, "name": "SYM01 range"},
+]
+
+
+def random_batches(seed, batches=300, size=40):
+    """Random walks with occasional jumps, cut into (ids, prices, now) batches of mixed symbols"""
+    rng = np.random.default_rng(seed)
+    prices = np.full(len(SYMBOLS), 100.0)
+    for batch in range(batches):
+        ids = rng.integers(0, len(SYMBOLS), size)
+        ticks = []
+        for sid in ids:
+            move = rng.normal(0, 0.002)
+            if rng.random() < 0.02:
+                move += rng.choice((-1, 1)) * rng.uniform(0.01, 0.03)
+            prices[sid] *= 1 + move
+            ticks.append(float(prices[sid]))
+        yield ids, np.array(ticks), batch * 0.5
+
+
+def make_state(hysteresis, cooldown):
+    """PriceState with every test symbol registered, small enough to grow"""
+    state = PriceState(capacity=4, hysteresis=hysteresis, cooldown=cooldown)
+    for symbol in SYMBOLS:
+        state.register(symbol)
+    return state
+
+
+@pytest.mark.parametrize('hysteresis, cooldown', [(0.0, 0.0), (0.3, 5.0)])
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_evaluate_batch_matches_update(seed, hysteresis, cooldown):
+    """A batch alerts on the same ticks, with the same anchors, as update() per tick"""
+    single = make_state(hysteresis, cooldown)
+    batched = make_state(hysteresis, cooldown)
+
+    alerts = 0
+    for ids, prices, now in random_batches(seed):
+        expected = []
+        for position, (sid, ltp) in enumerate(zip(ids, prices)):
+            hit = single.update(int(sid), float(ltp), now)
+            if hit:
+                expected.append((position, int(sid), float(ltp), hit[0], hit[1]))
+
+        hit_ids, hit_prices, refs, changes, positions = batched.evaluate_batch(ids, prices, now)
+        actual = [
+            (int(position), int(sid), float(ltp), float(ref), float(change))
+            for sid, ltp, ref, change, position in zip(hit_ids, hit_prices, refs, changes, positions)
+        ]
+        assert actual == expected
+        alerts += len(actual)
+
+    assert alerts > 0
+    for column in ('last_price', 'ref_price', 'direction', 'alerted_at'):
+        np.testing.assert_array_equal(getattr(batched, column), getattr(single, column))
+    assert batched.suppressed == single.suppressed
+
+
+def test_evaluate_batch_with_no_ticks():
+    """An empty batch changes nothing and alerts nothing"""
+    state = make_state(0.0, 0.0)
+    ids, prices, refs, changes, positions = state.evaluate_batch([], [])
+    assert len(ids) == len(prices) == len(refs) == len(changes) == len(positions) == 0
+    assert np.isnan(state.last_price[:len(SYMBOLS)]).all()
+
+
+@pytest.mark.parametrize('seed', [4, 5])
+def test_rule_engine_batch_matches_single_ticks(seed):
+    """Threshold, level and band alerts from evaluate_batch match evaluate() per tick"""
+    single = RuleEngine(make_state(0.2, 2.0), rules=RULES)
+    batched = RuleEngine(make_state(0.2, 2.0), rules=RULES)
+
+    alerts = 0
+    for ids, prices, now in random_batches(seed):
+        expected = []
+        for sid, ltp in zip(ids, prices):
+            for old_price, change_percent, reason in single.evaluate(int(sid), float(ltp), None, now):
+                expected.append((int(sid), float(ltp), float(old_price), float(change_percent), reason))
+
+        actual = batched.evaluate_batch(ids, prices, None, now)
+        # Level-only crossings are reported after the threshold alerts of a batch
+        assert sorted(actual, key=repr) == sorted(expected, key=repr)
+        alerts += len(actual)
+
+    assert alerts > 0
+    assert batched.state.suppressed == single.state.suppressed
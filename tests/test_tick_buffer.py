@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from tick_buffer import ConflatingBuffer
+from tick_decoder import Tick
+
+
+def symbols(ticks):
+    return [tick.symbol for tick in ticks]
+
+
+def test_conflation_keeps_the_latest_tick_and_the_extremes_in_order():
+    """A symbol's high and low since the last drain come before its latest tick"""
+    buffer = ConflatingBuffer()
+    for ltp in (100.0, 104.0, 97.0, 101.0):
+        buffer.put_many([Tick('NSE:A-EQ', ltp)], 1.0)
+    buffer.put_many([Tick('NSE:B-EQ', 50.0)], 2.0)
+
+    ticks, _ = buffer.drain(timeout=0)
+    assert [(tick.symbol, tick.ltp) for tick in ticks] == [
+        ('NSE:A-EQ', 104.0), ('NSE:A-EQ', 97.0), ('NSE:A-EQ', 101.0), ('NSE:B-EQ', 50.0)
+    ]
+    assert buffer.conflated == 3
+    assert buffer.drain(timeout=0) == ([], None)
+
+
+def test_drain_reports_the_latest_receive_time():
+    """A merged batch is clocked by its newest tick"""
+    buffer = ConflatingBuffer()
+    buffer.put_many([Tick('NSE:A-EQ', 1.0), Tick('NSE:B-EQ', 2.0)], 10.0)
+    buffer.put_many([Tick('NSE:A-EQ', 1.5)], 12.0)
+    buffer.put_many([Tick('NSE:C-EQ', 3.0)], 11.0)
+    _, received_at = buffer.drain(timeout=0)
+    assert received_at == 12.0
+
+
+def test_drop_oldest_evicts_the_longest_waiting_symbol():
+    buffer = ConflatingBuffer(max_symbols=2, overflow='drop_oldest')
+    assert buffer.put_many([Tick('NSE:A-EQ', 1.0), Tick('NSE:B-EQ', 2.0), Tick('NSE:C-EQ', 3.0)], 1.0) == 0
+    # Updating a pending symbol never needs room
+    assert buffer.put_many([Tick('NSE:B-EQ', 2.5)], 1.0) == 0
+
+    ticks, _ = buffer.drain(timeout=0)
+    assert [(tick.symbol, tick.ltp) for tick in ticks] == [('NSE:B-EQ', 2.0), ('NSE:B-EQ', 2.5), ('NSE:C-EQ', 3.0)]
+    assert buffer.dropped == 1
+
+
+def test_drop_newest_discards_the_incoming_tick():
+    buffer = ConflatingBuffer(max_symbols=2, overflow='drop_newest')
+    assert buffer.put_many([Tick('NSE:A-EQ', 1.0), Tick('NSE:B-EQ', 2.0), Tick('NSE:C-EQ', 3.0)], 1.0) == 1
+
+    ticks, _ = buffer.drain(timeout=0)
+    assert symbols(ticks) == ['NSE:A-EQ', 'NSE:B-EQ']
+    assert buffer.dropped == 1
+
+
+def test_block_waits_for_a_drain():
+    """A full buffer holds the receive thread until the processor makes room"""
+    buffer = ConflatingBuffer(max_symbols=1, overflow='block', block_timeout=5.0)
+    buffer.put_many([Tick('NSE:A-EQ', 1.0)], 1.0)
+
+    results = []
+    receiver = threading.Thread(target=lambda: results.append(buffer.put_many([Tick('NSE:B-EQ', 2.0)], 2.0)))
+    receiver.start()
+    time.sleep(0.05)
+    assert receiver.is_alive()
+
+    ticks, _ = buffer.drain(timeout=0)
+    receiver.join(timeout=5.0)
+    assert symbols(ticks) == ['NSE:A-EQ']
+    assert results == [0]
+    assert symbols(buffer.drain(timeout=0)[0]) == ['NSE:B-EQ']
+    assert buffer.dropped == 0
+
+
+def test_block_drops_the_tick_after_the_timeout():
+    buffer = ConflatingBuffer(max_symbols=1, overflow='block', block_timeout=0.05)
+    buffer.put_many([Tick('NSE:A-EQ', 1.0)], 1.0)
+
+    started = time.monotonic()
+    assert buffer.put_many([Tick('NSE:B-EQ', 2.0)], 2.0) == 1
+    assert time.monotonic() - started >= 0.05
+    assert symbols(buffer.drain(timeout=0)[0]) == ['NSE:A-EQ']
+    assert buffer.dropped == 1
+
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ConflatingBuffer(overflow='drop_all')
+
+
+def test_join_waits_until_drained_batches_are_processed():
+    """join() returns only once every pending tick was drained and marked done"""
+    buffer = ConflatingBuffer()
+    assert buffer.join(timeout=0)
+    buffer.put_many([Tick('NSE:A-EQ', 1.0)], 1.0)
+    assert not buffer.join(timeout=0.01)
+
+    ticks, _ = buffer.drain(timeout=0)
+    assert ticks
+    assert not buffer.join(timeout=0.01)
+    buffer.task_done()
+    assert buffer.join(timeout=0)
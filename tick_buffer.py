@@ -0,0 +1,175 @@
+import logging
+import threading
+import time
+
+from tick_decoder import Tick
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class _Pending:
+    """Latest tick of one symbol and the price range it covered since the last drain"""
+
+    __slots__ = ('tick', 'received_at', 'high', 'low', 'high_last', 'count')
+
+    def __init__(self, tick, received_at):
+        self.tick = tick
+        self.received_at = received_at
+        self.high = tick.ltp
+        self.low = tick.ltp
+        # Whether the high was reached after the low
+        self.high_last = True
+        self.count = 1
+
+
+class ConflatingBuffer:
+    """Per-symbol conflation between the socket threads and the processor
+
+    Receive threads put decoded ticks; a symbol that already has a pending
+    tick only has it replaced, while its high and low since the last drain
+    are kept. drain() hands the processor every pending symbol at once, with
+    each symbol's extremes replayed as up to two extra ticks (in the order
+    they happened) before its latest tick, so level and band rules still see
+    spikes. Work per drain is bounded by the number of symbols, however many
+    ticks arrived.
+
+    max_symbols bounds the pending set; when a new symbol arrives while it is
+    full, overflow decides: drop_oldest evicts the longest-waiting symbol,
+    drop_newest discards the incoming tick, block makes the receive thread
+    wait up to block_timeout for a drain and then drops it.
+    """
+
+    def __init__(self, max_symbols=5000, overflow='drop_oldest', block_timeout=1.0):
+        """Initialize ConflatingBuffer instance"""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow}, expected one of {', '.join(OVERFLOW_POLICIES)}")
+        self.max_symbols = max_symbols
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._space = threading.Condition(self._lock)
+        self._done = threading.Condition(self._lock)
+        # Drained batches the processor has not finished yet
+        self._unfinished = 0
+
+        # Counters
+        self.received = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.drains = 0
+        self.largest_drain = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put_many(self, ticks, received_at):
+        """Add decoded ticks from one frame; returns how many incoming ticks overflow discarded"""
+        dropped = 0
+        with self._lock:
+            pending = self._pending
+            for tick in ticks:
+                self.received += 1
+                entry = pending.get(tick.symbol)
+                if entry is not None:
+                    ltp = tick.ltp
+                    if ltp > entry.high:
+                        entry.high = ltp
+                        entry.high_last = True
+                    elif ltp < entry.low:
+                        entry.low = ltp
+                        entry.high_last = False
+                    entry.tick = tick
+                    entry.received_at = received_at
+                    entry.count += 1
+                    self.conflated += 1
+                    continue
+
+                if len(pending) >= self.max_symbols and not self._make_room():
+                    dropped += 1
+                    continue
+                # A block policy may have waited for a drain that swapped the dict
+                pending = self._pending
+                pending[tick.symbol] = _Pending(tick, received_at)
+            self.dropped += dropped
+            self._ready.notify()
+        return dropped
+
+    def _make_room(self):
+        """Apply the overflow policy with the lock held; False drops the incoming tick"""
+        if self.overflow == 'drop_oldest':
+            # Dicts keep insertion order, so the first key has waited longest
+            del self._pending[next(iter(self._pending))]
+            self.dropped += 1
+            return True
+        if self.overflow == 'block':
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._pending) >= self.max_symbols:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._space.wait(remaining)
+            return True
+        return False
+
+    def drain(self, timeout=None):
+        """Wait up to timeout for pending ticks and take all of them
+
+        Returns (ticks, received_at) where received_at is the latest
+        receive time in the batch, or ([], None) on timeout.
+        """
+        with self._lock:
+            if not self._pending:
+                self._ready.wait(timeout)
+            pending, self._pending = self._pending, {}
+            self._space.notify_all()
+            if pending:
+                self._unfinished += 1
+                self.drains += 1
+        if not pending:
+            return [], None
+
+        ticks = []
+        received_at = None
+        for entry in pending.values():
+            tick = entry.tick
+            if entry.count > 1:
+                extremes = (entry.low, entry.high) if entry.high_last else (entry.high, entry.low)
+                for price in extremes:
+                    if price != tick.ltp:
+                        ticks.append(Tick(tick.symbol, price, None, tick.timestamp))
+            ticks.append(tick)
+            if received_at is None or entry.received_at > received_at:
+                received_at = entry.received_at
+
+        if len(pending) > self.largest_drain:
+            self.largest_drain = len(pending)
+        return ticks, received_at
+
+    def task_done(self):
+        """Mark the last drained batch processed, like queue.Queue.task_done"""
+        with self._lock:
+            self._unfinished -= 1
+            if not self._unfinished and not self._pending:
+                self._done.notify_all()
+
+    def join(self, timeout=None):
+        """Wait until every pending tick has been drained and processed; False on timeout"""
+        with self._lock:
+            return self._done.wait_for(lambda: not self._pending and not self._unfinished, timeout)
+
+    def stats(self):
+        """Snapshot of conflation counters"""
+        return {
+            'received': self.received,
+            'conflated': self.conflated,
+            'dropped': self.dropped,
+            'pending': len(self._pending),
+            'drains': self.drains,
+            'largest_drain': self.largest_drain,
+            'overflow': self.overflow
+        }
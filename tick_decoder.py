@@ -0,0 +1,165 @@
+import json
+import logging
+from datetime import datetime
+
+from log_pipeline import LogThrottle
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+# Malformed ticks can arrive thousands of times a second; log a sample
+tick_log = LogThrottle(logger)
+
+# Fields the feed actually uses, in the order brokers commonly name them
+VOLUME_FIELDS = ('vol_traded_today', 'volume')
+TIMESTAMP_FIELDS = ('exch_feed_time', 'last_traded_time', 'timestamp')
+PREV_CLOSE_FIELDS = ('prev_close_price', 'prev_close')
+
+NO_TICKS = ()
+
+
+def exchange_epoch(timestamp):
+    """Epoch seconds from a broker timestamp (seconds, milliseconds or ISO 8601), or None"""
+    if timestamp is None:
+        return None
+    if isinstance(timestamp, (int, float)):
+        # Millisecond timestamps are three orders of magnitude larger
+        return timestamp / 1000 if timestamp > 1e11 else float(timestamp)
+    try:
+        parsed = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            return exchange_epoch(float(timestamp))
+        except ValueError:
+            return None
+    return parsed.timestamp() if parsed.tzinfo else None
+
+
+class Tick:
+    """Decoded market tick with only the fields the bot uses"""
+
+    __slots__ = ('symbol', 'ltp', 'volume', 'timestamp', 'prev_close')
+
+    def __init__(self, symbol, ltp, volume=None, timestamp=None, prev_close=None):
+        self.symbol = symbol
+        self.ltp = ltp
+        self.volume = volume
+        self.timestamp = timestamp
+        self.prev_close = prev_close
+
+    def __repr__(self):
+        return f"Tick({self.symbol!r}, {self.ltp!r}, volume={self.volume!r}, timestamp={self.timestamp!r})"
+
+
+class TickDecoder:
+    """Turn raw WebSocket frames into Tick records
+
+    Frames that cannot contain a price are rejected with a substring check
+    before any parsing. orjson is used when installed, with the standard
+    library json module as the fallback. A frame may hold one tick object or
+    a list of them.
+    """
+
+    def __init__(self, loads=None):
+        """Initialize TickDecoder instance"""
+        if loads is None:
+            loads = orjson.loads if orjson is not None else json.loads
+        self.loads = loads
+        self.parser = getattr(loads, '__module__', 'json')
+
+        # Counters
+        self.frames = 0
+        self.decoded = 0
+        self.rejected = 0
+
+    def decode(self, message):
+        """Decode a frame into a list of Tick; raises ValueError on bad JSON"""
+        self.frames += 1
+        if not message:
+            self.rejected += 1
+            return NO_TICKS
+
+        if isinstance(message, (bytes, bytearray)):
+            if b'"ltp"' not in message:
+                self.rejected += 1
+                return NO_TICKS
+            data = self.loads(message)
+        elif isinstance(message, str):
+            if '"ltp"' not in message:
+                self.rejected += 1
+                return NO_TICKS
+            data = self.loads(message)
+        else:
+            # Some client libraries hand over already-parsed frames
+            data = message
+
+        if isinstance(data, dict):
+            tick = self._to_tick(data)
+            if tick is None:
+                return NO_TICKS
+            self.decoded += 1
+            return (tick,)
+
+        if isinstance(data, list):
+            ticks = []
+            for item in data:
+                if not isinstance(item, dict):
+                    self.rejected += 1
+                    continue
+                tick = self._to_tick(item)
+                if tick is not None:
+                    ticks.append(tick)
+            self.decoded += len(ticks)
+            return ticks
+
+        self.rejected += 1
+        return NO_TICKS
+
+    def _to_tick(self, data):
+        """Build a Tick from one decoded object, or None if it is not a tick"""
+        symbol = data.get('symbol')
+        if symbol is None:
+            self.rejected += 1
+            tick_log.debug('missing_symbol', "Message missing symbol field")
+            return None
+
+        ltp = data.get('ltp')
+        if ltp is None:
+            self.rejected += 1
+            tick_log.warning('missing_ltp', "No LTP data for symbol %s", symbol)
+            return None
+
+        volume = None
+        for field in VOLUME_FIELDS:
+            volume = data.get(field)
+            if volume is not None:
+                break
+
+        timestamp = None
+        for field in TIMESTAMP_FIELDS:
+            timestamp = data.get(field)
+            if timestamp is not None:
+                break
+
+        prev_close = None
+        for field in PREV_CLOSE_FIELDS:
+            prev_close = data.get(field)
+            if prev_close is not None:
+                break
+        if prev_close is None and data.get('ch') is not None:
+            # Fyers also sends the day change as ch, measured from the previous close
+            prev_close = ltp - data['ch']
+
+        return Tick(symbol, ltp, volume, timestamp, prev_close)
+
+    def stats(self):
+        """Snapshot of decode counters"""
+        return {
+            'parser': self.parser,
+            'frames': self.frames,
+            'decoded': self.decoded,
+            'rejected': self.rejected
+        }
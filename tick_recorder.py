@@ -0,0 +1,265 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from datetime import datetime
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone('Asia/Kolkata')
+
+# Column name -> array typecode; each column is its own fixed-width file
+COLUMNS = (
+    ('timestamp', 'd'),   # receive time, epoch seconds
+    ('symbol_id', 'I'),   # index into the day's symbols.txt
+    ('ltp', 'd'),
+    ('volume', 'q'),      # -1 when the tick carried no volume
+)
+NUMPY_DTYPES = {'d': '<f8', 'I': '<u4', 'q': '<i8'}
+
+COUNT_FILE = 'count'
+SYMBOLS_FILE = 'symbols.txt'
+
+
+class _DayFiles:
+    """Memory-mapped column files for one trading day"""
+
+    def __init__(self, path, initial_capacity):
+        """Open (or create) the day's files and restore its symbol table"""
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        self.count_fd = os.open(os.path.join(path, COUNT_FILE), os.O_RDWR | os.O_CREAT)
+        raw = os.pread(self.count_fd, 8, 0)
+        self.count = struct.unpack('<Q', raw)[0] if len(raw) == 8 else 0
+
+        self.symbols = []
+        symbols_path = os.path.join(path, SYMBOLS_FILE)
+        if os.path.exists(symbols_path):
+            with open(symbols_path, 'r') as f:
+                self.symbols = f.read().splitlines()
+        self.symbols_file = open(symbols_path, 'a')
+
+        self.files = {}
+        self.maps = {}
+        self.capacity = max(initial_capacity, self.count)
+        for name, typecode in COLUMNS:
+            fd = os.open(os.path.join(path, f"{name}.bin"), os.O_RDWR | os.O_CREAT)
+            self.files[name] = fd
+        self._map(self.capacity)
+
+    def _map(self, capacity):
+        """(Re)map every column file at the given capacity"""
+        for name, typecode in COLUMNS:
+            if name in self.maps:
+                self.maps[name].close()
+            size = capacity * array(typecode).itemsize
+            fd = self.files[name]
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self.maps[name] = mmap.mmap(fd, size)
+        self.capacity = capacity
+
+    def append(self, staging, count):
+        """Copy staged columns into the maps after the current end"""
+        if self.count + count > self.capacity:
+            self._map(max(self.capacity * 2, self.count + count))
+
+        for name, typecode in COLUMNS:
+            column = staging[name]
+            itemsize = column.itemsize
+            start = self.count * itemsize
+            self.maps[name][start:start + count * itemsize] = memoryview(column).cast('B')
+
+    def commit(self, count, new_symbols):
+        """Flush data to disk, then publish the new row count"""
+        if new_symbols:
+            self.symbols_file.write(''.join(f"{symbol}\n" for symbol in new_symbols))
+            self.symbols_file.flush()
+
+        for mm in self.maps.values():
+            mm.flush()
+        self.count += count
+        os.pwrite(self.count_fd, struct.pack('<Q', self.count), 0)
+
+    def close(self):
+        """Release maps and file descriptors"""
+        for mm in self.maps.values():
+            mm.close()
+        for fd in self.files.values():
+            os.close(fd)
+        os.close(self.count_fd)
+        self.symbols_file.close()
+
+
+class TickRecorder:
+    """Append-only recorder of decoded ticks, rolled daily
+
+    record() only appends to in-memory staging arrays under a lock; a
+    background thread moves staged rows into the memory-mapped column files
+    every flush_interval seconds. Use read_day() to load a recorded day.
+    """
+
+    def __init__(self, base_dir='ticks', flush_interval=1.0, initial_capacity=1 << 20):
+        """Initialize TickRecorder instance"""
+        self.base_dir = base_dir
+        self.flush_interval = flush_interval
+        self.initial_capacity = initial_capacity
+
+        self._lock = threading.Lock()
+        self._staging = self._new_staging()
+        self._staged = 0
+
+        # Symbol ids are per day so a restart cannot reshuffle them
+        self.day = None
+        self._files = None
+        self.symbol_ids = {}
+        self._new_symbols = []
+
+        self._stop = threading.Event()
+        self.thread = None
+
+        # Counters
+        self.recorded = 0
+        self.flushes = 0
+
+    @staticmethod
+    def _new_staging():
+        return {name: array(typecode) for name, typecode in COLUMNS}
+
+    def start(self):
+        """Start the background flush thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        with self._lock:
+            if self.day is None:
+                self._open_day(datetime.now(IST).strftime('%Y-%m-%d'))
+        self.thread = threading.Thread(target=self._run, name="tick-recorder", daemon=True)
+        self.thread.start()
+        logger.info(f"Tick recorder writing to {self.base_dir}")
+
+    def stop(self):
+        """Flush what is staged and close the day's files"""
+        self._stop.set()
+        if self.thread:
+            self.thread.join()
+        self.flush()
+        if self._files:
+            self._files.close()
+            self._files = None
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing tick recorder: {str(e)}", exc_info=True)
+
+    def record(self, tick, received_at=None):
+        """Stage one tick; cheap enough to call on every tick"""
+        if received_at is None:
+            received_at = time.time()
+        volume = tick.volume
+        with self._lock:
+            sid = self.symbol_ids.get(tick.symbol)
+            if sid is None:
+                sid = len(self.symbol_ids)
+                self.symbol_ids[tick.symbol] = sid
+                self._new_symbols.append(tick.symbol)
+
+            staging = self._staging
+            staging['timestamp'].append(received_at)
+            staging['symbol_id'].append(sid)
+            staging['ltp'].append(tick.ltp)
+            staging['volume'].append(-1 if volume is None else int(volume))
+            self._staged += 1
+
+    def flush(self):
+        """Move staged ticks into today's memory-mapped files"""
+        with self._lock:
+            staging, count = self._staging, self._staged
+            new_symbols, self._new_symbols = self._new_symbols, []
+            self._staging = self._new_staging()
+            self._staged = 0
+
+            # Roll to a new day while holding the lock so ids restart cleanly
+            day = datetime.now(IST).strftime('%Y-%m-%d')
+            if day != self.day:
+                previous = {sid: symbol for symbol, sid in self.symbol_ids.items()}
+                self._open_day(day)
+                # Staged rows were numbered with the previous table
+                new_symbols = self._renumber(staging, previous)
+
+        if count:
+            self._files.append(staging, count)
+        if count or new_symbols:
+            self._files.commit(count, new_symbols)
+            self.recorded += count
+            self.flushes += 1
+
+    def _open_day(self, day):
+        """Close the previous day and restore the symbol table for a new one"""
+        if self._files:
+            self._files.close()
+        self._files = _DayFiles(os.path.join(self.base_dir, day), self.initial_capacity)
+        self.day = day
+        self.symbol_ids = {symbol: sid for sid, symbol in enumerate(self._files.symbols)}
+
+    def _renumber(self, staging, previous):
+        """Map staged symbol ids onto the newly opened day's table"""
+        new_symbols = []
+        column = staging['symbol_id']
+        for i, old_sid in enumerate(column):
+            symbol = previous[old_sid]
+            sid = self.symbol_ids.get(symbol)
+            if sid is None:
+                sid = len(self.symbol_ids)
+                self.symbol_ids[symbol] = sid
+                new_symbols.append(symbol)
+            column[i] = sid
+        return new_symbols
+
+    def stats(self):
+        """Snapshot of recorder counters"""
+        return {
+            'day': self.day,
+            'recorded': self.recorded,
+            'staged': self._staged,
+            'flushes': self.flushes
+        }
+
+
+def read_day(day, base_dir='ticks'):
+    """Expose a recorded day's ticks as read-only NumPy arrays without copying
+
+    Returns a dict with one array per column plus the 'symbols' list that
+    symbol_id indexes into.
+    """
+    import numpy as np
+
+    path = os.path.join(base_dir, day)
+    with open(os.path.join(path, COUNT_FILE), 'rb') as f:
+        raw = f.read(8)
+    count = struct.unpack('<Q', raw)[0] if len(raw) == 8 else 0
+
+    with open(os.path.join(path, SYMBOLS_FILE), 'r') as f:
+        symbols = f.read().splitlines()
+
+    columns = {'symbols': symbols}
+    for name, typecode in COLUMNS:
+        if count == 0:
+            columns[name] = np.empty(0, dtype=NUMPY_DTYPES[typecode])
+            continue
+        columns[name] = np.memmap(
+            os.path.join(path, f"{name}.bin"),
+            dtype=NUMPY_DTYPES[typecode],
+            mode='r',
+            shape=(count,)
+        )
+    return columns
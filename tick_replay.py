@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+from fyers_live_feed_new import FyersLiveFeed
+from telegram_sender import TelegramSender
+from tick_recorder import read_day
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayBot:
+    """Stand-in for telegram.Bot that records messages instead of sending them"""
+
+    def __init__(self, latency=0.0):
+        """Initialize ReplayBot with an optional simulated round trip"""
+        self.latency = latency
+        self.messages = []
+
+    async def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages.append((chat_id, text))
+
+
+class ReplayFyers:
+    """Stand-in for fyersModel.FyersModel that serves synthetic market depth"""
+
+    def __init__(self, latency=0.0):
+        """Initialize ReplayFyers with an optional simulated REST latency"""
+        self.latency = latency
+        self.depth_calls = 0
+
+    def get_market_depth(self, symbols):
+        if self.latency:
+            time.sleep(self.latency)
+        self.depth_calls += 1
+        return {
+            'd': [
+                {
+                    'symbol': symbol,
+                    'bids': [{'price': 100.0, 'qty': 500}],
+                    'asks': [{'price': 100.05, 'qty': 450}],
+                    'tot_qty': 1000000
+                }
+                for symbol in symbols.split(',')
+            ]
+        }
+
+
+def synthetic_symbols(count):
+    """Symbol names for a synthetic universe; the first two are indices"""
+    symbols = ["NSE:SYNTH1-INDEX", "NSE:SYNTH2-INDEX"][:count]
+    symbols.extend(f"NSE:SYM{i:05d}-EQ" for i in range(len(symbols), count))
+    return symbols
+
+
+def synthetic_frames(symbols, ticks, seed=1, jump_probability=0.002, interval=0.001):
+    """Yield (timestamp, frame) pairs of a random walk across symbols
+
+    Most ticks move a few basis points; jump_probability of them move 2%
+    so the stream exercises the alert path.
+    """
+    rng = random.Random(seed)
+    prices = {symbol: rng.uniform(100, 3000) for symbol in symbols}
+    volumes = dict.fromkeys(symbols, 0)
+    timestamp = time.time()
+
+    for _ in range(ticks):
+        symbol = rng.choice(symbols)
+        move = rng.gauss(0, 0.0005)
+        if rng.random() < jump_probability:
+            move = rng.choice((-0.02, 0.02))
+
+        prices[symbol] = round(prices[symbol] * (1 + move), 2)
+        volumes[symbol] += rng.randint(1, 500)
+        yield timestamp, json.dumps({
+            'symbol': symbol,
+            'ltp': prices[symbol],
+            'vol_traded_today': volumes[symbol]
+        })
+        timestamp += interval
+
+
+def recorded_frames(day, base_dir='ticks'):
+    """Yield (timestamp, frame) pairs from a day written by TickRecorder"""
+    columns = read_day(day, base_dir)
+    symbols = columns['symbols']
+    for timestamp, sid, ltp, volume in zip(columns['timestamp'], columns['symbol_id'], columns['ltp'], columns['volume']):
+        frame = {'symbol': symbols[sid], 'ltp': float(ltp)}
+        if volume >= 0:
+            frame['vol_traded_today'] = int(volume)
+        yield float(timestamp), json.dumps(frame)
+
+
+def create_replay_feed(bot_latency=0.0, depth_latency=0.0, unthrottled=True):
+    """Build a FyersLiveFeed wired to local stand-ins instead of Telegram and Fyers"""
+    bot = ReplayBot(bot_latency)
+    feed = FyersLiveFeed(bot=bot)
+    feed.fyers = ReplayFyers(depth_latency)
+    feed.recorder = None
+    # Never replace the live feed's shared price snapshot with replayed prices
+    feed.snapshot_path = None
+    if unthrottled:
+        # Measure the pipeline, not Telegram's rate limits
+        feed.sender = TelegramSender(bot, per_chat_per_minute=10 ** 9, global_per_second=10 ** 9,
+                                     on_delivered=feed.record_delivery)
+    return feed
+
+
+def replay(feed, frames, speed=None, conflate=None):
+    """Push frames through the feed's processing path
+
+    speed=None replays as fast as possible; speed=1.0 follows the original
+    timestamps at wall-clock pace, 2.0 at double speed and so on. With
+    conflate (the default whenever the feed has a conflating buffer) frames
+    go through enqueue_frame and the processor thread, as on the live
+    socket; otherwise each frame is handled inline by process_message.
+    Returns (frames replayed, seconds spent processing): time inside
+    process_message, or the wall time until the processor caught up.
+    """
+    feed.dispatcher.start()
+    if conflate is None:
+        conflate = feed.tick_buffer is not None
+    if conflate:
+        if feed.tick_buffer is None:
+            raise ValueError("Conflated replay needs a feed with a conflating buffer")
+        feed.start_processor()
+        handle = feed.enqueue_frame
+    else:
+        handle = feed.process_message
+
+    count = 0
+    busy = 0.0
+    first_timestamp = None
+    started = time.perf_counter()
+    for timestamp, frame in frames:
+        if speed:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            delay = (timestamp - first_timestamp) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        tick_started = time.perf_counter()
+        handle(frame)
+        busy += time.perf_counter() - tick_started
+        count += 1
+
+    if conflate:
+        feed.tick_buffer.join()
+        # The processor runs alongside the receive side, so only wall time is meaningful
+        busy = time.perf_counter() - started
+    return count, busy
+
+
+def drain(feed, timeout=10.0):
+    """Wait until queued alerts have been handed to the bot"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if feed.dispatcher.queue_depth == 0 and feed.sender.queue_depth() == 0:
+            stats = feed.dispatcher.stats()
+            if stats['completed'] + stats['failed'] >= stats['submitted']:
+                return True
+        time.sleep(0.01)
+    return False
+
+
+def main():
+    """Replay recorded or synthetic ticks through the live processing pipeline"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--day', help="Recorded day to replay (YYYY-MM-DD)")
+    parser.add_argument('--base-dir', default='ticks', help="TickRecorder directory")
+    parser.add_argument('--symbols', type=int, default=50, help="Synthetic universe size")
+    parser.add_argument('--ticks', type=int, default=100000, help="Synthetic tick count")
+    parser.add_argument('--speed', type=float, default=None, help="Wall-clock multiplier; omit to replay as fast as possible")
+    parser.add_argument('--no-conflate', action='store_true', help="Process frames inline instead of through the conflating buffer")
+    parser.add_argument('--print-alerts', action='store_true', help="Print every alert the bot would have sent")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    feed = create_replay_feed()
+    if args.day:
+        frames = recorded_frames(args.day, args.base_dir)
+    else:
+        frames = synthetic_frames(synthetic_symbols(args.symbols), args.ticks)
+
+    conflate = False if args.no_conflate else None
+    count, busy = replay(feed, frames, speed=args.speed, conflate=conflate)
+    drain(feed)
+    feed.dispatcher.stop()
+
+    path = "through the conflating buffer" if feed.tick_buffer is not None and not args.no_conflate else "inside process_message"
+    print(f"Replayed {count:,} frames, {count / busy:,.0f} frames/sec {path}")
+    if feed.tick_buffer is not None and not args.no_conflate:
+        print(f"Conflation: {feed.tick_buffer.stats()}")
+    print(f"Alerts: {feed.dispatcher.stats()}")
+    print(f"Messages sent: {len(feed.bot.messages):,}")
+    if args.print_alerts:
+        for chat_id, text in feed.bot.messages:
+            print(f"--- {chat_id}{text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone('Asia/Kolkata')
+
+DEFAULT_STORE_PATH = 'token_store.json'
+DEFAULT_HANDOFF_PATH = 'auth_handoff.sock'
+LEGACY_AUTH_CODE_FILE = 'auth_code.txt'
+# Seconds a handoff client gets to send its message; accepted sockets do not inherit the listener's timeout
+HANDOFF_READ_TIMEOUT = 5.0
+
+
+def next_expiry(expiry_time="03:30", now=None):
+    """Epoch seconds of the next daily token expiry (broker tokens die overnight, IST)"""
+    hour, minute = (int(part) for part in expiry_time.split(':'))
+    now = now or datetime.now(IST)
+    expiry = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if expiry <= now:
+        expiry += timedelta(days=1)
+    return expiry.timestamp()
+
+
+def notify_handoff(payload, handoff_path=DEFAULT_HANDOFF_PATH, timeout=1.0):
+    """Push an auth code or token to a waiting feed; returns False if nobody is listening"""
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(handoff_path):
+        return False
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(handoff_path)
+            client.sendall(json.dumps(payload).encode())
+        return True
+    except OSError as e:
+        logger.warning(f"Auth handoff to {handoff_path} failed: {str(e)}")
+        return False
+
+
+class TokenManager:
+    """Persist a broker's access token with its expiry and receive new auth codes
+
+    Tokens live in a small JSON store keyed by broker so a restart can reuse
+    the day's token without logging in again. New auth codes (or tokens
+    already exchanged by the callback server) arrive over a local Unix
+    socket, so waiting for a login does not poll the filesystem.
+    """
+
+    def __init__(self, broker, store_path=DEFAULT_STORE_PATH, handoff_path=DEFAULT_HANDOFF_PATH,
+                 expiry_time="03:30", margin=60):
+        """Initialize TokenManager instance"""
+        self.broker = broker
+        self.store_path = store_path
+        self.handoff_path = handoff_path
+        self.expiry_time = expiry_time
+        self.margin = margin
+
+    def _read_store(self):
+        """Whole store, or an empty one if missing or unreadable"""
+        try:
+            with open(self.store_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self):
+        """Stored access token if it is still valid, else None"""
+        entry = self._read_store().get(self.broker)
+        if not entry or not entry.get('access_token'):
+            return None
+        if entry.get('expires_at', 0) - self.margin <= time.time():
+            logger.info(f"Stored {self.broker} token has expired")
+            return None
+        return entry['access_token']
+
+    def expires_at(self):
+        """Expiry of the stored token in epoch seconds, or None"""
+        entry = self._read_store().get(self.broker)
+        return entry.get('expires_at') if entry else None
+
+    def save(self, access_token, expires_at=None):
+        """Persist a token atomically; defaults to the next overnight expiry"""
+        if expires_at is None:
+            expires_at = next_expiry(self.expiry_time)
+
+        store = self._read_store()
+        store[self.broker] = {
+            'access_token': access_token,
+            'expires_at': expires_at,
+            'saved_at': time.time()
+        }
+        self._write_store(store)
+
+    def clear(self):
+        """Forget the stored token, e.g. after the broker rejects it"""
+        store = self._read_store()
+        if store.pop(self.broker, None) is not None:
+            self._write_store(store)
+
+    def _write_store(self, store):
+        """Replace the store atomically, readable by the owner only"""
+        tmp_path = f"{self.store_path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(store, f)
+        os.replace(tmp_path, self.store_path)
+
+    def wait_for_handoff(self, timeout=None):
+        """Block until the callback server hands over an auth code or token
+
+        Returns a dict with either 'code' or 'access_token' (and optionally
+        'expires_at'), or None on timeout.
+        """
+        if not hasattr(socket, 'AF_UNIX'):
+            return self._wait_for_legacy_file(timeout)
+
+        if os.path.exists(self.handoff_path):
+            os.remove(self.handoff_path)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            # Bind before checking the legacy file so a code cannot slip between the two
+            server.bind(self.handoff_path)
+            server.listen(1)
+            server.settimeout(timeout)
+            try:
+                legacy = self._read_legacy_file()
+                if legacy:
+                    return legacy
+
+                logger.info(f"Waiting for authentication on {self.handoff_path}...")
+                while True:
+                    try:
+                        conn, _ = server.accept()
+                    except socket.timeout:
+                        return None
+                    with conn:
+                        conn.settimeout(HANDOFF_READ_TIMEOUT)
+                        payload = self._read_payload(conn)
+                    if payload and payload.get('broker', self.broker) == self.broker:
+                        return payload
+            finally:
+                if os.path.exists(self.handoff_path):
+                    os.remove(self.handoff_path)
+
+    @staticmethod
+    def _read_payload(conn):
+        """Read one JSON message from a handoff connection"""
+        chunks = []
+        while True:
+            try:
+                chunk = conn.recv(4096)
+            except socket.timeout:
+                logger.warning("Auth handoff client went quiet; dropping the connection")
+                return None
+            if not chunk:
+                break
+            chunks.append(chunk)
+        try:
+            return json.loads(b''.join(chunks))
+        except ValueError:
+            logger.warning("Ignoring malformed auth handoff message")
+            return None
+
+    @staticmethod
+    def _read_legacy_file():
+        """Pick up an auth code left in auth_code.txt by an older callback server"""
+        if not os.path.exists(LEGACY_AUTH_CODE_FILE):
+            return None
+        with open(LEGACY_AUTH_CODE_FILE, 'r') as f:
+            auth_code = f.read().strip()
+        os.remove(LEGACY_AUTH_CODE_FILE)
+        return {'code': auth_code} if auth_code else None
+
+    def _wait_for_legacy_file(self, timeout):
+        """Fallback for platforms without Unix sockets"""
+        deadline = None if timeout is None else time.time() + timeout
+        while deadline is None or time.time() < deadline:
+            legacy = self._read_legacy_file()
+            if legacy:
+                return legacy
+            logger.info("Waiting for authentication...")
+            time.sleep(2)
+        return None
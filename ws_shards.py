@@ -0,0 +1,260 @@
+import logging
+import math
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class SocketShard:
+    """One WebSocket connection and the slice of symbols it carries"""
+
+    def __init__(self, shard_id, symbols):
+        """Initialize SocketShard instance"""
+        self.shard_id = shard_id
+        self.symbols = list(symbols)
+        self.socket = None
+        self.connected = False
+        self.dead = False
+        self.reconnects = 0
+        self.reconnecting = False
+        # Set when the current socket closes, so a close during reconnecting is not lost
+        self.closed = False
+        # Attempts since the shard last delivered a frame
+        self.failures = 0
+
+    def __repr__(self):
+        return f"SocketShard({self.shard_id}, {len(self.symbols)} symbols)"
+
+
+class ShardManager:
+    """Spread the symbol universe over several WebSocket connections
+
+    Each shard has its own socket (and so its own receive thread). Frames
+    from every shard go to a single on_frame callback. When a shard drops,
+    a supervisor thread (never the socket's callback thread) reconnects it
+    with jittered exponential backoff and no retry limit, resubscribing its
+    symbols in one call. An outage only ends when the new socket delivers a
+    frame, so a server that accepts connections and drops them still backs
+    off. After rebalance_after failed attempts its symbols
+    are moved onto live shards with room; whatever does not fit stays on
+    the shard, which keeps retrying.
+
+    on_gap, if given, is called with the symbols that missed ticks right
+    before they are subscribed again, so the caller can refresh their state.
+    """
+
+    def __init__(self, create_socket, on_frame, data_type="symbolData",
+                 symbols_per_connection=200, connections=1, on_gap=None,
+                 backoff_base=1.0, backoff_max=60.0, rebalance_after=5):
+        """Initialize ShardManager instance
+
+        create_socket is a callable returning a new, unsubscribed socket.
+        """
+        self.create_socket = create_socket
+        self.on_frame = on_frame
+        self.data_type = data_type
+        self.symbols_per_connection = symbols_per_connection
+        self.connections = connections
+        self.on_gap = on_gap
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rebalance_after = rebalance_after
+
+        self.shards = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def split(self, symbols):
+        """Divide symbols into evenly sized shards within the per-connection cap"""
+        count = max(self.connections, math.ceil(len(symbols) / self.symbols_per_connection), 1)
+        size = math.ceil(len(symbols) / count)
+        return [
+            SocketShard(shard_id, symbols[i:i + size])
+            for shard_id, i in enumerate(range(0, len(symbols), size))
+        ]
+
+    def start(self, symbols):
+        """Open one connection per shard"""
+        self._stop.clear()
+        self.shards = self.split(symbols)
+        logger.info(f"Streaming {len(symbols)} symbols over {len(self.shards)} connections")
+        for shard in self.shards:
+            self._connect(shard)
+
+    def stop(self):
+        """Close every shard's socket and stop the supervisors"""
+        self._stop.set()
+        for shard in self.shards:
+            shard.dead = True
+            self._close(shard)
+
+    def restart(self):
+        """Reconnect every live shard through its supervisor"""
+        for shard in self.shards:
+            if not shard.dead:
+                self._schedule_reconnect(shard)
+
+    def _connect(self, shard):
+        """Create a socket for a shard and subscribe its symbols in one call"""
+        socket = self.create_socket()
+
+        def on_connect():
+            shard.connected = True
+            logger.info(f"Shard {shard.shard_id} connected ({len(shard.symbols)} symbols)")
+
+        def on_error(error):
+            logger.error(f"WebSocket error on shard {shard.shard_id}: {error}")
+
+        def on_message(message):
+            if shard.failures:
+                shard.failures = 0
+            self.on_frame(message)
+
+        def on_close():
+            shard.connected = False
+            if shard.dead or shard.socket is not socket:
+                return
+            shard.closed = True
+            logger.warning(f"WebSocket connection closed on shard {shard.shard_id}")
+            self._schedule_reconnect(shard)
+
+        socket.on_connect = on_connect
+        socket.on_message = on_message
+        socket.on_error = on_error
+        socket.on_close = on_close
+
+        shard.closed = False
+        shard.socket = socket
+        socket.subscribe(symbols=shard.symbols, data_type=self.data_type)
+        socket.keep_running()
+
+    def _close(self, shard):
+        """Close a shard's socket, ignoring errors from a dead connection"""
+        socket, shard.socket = shard.socket, None
+        shard.connected = False
+        if socket is not None:
+            try:
+                socket.close()
+            except Exception as e:
+                logger.debug(f"Error closing shard {shard.shard_id}: {str(e)}")
+
+    def _schedule_reconnect(self, shard):
+        """Start a supervisor for a shard unless one is already running"""
+        with self._lock:
+            if shard.reconnecting or self._stop.is_set():
+                return
+            shard.reconnecting = True
+        threading.Thread(
+            target=self._supervise,
+            args=(shard,),
+            name=f"ws-shard-{shard.shard_id}-supervisor",
+            daemon=True
+        ).start()
+
+    def backoff(self, failures):
+        """Delay before the next attempt: exponential, capped, with jitter
+
+        Half the delay is fixed and half is random, so shards that dropped
+        together do not reconnect in lockstep.
+        """
+        delay = min(self.backoff_max, self.backoff_base * 2 ** failures)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _supervise(self, shard):
+        """Reconnect one shard until it is back up or the manager stops
+
+        Every attempt after the first of an outage waits out backoff(), and
+        the supervisor only hands the shard back once its new socket is
+        still open; a close after that starts a new supervisor.
+        """
+        handed_back = False
+        try:
+            while not shard.dead and not self._stop.is_set():
+                if shard.failures == self.rebalance_after:
+                    self._rebalance(shard)
+                    if shard.dead:
+                        return
+                if shard.failures:
+                    delay = self.backoff(shard.failures)
+                    logger.info(f"Retrying shard {shard.shard_id} in {delay:.1f}s")
+                    if self._stop.wait(delay):
+                        return
+
+                logger.info(f"Reconnecting shard {shard.shard_id} (attempt {shard.failures + 1})")
+                shard.failures += 1
+                try:
+                    self._close(shard)
+                    if self.on_gap:
+                        self.on_gap(shard.symbols)
+                    self._connect(shard)
+                except Exception as e:
+                    logger.error(f"Shard {shard.shard_id} reconnection failed: {str(e)}")
+                    continue
+
+                with self._lock:
+                    if not shard.closed:
+                        shard.reconnects += 1
+                        shard.reconnecting = False
+                        handed_back = True
+                        return
+                logger.warning(f"Shard {shard.shard_id} closed again while reconnecting")
+        finally:
+            if not handed_back:
+                shard.reconnecting = False
+
+    def _rebalance(self, failed):
+        """Move a failing shard's symbols onto the live shards with the most room
+
+        The shard retires if everything fits; otherwise it keeps the symbols
+        that did not and its supervisor keeps retrying.
+        """
+        live = [
+            shard for shard in self.shards
+            if shard is not failed and not shard.dead and not shard.reconnecting and shard.socket is not None
+        ]
+        if not live:
+            logger.error(f"No live shards to take {len(failed.symbols)} symbols from shard {failed.shard_id}; still retrying")
+            return
+
+        moves = {shard.shard_id: [] for shard in live}
+        unplaced = []
+        for symbol in failed.symbols:
+            target = min(live, key=lambda shard: len(shard.symbols) + len(moves[shard.shard_id]))
+            if len(target.symbols) + len(moves[target.shard_id]) >= self.symbols_per_connection:
+                unplaced.append(symbol)
+                continue
+            moves[target.shard_id].append(symbol)
+
+        for shard in live:
+            symbols = moves[shard.shard_id]
+            if not symbols:
+                continue
+            try:
+                if self.on_gap:
+                    self.on_gap(symbols)
+                shard.socket.subscribe(symbols=symbols, data_type=self.data_type)
+                shard.symbols.extend(symbols)
+            except Exception as e:
+                logger.error(f"Could not move {len(symbols)} symbols to shard {shard.shard_id}: {str(e)}")
+                unplaced.extend(symbols)
+
+        logger.warning(f"Moved {len(failed.symbols) - len(unplaced)} symbols from shard {failed.shard_id} to {len(live)} live shards")
+        failed.symbols = unplaced
+        if not unplaced:
+            failed.dead = True
+            self._close(failed)
+
+    def stats(self):
+        """Per-shard connection state"""
+        return [
+            {
+                'shard': shard.shard_id,
+                'symbols': len(shard.symbols),
+                'connected': shard.connected,
+                'dead': shard.dead,
+                'reconnects': shard.reconnects,
+                'failures': shard.failures
+            }
+            for shard in self.shards
+        ]